@@ -0,0 +1,142 @@
+import functools
+import hashlib
+import os
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+
+# Modules whose code determines the rendered output; their source is part of every key,
+# so changing the generator invalidates the cache without a manual version bump
+GENERATOR_MODULES = ("textnode", "htmlnode", "inline_markdown", "flat_ir", "markdown_blocks",
+                     "assets", "minify", "metadata", "main")
+
+CACHE_LAYOUT_VERSION = "1"
+ENTRY_SUFFIX = ".html"
+TMP_SUFFIX = ".tmp"
+
+# Temporary files older than this are left over from crashed writers and removed by collect()
+STALE_TMP_SECONDS = 3600
+
+
+@functools.lru_cache(maxsize=None)
+def generator_version() -> str:
+    """Returns: a digest of the generator's rendering code and the cache layout version."""
+    digest = hashlib.sha256(CACHE_LAYOUT_VERSION.encode())
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in GENERATOR_MODULES:
+        with open(os.path.join(src_dir, f"{module}.py"), "rb") as module_file:
+            digest.update(module_file.read())
+    return digest.hexdigest()
+
+
+def cache_key(source: bytes, template: str, basepath: str,
+              version: Optional[str] = None, options: str = "") -> str:
+    """Args: source - Raw markdown bytes of the page.
+             template - Template content.
+             basepath - URL prefix of the build.
+             version - Generator version (defaults to generator_version()).
+             options - Output options that change the page bytes (asset rewrites, minification).
+       Returns: hex key of the final page bytes these inputs produce."""
+    digest = hashlib.sha256()
+    for part in (version if version is not None else generator_version(),
+                 basepath, options, template):
+        encoded = part.encode('utf-8')
+        digest.update(len(encoded).to_bytes(8, 'big'))
+        digest.update(encoded)
+    digest.update(len(source).to_bytes(8, 'big'))
+    digest.update(source)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """Content-addressed store of generated pages, safe to share between checkouts,
+        machines and concurrent builds. Entries are written to a temporary file and
+        renamed into place, so readers only ever see complete pages.
+        Args:
+            root - Cache directory (created if missing)
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"ArtifactCache({self.root})"
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:] + ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns: the cached page bytes, or None on a miss. A hit refreshes the
+           entry's mtime, which collect() uses as its last-used time."""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as entry_file:
+                data = entry_file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # Collected concurrently or read-only volume; the data is still valid
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as entry_file:
+                entry_file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _entries(self) -> Tuple[List[Tuple[float, int, str]], List[Tuple[float, str]]]:
+        """Returns: ([(mtime, size, path)] of entries, [(mtime, path)] of temporary files)."""
+        entries, tmp_files = [], []
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(TMP_SUFFIX):
+                    tmp_files.append((stat.st_mtime, path))
+                elif name.endswith(ENTRY_SUFFIX):
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries, tmp_files
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries()[0])
+
+    def collect(self, max_bytes: int) -> int:
+        """Deletes least recently used entries until the cache fits in max_bytes,
+           plus temporary files abandoned by crashed writers.
+           Returns: the number of bytes freed."""
+        entries, tmp_files = self._entries()
+        now = time.time()
+        for mtime, path in tmp_files:
+            if now - mtime > STALE_TMP_SECONDS:
+                _remove(path)
+
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= max_bytes:
+                break
+            if _remove(path):
+                freed += size
+        return freed
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False  # Another build collected it first
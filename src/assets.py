@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import Dict, Iterator, Optional, Set, Tuple
+from pageindex import STATE_DIR_NAME
+
+
+ASSET_MANIFEST_NAME = "assets.json"
+
+# Hex digits of the content hash inserted into fingerprinted file names
+FINGERPRINT_LENGTH = 8
+
+# Assets that get fingerprinted names; others (favicon.ico, robots.txt, HTML) keep the
+# names that clients request directly
+FINGERPRINT_EXTENSIONS = frozenset((".css", ".js", ".mjs", ".png", ".jpg", ".jpeg", ".gif",
+                                    ".svg", ".webp", ".avif", ".woff", ".woff2", ".ttf"))
+
+# Root-relative href/src values, up to any query string or fragment
+_ASSET_REFERENCE = re.compile(r'(href|src)="/([^"?#]+)')
+
+def fingerprinted_name(path: str, digest: str) -> str:
+    """Returns: path with the start of digest before its extension (index.css -> index.3fa9c1d2.css)."""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{extension}"
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as asset_file:
+        for chunk in iter(lambda: asset_file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _walk_files(root: str) -> Iterator[str]:
+    """Yields: POSIX paths of all files under root, relative to it."""
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            yield os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, '/')
+
+
+class AssetManifest:
+    """Static assets of an output directory, keyed by their path under the static directory.
+        Each entry holds the content hash, the path the asset was written to (fingerprinted
+        or not) and the size and mtime of the source it was hashed from.
+        Args:
+            Optional[entries] - path -> {"hash", "dest", "size", "mtime_ns"}
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict]] = None) -> None:
+        self.entries: Dict[str, Dict] = entries if entries is not None else {}
+        self._urls: Optional[Dict[str, str]] = None
+        self._digest: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"AssetManifest(assets={len(self.entries)})"
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def urls(self) -> Dict[str, str]:
+        """Root-relative URL path -> fingerprinted URL path, for renamed assets only."""
+        if self._urls is None:
+            self._urls = {path: entry["dest"] for path, entry in self.entries.items()
+                          if entry["dest"] != path}
+        return self._urls
+
+    def digest(self) -> str:
+        """Returns: a hash of the URL rewrites, which change the pages that reference assets."""
+        if self._digest is None:
+            self._digest = hashlib.sha256(json.dumps(sorted(self.urls.items())).encode()).hexdigest()
+        return self._digest
+
+    @staticmethod
+    def path(output_dir: str) -> str:
+        return os.path.join(output_dir, STATE_DIR_NAME, ASSET_MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, output_dir: str) -> "AssetManifest":
+        """Reads the asset manifest of an output directory; empty if it has none."""
+        try:
+            with open(cls.path(output_dir)) as manifest_file:
+                return cls(json.load(manifest_file))
+        except (FileNotFoundError, ValueError):
+            return cls()
+
+    def write(self, output_dir: str) -> None:
+        path = self.path(output_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as manifest_file:
+            json.dump(self.entries, manifest_file, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+def rewrite_asset_urls(html: str, urls: Dict[str, str]) -> str:
+    """Points root-relative href/src attributes at fingerprinted asset names.
+       Run before apply_basepath, while the references are still root-relative."""
+    if not urls:
+        return html
+
+    def replace(match: re.Match) -> str:
+        dest = urls.get(match.group(2))
+        return match.group(0) if dest is None else f'{match.group(1)}="/{dest}'
+
+    return _ASSET_REFERENCE.sub(replace, html)
+
+
+def sync_assets(static_dir: str, output_dir: str,
+                fingerprint: bool = True) -> Tuple[AssetManifest, int]:
+    """Brings the static assets of output_dir up to date with static_dir.
+        Assets are hashed while syncing (unchanged size and mtime reuse the previous hash),
+        written under fingerprinted names when fingerprint is set, and copied only when
+        their content changed. Assets that are gone from static_dir are deleted.
+        Returns: (the new asset manifest, bytes copied)."""
+    if not os.path.exists(static_dir):
+        raise FileNotFoundError(f"Static directory '{static_dir}' does not exist.")
+    previous = AssetManifest.load(output_dir)
+    manifest = AssetManifest()
+    copied = 0
+
+    for path in sorted(_walk_files(static_dir)):
+        source = os.path.join(static_dir, path)
+        stat = os.stat(source)
+        old = previous.entries.get(path)
+        if old is not None and (old["size"], old["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            digest = old["hash"]
+        else:
+            digest = _hash_file(source)
+        fingerprinted = fingerprint and os.path.splitext(path)[1].lower() in FINGERPRINT_EXTENSIONS
+        dest = fingerprinted_name(path, digest) if fingerprinted else path
+        manifest.entries[path] = {"hash": digest, "dest": dest,
+                                  "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        dest_path = os.path.join(output_dir, dest)
+        if (old is not None and (old["hash"], old["dest"]) == (digest, dest)
+                and os.path.exists(dest_path)):
+            continue
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        shutil.copy2(source, dest_path)
+        copied += stat.st_size
+
+    current = {entry["dest"] for entry in manifest.entries.values()}
+    for entry in previous.entries.values():
+        if entry["dest"] not in current and os.path.exists(os.path.join(output_dir, entry["dest"])):
+            os.remove(os.path.join(output_dir, entry["dest"]))
+
+    manifest.write(output_dir)
+    return manifest, copied
+
+
+def prune_output(output_dir: str, keep: Set[str]) -> None:
+    """Deletes every file of output_dir except build state and the POSIX relative
+       paths in keep, then any directories left empty."""
+    if not os.path.exists(output_dir):
+        return
+    for path in _walk_files(output_dir):
+        if path not in keep and not path.startswith(STATE_DIR_NAME + "/"):
+            os.remove(os.path.join(output_dir, path))
+    for dirpath, _, _ in sorted(os.walk(output_dir), key=lambda item: len(item[0]), reverse=True):
+        if dirpath != output_dir and not os.listdir(dirpath):
+            os.rmdir(dirpath)
@@ -0,0 +1,144 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+from inline_markdown import text_to_textnodes
+from markdown_blocks import markdown_to_flat_document
+
+
+# Size (characters) of each generated adversarial input
+DEFAULT_SIZE = 100_000
+
+# name -> (input builder taking a size, time ceiling in seconds at DEFAULT_SIZE).
+# Ceilings leave a wide margin over a linear parser; a quadratic one blows through them.
+ADVERSARIAL_CORPUS: Dict[str, Tuple[Callable[[int], str], float]] = {
+    "unclosed_brackets":    (lambda n: "[" * n, 1.5),
+    "unclosed_images":      (lambda n: "![" * (n // 2), 1.5),
+    "brackets_then_link":   (lambda n: "[" * n + "a](u)", 1.5),
+    "nested_brackets":      (lambda n: "[" * (n // 2) + "]" * (n // 2) + "(u)", 1.5),
+    "unfollowed_pairs":     (lambda n: "[a]" * (n // 3), 1.5),
+    "unbalanced_url_parens": (lambda n: "[a](" + "(" * n, 1.5),
+    "nested_url_parens":    (lambda n: "[a](" + "(" * (n // 2) + ")" * (n // 2), 1.5),
+    "asterisk_run":         (lambda n: "*" * n, 1.5),
+    "underscore_run":       (lambda n: "_" * n, 1.5),
+    "tilde_run":            (lambda n: "~" * n, 1.5),
+    "backtick_run":         (lambda n: "`" * n, 1.5),
+    "unclosed_bold":        (lambda n: "**a" * (n // 3), 1.5),
+    "alternating_italic":   (lambda n: "*a" * (n // 2), 1.5),
+    "unclosed_code_stars":  (lambda n: "`a" + "*" * n, 1.5),
+    "mixed_delimiters":     (lambda n: "*_[`~" * (n // 5), 1.5),
+    "many_links":           (lambda n: "[a](b) " * (n // 7), 1.5),
+    "linked_images":        (lambda n: "[![a](b)](c)" * (n // 12), 1.5),
+    "plain_words":          (lambda n: "word " * (n // 5), 1.5),
+}
+
+
+# name -> (input builder taking a size, ceiling on the peak traced memory of rendering
+# the input, in bytes per input character). Ceilings are about twice the measured peaks,
+# so a change that copies every block or line again fails them.
+MEMORY_CORPUS: Dict[str, Tuple[Callable[[int], str], float]] = {
+    "paragraphs":   (lambda n: ("Some **bold** and _italic_ prose with a [link](/x) in it.\n" * 3
+                                + "\n") * (n // 178), 25.0),
+    "code_blocks":  (lambda n: ("```\n" + "x = compute(1, 2)  # comment\n" * 20 + "```\n\n")
+                     * (n // 609), 4.0),
+    "lists":        (lambda n: ("- item with `code`\n" * 10 + "\n") * (n // 191), 40.0),
+    "headings":     (lambda n: "## A heading\n\n" * (n // 14), 25.0),
+    "links":        (lambda n: "[a](b) " * (n // 7), 120.0),
+    "one_block":    (lambda n: "word " * (n // 5), 30.0),
+}
+
+
+def run_adversarial(size: int = DEFAULT_SIZE,
+                    names: Optional[List[str]] = None) -> List[Tuple[str, float, float]]:
+    """Parse every adversarial input once.
+        Args: size - Characters per input; ceilings scale linearly with it.
+              names - Subset of ADVERSARIAL_CORPUS to run (all if None).
+        Returns: list of (name, elapsed seconds, ceiling seconds)."""
+    results = []
+    for name in names or list(ADVERSARIAL_CORPUS):
+        build, ceiling = ADVERSARIAL_CORPUS[name]
+        text = build(size)
+        start = time.perf_counter()
+        text_to_textnodes(text)
+        elapsed = time.perf_counter() - start
+        results.append((name, elapsed, ceiling * size / DEFAULT_SIZE))
+    return results
+
+
+def run_memory(size: int = DEFAULT_SIZE,
+               names: Optional[List[str]] = None) -> List[Tuple[str, int, float]]:
+    """Render every memory benchmark input once under tracemalloc.
+        Args: size - Characters per input.
+              names - Subset of MEMORY_CORPUS to run (all if None).
+        Returns: list of (name, peak traced bytes of the render, ceiling in bytes)."""
+    results = []
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        for name in names or list(MEMORY_CORPUS):
+            build, ceiling = MEMORY_CORPUS[name]
+            text = build(size)
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            markdown_to_flat_document(text).to_html()
+            results.append((name, tracemalloc.get_traced_memory()[1] - start, ceiling * len(text)))
+    finally:
+        if started:
+            tracemalloc.stop()
+    return results
+
+
+def run_content(content_dir: str, repeat: int = 20) -> Tuple[int, float]:
+    """Render every markdown file under content_dir repeat times.
+        Returns: (pages rendered, elapsed seconds)."""
+    sources = []
+    for root, _, files in os.walk(content_dir):
+        for name in files:
+            if name.endswith(".md"):
+                with open(os.path.join(root, name)) as md_file:
+                    sources.append(md_file.read())
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for markdown in sources:
+            markdown_to_flat_document(markdown).to_html()
+    return len(sources) * repeat, time.perf_counter() - start
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parser benchmarks with enforced time and "
+                                                 "memory ceilings.")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE,
+                        help=f"characters per adversarial input (default: {DEFAULT_SIZE})")
+    parser.add_argument("--content", default="./content",
+                        help="content directory for the throughput benchmark")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    print(f"Adversarial inputs ({args.size} chars each):")
+    for name, elapsed, ceiling in run_adversarial(args.size):
+        over = elapsed > ceiling
+        failures += over
+        print(f"  {name:24} {elapsed * 1000:9.1f} ms  (ceiling {ceiling * 1000:.0f} ms)"
+              f"{'  OVER CEILING' if over else ''}")
+
+    print(f"Peak memory of rendering ({args.size} chars each):")
+    for name, peak, ceiling in run_memory(args.size):
+        over = peak > ceiling
+        failures += over
+        print(f"  {name:24} {peak / 1024:9.1f} KiB  (ceiling {ceiling / 1024:.0f} KiB)"
+              f"{'  OVER CEILING' if over else ''}")
+
+    if os.path.isdir(args.content):
+        pages, elapsed = run_content(args.content)
+        print(f"Content throughput: {pages} pages in {elapsed:.3f}s ({pages / elapsed:.0f} pages/s)")
+
+    if failures:
+        print(f"{failures} input(s) exceeded their time or memory ceiling")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from pageindex import STATE_DIR_NAME
+from workers import WorkerPool, STATUS_OK
+
+
+GZIP_STATE_NAME = "gzip.json"
+SIDECAR_SUFFIX = ".gz"
+
+DEFAULT_GZIP_LEVEL = 9
+# Below this size the gzip header and a second request path outweigh the savings
+DEFAULT_GZIP_MIN_SIZE = 256
+DEFAULT_GZIP_EXTENSIONS = (".html",)
+
+
+def sidecar_path(path: str) -> str:
+    return path + SIDECAR_SUFFIX
+
+
+def state_path(output_dir: str) -> str:
+    return os.path.join(output_dir, STATE_DIR_NAME, GZIP_STATE_NAME)
+
+
+def load_state(output_dir: str) -> Dict[str, str]:
+    """Returns: POSIX relative path -> SHA-256 of the content its sidecar was compressed from."""
+    try:
+        with open(state_path(output_dir)) as state_file:
+            return json.load(state_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_state(output_dir: str, state: Dict[str, str]) -> None:
+    path = state_path(output_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as state_file:
+        json.dump(state, state_file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def sidecars(output_dir: str) -> Set[str]:
+    """Returns: POSIX relative paths of the sidecars recorded for output_dir."""
+    return {sidecar_path(path) for path in load_state(output_dir)}
+
+
+def compress_file(path: str, previous_hash: Optional[str],
+                  level: int, min_size: int) -> Tuple[Optional[str], bool]:
+    """Writes path + ".gz" unless its sidecar already holds the current content.
+        The sidecar is deterministic (no timestamp in the gzip header) and replaced atomically.
+        Args: path - File to compress.
+              previous_hash - SHA-256 the existing sidecar was compressed from, if any.
+              level - gzip compression level (1-9).
+              min_size - Files smaller than this get no sidecar.
+        Returns: (SHA-256 of the content or None if below min_size, whether it was compressed)."""
+    sidecar = sidecar_path(path)
+    with open(path, "rb") as source_file:
+        data = source_file.read()
+    if len(data) < min_size:
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+        return None, False
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == previous_hash and os.path.exists(sidecar):
+        return digest, False
+
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as sidecar_file:
+        sidecar_file.write(gzip.compress(data, compresslevel=level, mtime=0))
+    os.replace(tmp_path, sidecar)
+    return digest, True
+
+
+def _candidates(output_dir: str, extensions: Iterable[str]) -> List[str]:
+    suffixes = tuple(extension.lower() for extension in extensions)
+    paths = []
+    for root, dirs, files in os.walk(output_dir):
+        if root == output_dir:
+            dirs[:] = [name for name in dirs if name != STATE_DIR_NAME]
+        for name in files:
+            if name.lower().endswith(suffixes):
+                paths.append(os.path.relpath(os.path.join(root, name), output_dir).replace(os.sep, '/'))
+    return sorted(paths)
+
+
+def precompress(output_dir: str, extensions: Iterable[str] = DEFAULT_GZIP_EXTENSIONS,
+                level: int = DEFAULT_GZIP_LEVEL, min_size: int = DEFAULT_GZIP_MIN_SIZE,
+                jobs: int = 1) -> Tuple[int, int]:
+    """Brings the .gz sidecars of every file with one of extensions up to date,
+        compressing in jobs worker processes. Sidecars of files that are gone are deleted.
+        Returns: (files compressed, files whose sidecar was already current)."""
+    if not 1 <= level <= 9:
+        raise ValueError(f"gzip level must be between 1 and 9, got {level}")
+    previous = load_state(output_dir)
+    tasks = [(os.path.join(output_dir, path), previous.get(path), level, min_size)
+             for path in _candidates(output_dir, extensions)]
+
+    if jobs > 1 and len(tasks) > 1:
+        results = []
+        with WorkerPool(compress_file, min(jobs, len(tasks))) as pool:
+            for task, status, value, _ in pool.run(tasks):
+                if status != STATUS_OK:
+                    raise RuntimeError(f"Compressing {task[0]} failed: {value}")
+                results.append((task[0], value))
+    else:
+        results = [(task[0], compress_file(*task)) for task in tasks]
+
+    state: Dict[str, str] = {}
+    compressed = unchanged = 0
+    for path, (digest, written) in results:
+        if digest is None:
+            continue
+        state[os.path.relpath(path, output_dir).replace(os.sep, '/')] = digest
+        compressed += written
+        unchanged += not written
+
+    for path in set(previous) - set(state):
+        if os.path.exists(sidecar := os.path.join(output_dir, sidecar_path(path))):
+            os.remove(sidecar)
+    _write_state(output_dir, state)
+    return compressed, unchanged
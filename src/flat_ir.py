@@ -0,0 +1,196 @@
+from array import array
+from typing import Dict, List, Optional
+from htmlnode import (HTMLNode, LeafNode, ParentNode, PRESERVE_WHITESPACE, TEXT_TYPE_TAGS,
+                      attribute_to_html, html_escape, minify_text, void_end)
+from textnode import TextNode, TextType
+
+
+# Opcodes of the flat event list
+OPEN = 0     # arg: tag   - start tag, ATTR/VALUE pairs that follow belong to it
+VOID = 1     # arg: tag   - self-closing tag, ATTR/VALUE pairs that follow belong to it
+ATTR = 2     # arg: name  - attribute name, always followed by VALUE
+VALUE = 3    # arg: value - attribute value (unescaped)
+TEXT = 4     # arg: text  - text content (unescaped)
+CLOSE = 5    # arg: tag   - end tag
+
+
+class FlatDocument:
+    """Compact intermediate representation of a rendered document.
+        The document is a flat list of open-tag, text and close-tag events stored as
+        two parallel arrays: opcodes and indices into a string table.
+        Args:
+            Optional[ops] - Opcode of each event
+            Optional[args] - String table index of each event
+            Optional[strings] - The string table (tags, attribute names/values and text)
+    """
+
+    def __init__(self, ops: Optional[array] = None,
+                 args: Optional[array] = None,
+                 strings: Optional[List[str]] = None) -> None:
+        self.ops = ops if ops is not None else array('B')
+        self.args = args if args is not None else array('I')
+        self.strings = strings if strings is not None else []
+        self._index: Dict[str, int] = {s: i for i, s in enumerate(self.strings)}
+
+    def __repr__(self) -> str:
+        return f"FlatDocument(events={len(self.ops)}, strings={len(self.strings)})"
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def _intern(self, text: str) -> int:
+        if (idx := self._index.get(text)) is None:
+            idx = self._index[text] = len(self.strings)
+            self.strings.append(text)
+        return idx
+
+    def _emit(self, op: int, text: str) -> None:
+        self.ops.append(op)
+        self.args.append(self._intern(text))
+
+    def _emit_props(self, props: Optional[Dict[str, str]]) -> None:
+        if props:
+            for key, value in props.items():
+                self._emit(ATTR, key)
+                self._emit(VALUE, value)
+
+    def open(self, tag: str, props: Optional[Dict[str, str]] = None) -> None:
+        self._emit(OPEN, tag)
+        self._emit_props(props)
+
+    def void(self, tag: str, props: Optional[Dict[str, str]] = None) -> None:
+        self._emit(VOID, tag)
+        self._emit_props(props)
+
+    def text(self, text: str) -> None:
+        if text:
+            self._emit(TEXT, text)
+
+    def close(self, tag: str) -> None:
+        self._emit(CLOSE, tag)
+
+    def inline(self, text_nodes: List[TextNode]) -> None:
+        for text_node in text_nodes:
+            emit_text_node(self, text_node)
+
+    def to_html(self, minify: bool = False) -> str:
+        """Serialize the event list to an HTML string in a single loop.
+           Args: minify - Collapse whitespace outside <pre>/<code>, drop optional attribute
+                          quotes and the '/' of void tags in the same pass."""
+        strings = self.strings
+        escaped: Dict[int, str] = {}
+        collapsed: Dict[int, str] = {}
+        out: List[str] = []
+        append = out.append
+        pending = ''    # '>' or the void tag end still owed by the last start tag
+        attr_name = ''
+        preserve_depth = 0
+
+        for op, arg in zip(self.ops, self.args):
+            if op == ATTR:
+                if minify:
+                    attr_name = strings[arg]
+                else:
+                    append(f' {strings[arg]}="')
+                continue
+            if op == VALUE:
+                if minify:
+                    append(attribute_to_html(attr_name, html_escape(strings[arg]), True))
+                else:
+                    append(html_escape(strings[arg]))
+                    append('"')
+                continue
+            if pending:
+                append(pending)
+                pending = ''
+            if op == TEXT:
+                if minify and not preserve_depth:
+                    if (text := collapsed.get(arg)) is None:
+                        text = collapsed[arg] = minify_text(strings[arg])
+                elif (text := escaped.get(arg)) is None:
+                    text = escaped[arg] = html_escape(strings[arg])
+                append(text)
+            elif op == OPEN:
+                append(f"<{strings[arg]}")
+                pending = '>'
+                if strings[arg] in PRESERVE_WHITESPACE:
+                    preserve_depth += 1
+            elif op == VOID:
+                append(f"<{strings[arg]}")
+                pending = void_end(minify)
+            elif op == CLOSE:
+                append(f"</{strings[arg]}>")
+                if strings[arg] in PRESERVE_WHITESPACE and preserve_depth:
+                    preserve_depth -= 1
+            else:
+                raise ValueError(f"Unknown opcode: {op}")
+
+        if pending:
+            append(pending)
+        return ''.join(out)
+
+    def to_html_node(self) -> HTMLNode:
+        """Build an HTMLNode tree view of the document on demand.
+           Returns: the single root node of the document."""
+        strings = self.strings
+        root = ParentNode(tag="root", children=[])
+        stack: List[ParentNode] = [root]
+        current: HTMLNode = root    # node receiving ATTR/VALUE events
+        attr_name = ''
+
+        for op, arg in zip(self.ops, self.args):
+            if op == OPEN:
+                current = ParentNode(tag=strings[arg], children=[])
+                stack[-1].children.append(current)  # type: ignore[union-attr]
+                stack.append(current)
+            elif op == VOID:
+                current = LeafNode(tag=strings[arg], value="")
+                stack[-1].children.append(current)  # type: ignore[union-attr]
+            elif op == ATTR:
+                attr_name = strings[arg]
+            elif op == VALUE:
+                if current.props is None:
+                    current.props = {}
+                current.props[attr_name] = strings[arg]
+            elif op == TEXT:
+                stack[-1].children.append(LeafNode(tag=None, value=strings[arg]))  # type: ignore[union-attr]
+            elif op == CLOSE:
+                if len(stack) == 1 or stack[-1].tag != strings[arg]:
+                    raise ValueError(f"Unbalanced close tag: {strings[arg]}")
+                stack.pop()
+            else:
+                raise ValueError(f"Unknown opcode: {op}")
+
+        if len(stack) != 1:
+            raise ValueError(f"Unclosed tag: {stack[-1].tag}")
+        if len(root.children) != 1:  # type: ignore[arg-type]
+            raise ValueError("FlatDocument must have a single root element")
+        return root.children[0]  # type: ignore[index]
+
+
+def emit_text_node(doc: FlatDocument, text_node: TextNode) -> None:
+    """Append the events of a TextNode (and its nested children) to a FlatDocument."""
+    text_type = text_node.text_type
+    if text_type == TextType.TEXT:
+        doc.text(text_node.text)
+        return
+    if text_type == TextType.IMAGE:
+        if text_node.link is None:
+            raise ValueError("Image text type must have a URL")
+        doc.void("img", {"src": text_node.link, "alt": text_node.text})
+        return
+    if (tag := TEXT_TYPE_TAGS.get(text_type)) is None:
+        raise ValueError(f"Unhandled text type: {text_type}")
+
+    if text_type == TextType.LINK:
+        if text_node.link is None:
+            raise ValueError("Link text type must have a URL")
+        doc.open(tag, {"href": text_node.link})
+    else:
+        doc.open(tag)
+    if text_node.children and text_type != TextType.CODE:
+        for child in text_node.children:
+            emit_text_node(doc, child)
+    else:
+        doc.text(text_node.text)
+    doc.close(tag)
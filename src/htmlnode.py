@@ -1,3 +1,4 @@
+import re
 from typing import Optional, List, Dict
 from textnode import TextNode, TextType
 
@@ -8,6 +9,23 @@ VOID_ELEMENTS = frozenset(
      'input', 'link', 'meta', 'source', 'track', 'wbr']
 )
 
+# Elements whose text is rendered verbatim; minification leaves their content untouched
+PRESERVE_WHITESPACE = frozenset(['pre', 'code', 'textarea', 'script', 'style'])
+
+# HTML whitespace (not \s, which would also collapse non-breaking spaces)
+_WHITESPACE_RUN = re.compile(r'[ \t\n\r\f]+')
+
+# Attribute values that may be written without quotes. Root-relative URLs keep their quotes
+# because basepath and asset rewriting match on 'href="/' and 'src="/'
+_UNQUOTED_VALUE = re.compile(r'[^ \t\n\r\f"\'=<>`/{][^ \t\n\r\f"\'=<>`]*')
+
+# HTML tag of each formatting TextType (images are handled separately as void <img>)
+TEXT_TYPE_TAGS = {TextType.BOLD: "b",
+                  TextType.ITALIC: "i",
+                  TextType.CODE: "code",
+                  TextType.STRIKETHROUGH: "s",
+                  TextType.LINK: "a"}
+
 
 def html_escape(text: str) -> str:
     """Escape special HTML characters"""
@@ -19,6 +37,42 @@ def html_escape(text: str) -> str:
             .replace("'", '&#x27;'))
 
 
+def collapse_whitespace(text: str) -> str:
+    """Collapse runs of HTML whitespace to one space, which renders identically outside <pre>."""
+    return _WHITESPACE_RUN.sub(' ', text)
+
+
+def minify_text(text: str) -> str:
+    """Escape text content for minified output: whitespace collapsed, and only the
+       characters that are special in text (not quotes) escaped."""
+    return (_WHITESPACE_RUN.sub(' ', text)
+            .replace('&', '&amp;')
+            .replace('<', '&lt;')
+            .replace('>', '&gt;'))
+
+
+def attribute_to_html(key: str, escaped_value: str, minify: bool = False) -> str:
+    """Render ' key="value"' for an already escaped value, without the quotes when
+       minifying and the value cannot be misparsed unquoted."""
+    if minify and _UNQUOTED_VALUE.fullmatch(escaped_value):
+        return f' {key}={escaped_value}'
+    return f' {key}="{escaped_value}"'
+
+
+def props_to_html(props: Optional[Dict[str, str]], minify: bool = False) -> str:
+    """Render attributes as ' key="value"' pairs with escaped values"""
+    if not props:
+        return ''
+    if minify:
+        return ''.join(attribute_to_html(key, html_escape(value), True) for key, value in props.items())
+    return ''.join(f' {key}="{html_escape(value)}"' for key, value in props.items())
+
+
+def void_end(minify: bool = False) -> str:
+    """End of a void element's start tag: ' />' or, minified, the HTML5 '>'."""
+    return '>' if minify else ' />'
+
+
 class HTMLNode:
     """Base class representing an HTML node.
         Args:
@@ -41,13 +95,13 @@ class HTMLNode:
     def __repr__(self) -> str:
         return f"HTMLNode(tag={self.tag}, value={self.value}, children={self.children}, props={self.props})"
 
-    def to_html(self) -> str:
+    def to_html(self, minify: bool = False, preserve_whitespace: bool = False) -> str:
+        """Args: minify - Collapse insignificant whitespace and drop optional quotes.
+                 preserve_whitespace - Set inside <pre>/<code> etc. to keep text verbatim."""
         raise NotImplementedError("to_html method must be implemented by subclasses")
     
-    def props_to_html(self) -> str:
-        if not self.props:
-            return ''
-        return ''.join(f' {key}="{html_escape(value)}"' for key, value in self.props.items())
+    def props_to_html(self, minify: bool = False) -> str:
+        return props_to_html(self.props, minify)
 
 
 class LeafNode(HTMLNode):
@@ -64,16 +118,20 @@ class LeafNode(HTMLNode):
     def __repr__(self) -> str:
         return f"LeafNode(tag={self.tag}, value={self.value}, props={self.props})"
     
-    def to_html(self) -> str:
+    def to_html(self, minify: bool = False, preserve_whitespace: bool = False) -> str:
         if self.value is None:
             raise ValueError("LeafNode must have a value to convert to HTML")
+        if minify and not preserve_whitespace and self.tag not in PRESERVE_WHITESPACE:
+            content = minify_text(self.value)
+        else:
+            content = html_escape(self.value)
         if not self.tag:
-            return html_escape(self.value)
+            return content
 
         if self.tag in VOID_ELEMENTS:
-            return f"<{self.tag}{self.props_to_html()} />"
+            return f"<{self.tag}{self.props_to_html(minify)}{void_end(minify)}"
 
-        return f"<{self.tag}{self.props_to_html()}>{html_escape(self.value)}</{self.tag}>"
+        return f"<{self.tag}{self.props_to_html(minify)}>{content}</{self.tag}>"
 
 
 class ParentNode(HTMLNode):
@@ -90,52 +148,107 @@ class ParentNode(HTMLNode):
     def __repr__(self) -> str:
         return f"ParentNode(tag={self.tag}, children={self.children}, props={self.props})"
     
-    def to_html(self) -> str:
+    def to_html(self, minify: bool = False, preserve_whitespace: bool = False) -> str:
         if self.tag is None:
             raise ValueError("ParentNode must have a tag to convert to HTML")
         if self.children is None:
             raise ValueError("ParentNode must have children to convert to HTML")
-        return (f"<{self.tag}{self.props_to_html()}>"
-                f"{''.join(child.to_html() for child in self.children)}"
+        preserve_whitespace = preserve_whitespace or self.tag in PRESERVE_WHITESPACE
+        return (f"<{self.tag}{self.props_to_html(minify)}>"
+                f"{''.join(child.to_html(minify, preserve_whitespace) for child in self.children)}"
                 f"</{self.tag}>")
 
 
-def text_node_to_html_node(text_node: TextNode) -> LeafNode | ParentNode:
-    """Convert a TextNode to an HTML LeafNode."""
-    if text_node.text_type == TextType.TEXT:
-        return LeafNode(tag=None, value=text_node.text)
-    elif text_node.text_type == TextType.BOLD:
-        if text_node.children:
-            return ParentNode(tag="b",
-                children=[text_node_to_html_node(child) for child in text_node.children])
-        else:
-            return LeafNode(tag="b", value=text_node.text)
-    elif text_node.text_type == TextType.ITALIC:
-        if text_node.children:
-            return ParentNode(tag="i",
-                children=[text_node_to_html_node(child) for child in text_node.children])
-        else:
-            return LeafNode(tag="i", value=text_node.text)
-    elif text_node.text_type == TextType.CODE:
-        return LeafNode(tag="code", value=text_node.text)
-    elif text_node.text_type == TextType.STRIKETHROUGH:
-        if text_node.children:
-            return ParentNode(tag="s",
-                children=[text_node_to_html_node(child) for child in text_node.children])
+class HTMLWriter:
+    """Append-only HTML output with the same event interface as FlatDocument
+       (open/void/text/close/inline), serializing straight into a string buffer.
+        Args:
+            Optional[minify] - Collapse insignificant whitespace and drop optional quotes
+    """
+
+    def __init__(self, minify: bool = False) -> None:
+        self.parts: List[str] = []
+        self.minify = minify
+        self._preserve_depth = 0    # Open elements in PRESERVE_WHITESPACE
+
+    def __repr__(self) -> str:
+        return f"HTMLWriter(parts={len(self.parts)}, minify={self.minify})"
+
+    def open(self, tag: str, props: Optional[Dict[str, str]] = None) -> None:
+        self.parts.append(f"<{tag}{props_to_html(props, self.minify)}>")
+        if tag in PRESERVE_WHITESPACE:
+            self._preserve_depth += 1
+
+    def void(self, tag: str, props: Optional[Dict[str, str]] = None) -> None:
+        self.parts.append(f"<{tag}{props_to_html(props, self.minify)}{void_end(self.minify)}")
+
+    def text(self, text: str) -> None:
+        if self.minify and not self._preserve_depth:
+            self.parts.append(minify_text(text))
         else:
-            return LeafNode(tag="s", value=text_node.text)
-    elif text_node.text_type == TextType.LINK:
+            self.parts.append(html_escape(text))
+
+    def close(self, tag: str) -> None:
+        self.parts.append(f"</{tag}>")
+        if tag in PRESERVE_WHITESPACE and self._preserve_depth:
+            self._preserve_depth -= 1
+
+    def inline(self, text_nodes: List[TextNode]) -> None:
+        minify = self.minify and not self._preserve_depth
+        self.parts.extend(text_node_to_html(text_node, minify) for text_node in text_nodes)
+
+    def to_html(self) -> str:
+        return ''.join(self.parts)
+
+
+def text_node_to_html(text_node: TextNode, minify: bool = False) -> str:
+    """Serialize a TextNode (and its nested children) directly to HTML,
+       without building intermediate HTMLNode objects.
+       With minify, whitespace is collapsed outside code and attribute quotes are optional."""
+    text_type = text_node.text_type
+    if text_type == TextType.TEXT:
+        return minify_text(text_node.text) if minify else html_escape(text_node.text)
+    if text_type == TextType.IMAGE:
+        if text_node.link is None:
+            raise ValueError("Image text type must have a URL")
+        return (f'<img{attribute_to_html("src", html_escape(text_node.link), minify)}'
+                f'{attribute_to_html("alt", html_escape(text_node.text), minify)}{void_end(minify)}')
+    if (tag := TEXT_TYPE_TAGS.get(text_type)) is None:
+        raise ValueError(f"Unhandled text type: {text_type}")
+
+    if text_type == TextType.LINK:
         if text_node.link is None:
             raise ValueError("Link text type must have a URL")
-        if text_node.children:
-            return ParentNode(tag="a",
-                children=[text_node_to_html_node(child) for child in text_node.children],
-                props={"href": text_node.link})
-        else:
-            return LeafNode(tag="a", value=text_node.text, props={"href": text_node.link})
-    elif text_node.text_type == TextType.IMAGE:
+        start_tag = f'<a{attribute_to_html("href", html_escape(text_node.link), minify)}>'
+    else:
+        start_tag = f"<{tag}>"
+    if text_node.children and text_type != TextType.CODE:
+        content = ''.join(text_node_to_html(child, minify) for child in text_node.children)
+    elif minify and text_type != TextType.CODE:
+        content = minify_text(text_node.text)
+    else:
+        content = html_escape(text_node.text)
+    return f"{start_tag}{content}</{tag}>"
+
+
+def text_node_to_html_node(text_node: TextNode) -> LeafNode | ParentNode:
+    """Convert a TextNode to an HTML LeafNode, or a ParentNode when it has nested children."""
+    text_type = text_node.text_type
+    if text_type == TextType.TEXT:
+        return LeafNode(tag=None, value=text_node.text)
+    if text_type == TextType.IMAGE:
         if text_node.link is None:
             raise ValueError("Image text type must have a URL")
         return LeafNode(tag="img", value="", props={"src": text_node.link, "alt": text_node.text})
-    
-    raise ValueError(f"Unhandled text type: {text_node.text_type}")
\ No newline at end of file
+    if (tag := TEXT_TYPE_TAGS.get(text_type)) is None:
+        raise ValueError(f"Unhandled text type: {text_type}")
+
+    props = None
+    if text_type == TextType.LINK:
+        if text_node.link is None:
+            raise ValueError("Link text type must have a URL")
+        props = {"href": text_node.link}
+    if text_node.children and text_type != TextType.CODE:
+        return ParentNode(tag=tag,
+            children=[text_node_to_html_node(child) for child in text_node.children], props=props)
+    return LeafNode(tag=tag, value=text_node.text, props=props)
@@ -1,5 +1,6 @@
 import re
-from typing import List, Tuple, Optional
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Optional
 from textnode import TextNode, TextType
 
 DELIMETERS = {"**": TextType.BOLD,
@@ -11,100 +12,177 @@ DELIMETERS = {"**": TextType.BOLD,
               "*": TextType.ITALIC,
               "`": TextType.CODE}
 
+# Characters that can start a delimiter, used to skip plain text in one C-level search
+DELIMITER_START = re.compile(r'[*_~!\[`]')
+BRACKETS = re.compile(r'[\[\]]')
+PARENS = re.compile(r'[()]')
 
-def get_delimiter(text: str) -> Optional[str]:
+# The URL part ([^()]* with at most one level of balanced parentheses) cannot backtrack
+# super-linearly: every repetition is anchored on a literal '(' and the classes exclude parens
+IMAGE_PATTERN = re.compile(r'!\[([^\[\]]*)\]\(([^()]*(?:\([^()]*\)[^()]*)*)\)')
+LINK_PATTERN = re.compile(r'\[([^\[\]]*)\]\(([^()]*(?:\([^()]*\)[^()]*)*)\)')
+LINKED_IMAGE_PATTERN = re.compile(r'\[(!\[[^\[\]]*\]\([^()]*\))\]\(([^()]*(?:\([^()]*\)[^()]*)*)\)')
+
+
+def get_delimiter(text: str, pos: int = 0) -> Optional[str]:
     """Args: text - The text to check for delimiters.
+             pos - Position in text to check at.
        Returns: The first matching delimiter found, or None if none found."""
     for delim in DELIMETERS.keys():
-        if text.startswith(delim):
+        if text.startswith(delim, pos):
             return delim
     return None
 
 
-def get_closing_delim_idx(text: str, delim: str) -> Optional[int]:
-    """Find closing delimiter index, handling nested brackets for links/images."""
-    # Simple case: _, *, ~~, `
-    if delim not in ("[", "![", "**", "__"):
-        return idx if (idx := text.find(delim)) != -1 else None
-    
-    # Bold delimiters: ** and __ (handle overlapping like ***)
-    if delim in ("**", "__"):
-        if (idx := text.find(delim)) == -1:
+class InlineScanner:
+    """Delimiter matching over one string in O(n log n) total time.
+        Each query starts at an absolute position, so the remainder of the text never has
+        to be sliced and rescanned. Plain delimiters remember their next occurrence, and
+        bracket/paren matching for links and images is precomputed once with a stack.
+        Args: text - The inline markdown text to scan.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self._next: Dict[str, int] = {}     # delimiter -> last find() result
+        self._brackets: Optional[List[int]] = None
+        self._bracket_close: List[int] = []
+        self._paren_close: Dict[int, int] = {}
+
+    def __repr__(self) -> str:
+        return f"InlineScanner(length={len(self.text)})"
+
+    def _find(self, delim: str, pos: int) -> int:
+        """text.find(delim, pos), reusing the previous result while it is still ahead of pos."""
+        if (cached := self._next.get(delim)) is not None and (cached == -1 or cached >= pos):
+            return cached
+        self._next[delim] = found = self.text.find(delim, pos)
+        return found
+
+    def _index_brackets(self) -> None:
+        """Precompute, for every bracket, where a link/image scan starting there finds
+        its closing ']' (one that is followed by '(' and unmatched since the start)."""
+        text = self.text
+        brackets = [match.start() for match in BRACKETS.finditer(text)]
+        match_of = [-1] * len(brackets)
+        stack: List[int] = []
+        for k, pos in enumerate(brackets):
+            if text[pos] == '[':
+                stack.append(k)
+            elif stack:
+                match_of[stack.pop()] = k
+
+        # close[k]: result of scanning with depth 0 from brackets[k]. Matched pairs are
+        # skipped as a whole, a ']' at depth 0 either is followed by '(' or resets the scan,
+        # and an unmatched '[' keeps the depth above 0 for the rest of the text.
+        close = [-1] * (len(brackets) + 1)
+        for k in range(len(brackets) - 1, -1, -1):
+            pos = brackets[k]
+            if text[pos] == ']':
+                close[k] = pos if text.startswith('(', pos + 1) else close[k + 1]
+            else:
+                close[k] = close[match_of[k] + 1] if match_of[k] != -1 else -1
+        self._brackets, self._bracket_close = brackets, close
+
+        stack = []
+        for match in PARENS.finditer(text):
+            if match.group() == '(':
+                stack.append(match.start())
+            elif stack:
+                self._paren_close[stack.pop()] = match.start()
+
+    def _link_close(self, pos: int) -> Optional[int]:
+        """Returns: index of the ')' closing a link/image whose text starts at pos."""
+        if self._brackets is None:
+            self._index_brackets()
+        assert self._brackets is not None
+        close_bracket = self._bracket_close[bisect_left(self._brackets, pos)]
+        if close_bracket == -1:
+            return None
+        return self._paren_close.get(close_bracket + 1)
+
+    def closing_delim_idx(self, pos: int, delim: str) -> Optional[int]:
+        """Find the closing delimiter for content starting at pos, handling nested
+           brackets for links/images and overlapping runs like *** for bold.
+           Returns: absolute index of the closing delimiter (the ')' for links/images)."""
+        if delim in ("[", "!["):
+            return self._link_close(pos)
+        if (idx := self._find(delim, pos)) == -1:
             return None
-        # Check for overlapping: *** has ** at pos 0 and 1
-        if idx + 1 < len(text) and text[idx+1:idx+1+len(delim)] == delim:
+        # Bold delimiters: check for overlapping, *** has ** at pos 0 and 1
+        if delim in ("**", "__") and self.text.startswith(delim, idx + 1):
             after_offset = idx + 1 + len(delim)
-            if after_offset >= len(text) or text[after_offset] != delim[0]:
+            if after_offset >= len(self.text) or self.text[after_offset] != delim[0]:
                 return idx + 1
         return idx
-    
-    # Links and images: [ and ![ (handle nesting)
-    depth, close_bracket_idx = 0, -1
-    for i, char in enumerate(text):
-        depth += (char == '[') - (char == ']')
-        if depth < 0 and text[i+1:i+2] == '(':
-            close_bracket_idx = i
-            break
-        elif depth < 0:
-            depth = 0
-    
-    if close_bracket_idx == -1:
+
+    def content_and_link(self, start: int, end: int, delim: str) -> Tuple[Optional[str], Optional[str]]:
+        """Args: start, end - bounds of the full delimited text (e.g., '**bold**' or '[text](url)').
+           Returns: (content, link) tuple."""
+        if delim == "![":
+            return extract_markdown_images(self.text, start, end)
+        if delim == "[":
+            return extract_markdown_links(self.text, start, end)
+        return (self.text[start + len(delim):end - len(delim)], None)
+
+    def find_first_match(self, pos: int = 0) -> Tuple[str, int, int, Optional[str], Optional[str]] | None:
+        """Find first valid delimiter match at or after pos.
+           Returns: (delim, start_idx, end_idx, content, link) or None if no match."""
+        text = self.text
+        while (candidate := DELIMITER_START.search(text, pos)) is not None:
+            start_idx = candidate.start()
+            pos = start_idx + 1
+            if (delim := get_delimiter(text, start_idx)) is None:
+                continue  # No delimiter at this position
+
+            if (close_idx := self.closing_delim_idx(start_idx + len(delim), delim)) is None:
+                continue  # No closing delimiter found
+
+            end_idx = close_idx + 1 if delim in ("[", "![") else close_idx + len(delim)
+            content, link = self.content_and_link(start_idx, end_idx, delim)
+            if not content and not link:
+                continue  # Nothing between delimiters
+
+            return (delim, start_idx, end_idx, content, link)
+
         return None
-    
-    paren_depth = 1
-    for i, char in enumerate(text[close_bracket_idx+2:], close_bracket_idx+2):
-        paren_depth += (char == '(') - (char == ')')
-        if paren_depth == 0:
-            return i
-    return None
 
 
+def get_closing_delim_idx(text: str, delim: str) -> Optional[int]:
+    """Find closing delimiter index, handling nested brackets for links/images."""
+    return InlineScanner(text).closing_delim_idx(0, delim)
 
-def extract_markdown_images(text: str) -> Tuple[Optional[str], Optional[str]]:
-    """Args: text - The markdown text starting with ![.
+
+def extract_markdown_images(text: str, pos: int = 0,
+                            endpos: Optional[int] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Args: text - The markdown text starting with ![ (at pos, ending at endpos).
        Returns: A tuple (alt_text, url) or (None, None) if not found."""
-    match = re.match(r'!\[([^\[\]]*)\]\(([^()]*(?:\([^()]*\)[^()]*)*)\)', text)
+    match = IMAGE_PATTERN.match(text, pos, len(text) if endpos is None else endpos)
     return (match.group(1), match.group(2)) if match else (None, None)
 
 
-def extract_markdown_links(text: str) -> Tuple[Optional[str], Optional[str]]:    
-    """Args: text - The markdown text starting with [.
+def extract_markdown_links(text: str, pos: int = 0,
+                           endpos: Optional[int] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Args: text - The markdown text starting with [ (at pos, ending at endpos).
        Returns: A tuple (link_text, url) or (None, None) if not found."""
-    if (match := re.match(r'\[([^\[\]]*)\]\(([^()]*(?:\([^()]*\)[^()]*)*)\)', text)) is not None:
+    endpos = len(text) if endpos is None else endpos
+    if (match := LINK_PATTERN.match(text, pos, endpos)) is not None:
         return (match.group(1), match.group(2))
     # Handle nested images inside links
-    match = re.match(r'\[(!\[[^\[\]]*\]\([^()]*\))\]\(([^()]*(?:\([^()]*\)[^()]*)*)\)', text)
+    match = LINKED_IMAGE_PATTERN.match(text, pos, endpos)
     return (match.group(1), match.group(2)) if match else (None, None)
 
 
 def get_content_and_link(text: str, delim: str) -> Tuple[Optional[str], Optional[str]]:
     """Args: text - full delimited text (e.g., '**bold**' or '[text](url)').
        Returns: (content, link) tuple."""
-    return (extract_markdown_images(text) if delim == "![" else
-            extract_markdown_links(text) if delim == "[" else
-            (text[len(delim):-len(delim)], None))
+    return InlineScanner(text).content_and_link(0, len(text), delim)
 
 
 def find_first_match(text: str) -> Tuple[str, int, int, Optional[str], Optional[str]] | None:
     """Find first valid delimiter match in text.
        Returns: (delim, start_idx, end_idx, content, link) or None if no match."""
-    for start_idx in range(len(text)):
-        if (delim := get_delimiter(text[start_idx:])) is None:
-            continue  # No delimiter at this position
-        
-        if (relative_end_idx := get_closing_delim_idx(text[start_idx + len(delim):], delim)) is None:
-            continue  # No closing delimiter found
-        
-        end_idx = (start_idx + len(delim) + relative_end_idx + 1 if delim in ("[", "![") else
-                   start_idx + len(delim) + relative_end_idx + len(delim))
-        
-        content, link = get_content_and_link(text[start_idx:end_idx], delim)
-        if not content and not link:
-            continue  # Nothing between delimiters
-        
-        return (delim, start_idx, end_idx, content, link)
-    
-    return None
+    return InlineScanner(text).find_first_match()
 
 
 def build_text_node(delim: str, content: Optional[str], link: Optional[str], 
@@ -129,14 +207,20 @@ def text_to_textnodes(text: str) -> List[TextNode]:
         Returns: list of TextNodes."""
     if not text:
         return []
-    
-    if (match := find_first_match(text)) is None:
-        return [TextNode(text, TextType.TEXT)]
-    
-    delim, start, end, content, link = match
-    children = text_to_textnodes(content) if (delim != "`") and (content is not None) else None
-    
-    # Return [TextNode before match] + [Formatted TextNode with children] + [Recursivly build rest]
-    return (([TextNode(text[:start], TextType.TEXT)] if start > 0 else []) +
-            [build_text_node(delim, content, link, children)] +
-            text_to_textnodes(text[end:]))
\ No newline at end of file
+
+    scanner = InlineScanner(text)
+    nodes: List[TextNode] = []
+    pos = 0
+    while (match := scanner.find_first_match(pos)) is not None:
+        delim, start, end, content, link = match
+        children = text_to_textnodes(content) if (delim != "`") and (content is not None) else None
+
+        # [TextNode before match] + [Formatted TextNode with children], then continue after the match
+        if start > pos:
+            nodes.append(TextNode(text[pos:start], TextType.TEXT))
+        nodes.append(build_text_node(delim, content, link, children))
+        pos = end
+
+    if pos < len(text):
+        nodes.append(TextNode(text[pos:], TextType.TEXT))
+    return nodes
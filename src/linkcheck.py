@@ -0,0 +1,172 @@
+import json
+import mmap
+import os
+import posixpath
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote
+from flat_ir import ATTR, FlatDocument
+from markdown_blocks import markdown_to_flat_document
+from metadata import parse_front_matter
+from pageindex import STATE_DIR_NAME, PageRecord
+
+
+# Build state holding the internal links of every page with the hash of its source
+LINKS_STATE_NAME = "links.json"
+
+# Attributes whose values are checked
+LINK_ATTRIBUTES = ("href", "src")
+
+# Line reported for a link that cannot be found in its source (e.g. written escaped)
+UNKNOWN_LINE = 0
+
+_SCHEME = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*:')
+
+
+def is_internal(url: str) -> bool:
+    """True for links into the site: root-relative or relative, not bare fragments,
+       protocol-relative or with a scheme (https:, mailto:, data:)."""
+    return bool(url) and not url.startswith(("#", "//")) and not _SCHEME.match(url)
+
+
+def document_links(doc: FlatDocument, links: Optional[List[str]] = None) -> List[str]:
+    """Returns: the internal href and src values of a rendered document, in document order,
+       read from its attribute events."""
+    links = links if links is not None else []
+    ops, args, strings = doc.ops, doc.args, doc.strings
+    for i, op in enumerate(ops):
+        if op == ATTR and strings[args[i]] in LINK_ATTRIBUTES and is_internal(url := strings[args[i + 1]]):
+            links.append(url)
+    return links
+
+
+def locate_links(source: bytes | mmap.mmap, urls: Iterable[str]) -> List[Tuple[str, int]]:
+    """Returns: (url, line) of every url: the line of its link in the markdown source, each
+       occurrence of a url matched to the next "(url" after the previous one."""
+    located = []
+    cursors: Dict[str, int] = {}
+    position, line = 0, 1   # Newlines are counted forward from the last located link
+    for url in urls:
+        found = source.find(b"(" + url.encode('utf-8'), cursors.get(url, 0))
+        if found == -1:
+            located.append((url, UNKNOWN_LINE))
+            continue
+        cursors[url] = found + 1
+        if found < position:
+            position, line = 0, 1
+        line += source[position:found].count(b"\n")
+        position = found
+        located.append((url, line))
+    return located
+
+
+def source_links(path: str) -> List[Tuple[str, int]]:
+    """Returns: the located internal links of a markdown source, rendering it (for pages whose
+       output was reused without a render and that have no recorded links)."""
+    with open(path, "rb") as md_file:
+        source_bytes = md_file.read()
+    _, body_start = parse_front_matter(source_bytes)
+    markdown = source_bytes[body_start:].decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    return locate_links(source_bytes, document_links(markdown_to_flat_document(markdown)))
+
+
+def resolve_link(url: str, page_dest: str) -> Optional[str]:
+    """Returns: the output path (relative, POSIX) an internal link of the page at page_dest
+       points to, without query and fragment, or None for a link to the page itself."""
+    path = unquote(url.split("#", 1)[0].split("?", 1)[0])
+    if not path:
+        return None
+    target = path.lstrip("/") if path.startswith("/") else posixpath.join(posixpath.dirname(page_dest), path)
+    target = posixpath.normpath(target) if target else "."
+    return "" if target == "." else target
+
+
+def link_exists(target: str, outputs: Set[str]) -> bool:
+    """True if a resolved link is served from outputs: the file itself, the index of
+       a directory, or a page by its URL without the .html extension."""
+    return (target in outputs or posixpath.join(target, "index.html") in outputs or
+            f"{target}.html" in outputs)
+
+
+class BrokenLink:
+    """Internal link that points to no generated page or static file.
+        Args:
+            source - Markdown path of the page, relative to the content directory
+            line - Line of the link in the source (UNKNOWN_LINE if it was not found)
+            url - The link as written
+    """
+
+    def __init__(self, source: str, line: int, url: str) -> None:
+        self.source = source
+        self.line = line
+        self.url = url
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, BrokenLink) and
+                (self.source, self.line, self.url) == (other.source, other.line, other.url))
+
+    def __repr__(self) -> str:
+        return f"BrokenLink({self.source}:{self.line}, {self.url})"
+
+    def __str__(self) -> str:
+        return f"{self.source}:{self.line or '?'}: broken link {self.url}"
+
+
+class LinkChecker:
+    """Checks the internal links that pages emitted while rendering against the set of
+        output paths, so no output is read back or crawled.
+        The links of every page are kept in the build state with the hash of its source,
+        so pages reused from the cache without a render are checked without being parsed.
+        Args:
+            state_dir_parent - Output directory whose build state holds the links
+            content_dir - Content directory, to parse pages that have no recorded links
+    """
+
+    def __init__(self, state_dir_parent: str, content_dir: str) -> None:
+        self.state_path = os.path.join(state_dir_parent, STATE_DIR_NAME, LINKS_STATE_NAME)
+        self.content_dir = content_dir
+        self.pages: Dict[str, Dict] = {}     # source -> {"hash", "dest", "links"}
+        self.reparsed = 0
+        try:
+            with open(self.state_path, encoding="utf-8") as state_file:
+                self._previous: Dict[str, Dict] = json.load(state_file)
+        except (FileNotFoundError, ValueError):
+            self._previous = {}
+
+    def __repr__(self) -> str:
+        return f"LinkChecker(pages={len(self.pages)})"
+
+    def add(self, record: PageRecord) -> None:
+        """Adds a page of this build, with the links its render left on record.links.
+           Without them the previous links are reused if the source is unchanged, else
+           the source is parsed."""
+        links = record.links
+        if links is None:
+            previous = self._previous.get(record.source)
+            if previous is not None and previous["hash"] == record.source_hash:
+                links = previous["links"]
+            else:
+                links = source_links(os.path.join(self.content_dir, record.source))
+                self.reparsed += 1
+        self.pages[record.source] = {"hash": record.source_hash, "dest": record.dest,
+                                     "links": [list(link) for link in links]}
+
+    def check(self, outputs: Set[str]) -> List[BrokenLink]:
+        """Returns: the links of the pages added that resolve to none of outputs
+           (POSIX paths relative to the output directory), by page and line."""
+        broken = []
+        for source in sorted(self.pages):
+            page = self.pages[source]
+            for url, line in page["links"]:
+                target = resolve_link(url, page["dest"])
+                if target is not None and not link_exists(target, outputs):
+                    broken.append(BrokenLink(source, line, url))
+        return broken
+
+    def save(self) -> None:
+        """Saves the links of the pages added for the next build."""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as state_file:
+            json.dump(self.pages, state_file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.state_path)
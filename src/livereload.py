@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+import time
+import urllib.parse
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+from assets import FINGERPRINT_EXTENSIONS
+from pageindex import STATE_DIR_NAME, PageRecord
+
+
+CHANGES_NAME = "changes.json"
+
+# URL of the server-sent events stream the injected client subscribes to
+RELOAD_PATH = "/__livereload"
+
+# Seconds between checks of the change log by the preview server
+POLL_INTERVAL = 0.25
+
+# Builds remembered by the server; a client further behind reloads unconditionally
+HISTORY_LENGTH = 64
+
+# Seconds between keep-alive comments on an idle event stream
+HEARTBEAT_SECONDS = 15.0
+
+# {since} and {page} are filled per response; everything else is plain ES5
+CLIENT_SCRIPT = ('<script>(function(){{if(!window.EventSource)return;'
+                 'var s=new EventSource("{url}?page={page}&since={since}");'
+                 's.addEventListener("reload",function(){{s.close();location.reload();}});'
+                 '}})();</script>')
+
+
+def changes_path(output_dir: str) -> str:
+    return os.path.join(output_dir, STATE_DIR_NAME, CHANGES_NAME)
+
+
+def load_changes(output_dir: str) -> Dict:
+    """Returns: the change log of the last build of output_dir:
+       {"sequence": build number, "changed": output paths or None for all, "static": snapshot}."""
+    try:
+        with open(changes_path(output_dir)) as changes_file:
+            return json.load(changes_file)
+    except (FileNotFoundError, ValueError):
+        return {"sequence": 0, "changed": None, "static": {}}
+
+
+def static_snapshot(static_dir: str) -> Dict[str, List[int]]:
+    """Returns: POSIX path -> [size, mtime_ns] of every file under static_dir."""
+    snapshot = {}
+    for dirpath, _, files in os.walk(static_dir):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            stat = os.stat(path)
+            snapshot[os.path.relpath(path, static_dir).replace(os.sep, '/')] = [stat.st_size,
+                                                                                stat.st_mtime_ns]
+    return snapshot
+
+
+def changed_static(previous: Dict[str, List[int]], current: Dict[str, List[int]]) -> List[str]:
+    """Returns: static paths added, removed or modified between two snapshots."""
+    return sorted(path for path in previous.keys() | current.keys()
+                  if previous.get(path) != current.get(path))
+
+
+def _in_source_order(records: Iterable[PageRecord]) -> Iterator[PageRecord]:
+    last_source = None
+    for record in records:
+        if last_source is not None and record.source <= last_source:
+            raise ValueError(f"Manifest not in source order at '{record.source}'")
+        last_source = record.source
+        yield record
+
+
+def changed_pages(manifest: str, records: Iterable[PageRecord]) -> Optional[List[str]]:
+    """Compares the pages of a build with the manifest of the previous one, streaming both
+        in source order so neither is held in memory.
+        Args: manifest - Path of the previous manifest.
+              records - Records of this build, ordered by source (as PageIndex iterates).
+        Returns: dest paths of added, removed and changed pages, or None if there is no
+        previous manifest to compare with (every page may have changed)."""
+    changed = set()
+    try:
+        with open(manifest) as manifest_file:
+            previous_records = _in_source_order(PageRecord.from_dict(json.loads(line))
+                                                for line in manifest_file if line.strip())
+            previous = next(previous_records, None)
+            for record in records:
+                while previous is not None and previous.source < record.source:
+                    changed.add(previous.dest)
+                    previous = next(previous_records, None)
+                if previous is not None and previous.source == record.source:
+                    if (previous.dest, previous.output_hash) != (record.dest, record.output_hash):
+                        changed.update((previous.dest, record.dest))
+                    previous = next(previous_records, None)
+                else:
+                    changed.add(record.dest)
+            while previous is not None:
+                changed.add(previous.dest)
+                previous = next(previous_records, None)
+    except (FileNotFoundError, ValueError, KeyError):
+        return None  # No previous build, or a manifest this build cannot compare with
+    return sorted(changed)
+
+
+def publish_changes(output_dir: str, changed: Optional[List[str]],
+                    static: Dict[str, List[int]]) -> int:
+    """Records the output paths a build changed, for the preview server to push to clients.
+        Args: output_dir - Output directory of the build.
+              changed - POSIX output paths that changed, or None if any may have.
+              static - Snapshot of the static directory, compared by the next build.
+        Returns: the sequence number of the build."""
+    sequence = load_changes(output_dir).get("sequence", 0) + 1
+    path = changes_path(output_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as changes_file:
+        json.dump({"sequence": sequence, "changed": changed, "static": static}, changes_file)
+    os.replace(tmp_path, path)
+    return sequence
+
+
+def affects(changed: Optional[Iterable[str]], page: str) -> bool:
+    """True if a build that changed these paths changes what page shows: the page
+       itself, or a stylesheet, script or other asset type (FINGERPRINT_EXTENSIONS, any
+       page may use it). Outputs no page loads (sitemap, search index files, .gz
+       sidecars) reload nothing."""
+    if changed is None:
+        return True
+    return any(path == page or os.path.splitext(path)[1].lower() in FINGERPRINT_EXTENSIONS
+               for path in changed)
+
+
+def inject_client(html: bytes, page: str, since: int) -> bytes:
+    """Returns: html with the live reload client inserted before its last </body>."""
+    script = CLIENT_SCRIPT.format(url=RELOAD_PATH, page=urllib.parse.quote(page),
+                                  since=since).encode()
+    position = html.lower().rfind(b"</body>")
+    if position < 0:
+        return html + script
+    return html[:position] + script + html[position:]
+
+
+class ChangeFeed:
+    """Follows the change log of an output directory and wakes the event streams
+        waiting for a build. Builds missed between two polls count as changing everything.
+        Args:
+            output_dir - Output directory the builder publishes changes to
+            Optional[interval] - Seconds between checks of the change log
+    """
+
+    def __init__(self, output_dir: str, interval: float = POLL_INTERVAL) -> None:
+        self.output_dir = output_dir
+        self.interval = interval
+        self.sequence = load_changes(output_dir).get("sequence", 0)
+        self.history: Deque[Tuple[int, Optional[frozenset]]] = deque(maxlen=HISTORY_LENGTH)
+        self.closed = False
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def __repr__(self) -> str:
+        return f"ChangeFeed({self.output_dir}, sequence={self.sequence})"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._follow, name="livereload", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _follow(self) -> None:
+        while not self.closed:
+            self.poll()
+            with self._condition:
+                self._condition.wait_for(lambda: self.closed, self.interval)
+
+    def poll(self) -> None:
+        """Reads the change log and notifies waiting streams if a build finished."""
+        changes = load_changes(self.output_dir)
+        sequence = changes.get("sequence", 0)
+        with self._condition:
+            if sequence == self.sequence:
+                return
+            changed = changes.get("changed")
+            if sequence != self.sequence + 1:
+                changed = None  # Missed builds, or the output directory was recreated
+            self.history.append((sequence, frozenset(changed) if changed is not None else None))
+            self.sequence = sequence
+            self._condition.notify_all()
+
+    def changed_since(self, page: str, since: int) -> Tuple[bool, int]:
+        """Returns: (whether a build after sequence since changed page, the current sequence)."""
+        with self._condition:
+            if since == self.sequence:
+                return False, since
+            if since > self.sequence or not self.history or self.history[0][0] > since + 1:
+                return True, self.sequence  # Older than the history, or from before a restart
+            return (any(affects(changed, page) for sequence, changed in self.history
+                        if sequence > since), self.sequence)
+
+    def wait(self, since: int, timeout: float) -> int:
+        """Blocks until a build after sequence since, the timeout, or close().
+           Returns: the current sequence."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._condition.wait_for(lambda: self.closed or self.sequence != since,
+                                     max(deadline - time.monotonic(), 0))
+            return self.sequence
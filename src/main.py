@@ -1,86 +1,1061 @@
+import argparse
+import atexit
+import contextlib
+import functools
+import hashlib
+import mmap
 import os
 import shutil
 import sys
-from markdown_blocks import markdown_to_html_node
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from artifact_cache import ArtifactCache, cache_key
+from assets import AssetManifest, prune_output, rewrite_asset_urls, sync_assets
+from compress import (DEFAULT_GZIP_EXTENSIONS, DEFAULT_GZIP_LEVEL, DEFAULT_GZIP_MIN_SIZE,
+                      precompress, sidecars)
+from flat_ir import FlatDocument
+from htmlnode import HTMLWriter
+from linkcheck import LINKS_STATE_NAME, LinkChecker, document_links, locate_links
+from livereload import (CHANGES_NAME, changed_pages, changed_static, load_changes, publish_changes,
+                        static_snapshot)
+from markdown_blocks import (markdown_to_flat_document, iter_block_spans, iter_blocks_from_buffer,
+                             emit_block)
+from metadata import TITLE_KEY, PageMetadata, parse_front_matter, scan_metadata, scan_title
+from memprofile import DEFAULT_TOP, MemoryProfile
+from metrics import BuildMetrics, peak_rss_bytes
+from minify import minify_html
+from pageindex import (MANIFEST_NAME, PageIndex, PageRecord, STATE_DIR_NAME, manifest_path,
+                       read_manifest, write_manifest_records)
+from sampler import DEFAULT_INTERVAL, SamplingProfiler, worker_profiler
+from search import SEARCH_STATE_NAME, SearchIndex, document_terms, search_outputs
+from sitegen import (DEFAULT_LISTING_SIZE, SITEGEN_STATE_NAME, generated_outputs, listing_pages,
+                     modified_date, page_url, sitemap_files, write_generated)
+from subset import (SubsetPlan, file_digest, invalidate_deps, load_deps, plan_subset, read_path_list,
+                    sync_static_changes, write_deps)
+from shard import ShardMergeError, merge_shards, parse_shard, select_shard, write_shard_info
+from tracing import CATEGORY_PAGE, Tracer, current_tracer, install_tracer, span
+from watchdog import PageLimits, PageLimitExceeded, POLICIES, POLICY_FAIL, POLICY_STUB, error_stub
+from workers import WorkerPool, STATUS_OK, STATUS_ERROR, STATUS_TIMEOUT, default_start_method
 
 
-def extract_title(markdown: str) -> str:
-    """Extracts the title from the markdown content.
-       Args: markdown - The markdown text to extract the title from.
-       Returns: The title string."""
-    for line in markdown.splitlines():
-        if line.startswith('# '):
-            return line[2:].strip()
-    raise Exception("No title found in markdown.")
+# Markdown sources at least this large are streamed block by block through mmap
+MMAP_THRESHOLD_BYTES = 8 * 1024 * 1024
 
+# With a memory budget: share of the budget the in-memory page index may use,
+# and the estimated peak memory of rendering a page in memory relative to its source size
+INDEX_BUDGET_DIVISOR = 8
+PAGE_MEMORY_FACTOR = 64
 
-def copy_static_to_docs(static_dir: str, docs_dir: str) -> None:
-    """Copies all files from the static directory to the docs directory."""
+# Default size limit of the --cache-dir artifact cache
+DEFAULT_CACHE_SIZE_MB = 1024
+
+# Seconds past the render time limit before a parallel worker is killed
+KILL_GRACE_SECONDS = 1.0
+
+# Modules the page workers use, imported once before the workers are forked
+WORKER_PRELOAD = ("markdown_blocks", "inline_markdown", "htmlnode", "textnode", "flat_ir",
+                  "metadata", "minify", "assets", "artifact_cache", "pageindex", "watchdog",
+                  "search", "linkcheck")
+
+# Template contents keyed by path, with the mtime they were read at
+_template_cache: Dict[str, Tuple[int, str]] = {}
+
+# Page worker pool of generate_pages_parallel, kept for later builds of this process
+_page_pool: Optional[WorkerPool] = None
+
+
+def require_title(title: Optional[str]) -> str:
+    """Returns: title. Raises: Exception if the page has none."""
+    if title is None:
+        raise Exception("No title found in markdown.")
+    return title
+
+
+def apply_basepath(html: str, basepath: str) -> str:
+    """Prefixes root-relative href/src attributes with the basepath."""
+    return (html
+            .replace('href="/', f'href="{basepath}')
+            .replace('src="/', f'src="{basepath}'))
+
+
+def load_template(template_path: str, metrics: Optional[BuildMetrics] = None) -> str:
+    """Reads a template file, reusing the cached content while the file is unchanged."""
+    template_content, hit = _read_template(template_path)
+    if metrics is not None:
+        metrics.record_cache("template", hit)
+    return template_content
+
+
+def _read_template(template_path: str) -> Tuple[str, bool]:
+    """Returns: (template content, whether it came from the template cache)."""
+    mtime = os.stat(template_path).st_mtime_ns
+    cached = _template_cache.get(template_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1], True
+
+    with open(template_path) as template_file:
+        template_content = template_file.read()
+    _template_cache[template_path] = (mtime, template_content)
+    return template_content, False
+
+
+def clear_output_dir(output_dir: str) -> None:
+    """Deletes everything in output_dir except the page manifest and change log,
+       which the next build compares against to publish what changed, the search
+       terms and links of the pages, which pages reused from the cache keep, and the
+       digests of the generated site files."""
+    if not os.path.exists(output_dir):
+        return
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if name == STATE_DIR_NAME and os.path.isdir(path):
+            for state_name in os.listdir(path):
+                if state_name not in (MANIFEST_NAME, CHANGES_NAME, SEARCH_STATE_NAME,
+                                      SITEGEN_STATE_NAME, LINKS_STATE_NAME):
+                    _remove_path(os.path.join(path, state_name))
+        else:
+            _remove_path(path)
+
+
+def _remove_path(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def render_template(template_content: str, title: str, html_content: str,
+                    asset_urls: Dict[str, str]) -> str:
+    """Returns: the template filled with a page title and content, asset references rewritten."""
+    return rewrite_asset_urls(template_content
+                              .replace("{{ Title }}", title)
+                              .replace("{{ Content }}", html_content),
+                              asset_urls)
+
+
+def copy_static_to_docs(static_dir: str, docs_dir: str) -> int:
+    """Copies all files from the static directory to the docs directory.
+       Returns: the number of bytes copied."""
     if not os.path.exists(static_dir):
         raise FileNotFoundError(f"Static directory '{static_dir}' does not exist.")
-    if os.path.exists(docs_dir):
-        shutil.rmtree(docs_dir)
-    shutil.copytree(static_dir, docs_dir)
+    clear_output_dir(docs_dir)
+    shutil.copytree(static_dir, docs_dir, dirs_exist_ok=True)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(static_dir) for name in files)
+
+
+class BuildContext:
+    """State shared by every page of one build.
+        Args:
+            Optional[metrics] - Metrics collector
+            Optional[page_index] - Index receiving a record for every generated page
+            Optional[content_dir] - Root that page index source paths are relative to
+            Optional[output_dir] - Root that page index destination paths are relative to
+            Optional[stream_threshold] - Source size from which pages are streamed through mmap
+                                         (defaults to MMAP_THRESHOLD_BYTES)
+            Optional[limits] - Per-page limits and the policy for pages over them
+            Optional[shard] - (K, N) to generate only the K-th of N page partitions
+            Optional[cache] - Artifact cache that finished pages are reused from and stored in
+            Optional[mirrors] - Extra (basepath, output directory) targets every page is also
+                                written to, from the same render
+            Optional[assets] - Manifest of fingerprinted static assets that page references
+                               are rewritten to
+            Optional[minify] - Minify the template and pages while serializing them
+            Optional[memory_profile] - Profile of the traced memory of each page generated
+                                       in this process
+            Optional[profiler] - Sampling profiler of the build, which worker processes
+                                 also sample into
+            Optional[search_index] - Search index receiving the terms of every generated page
+            Optional[search_terms] - Count the search terms of rendered pages into their
+                                     records (set when search_index is, and in its workers)
+            Optional[link_checker] - Link checker receiving the links of every generated page
+            Optional[collect_links] - Collect the internal links of rendered pages into their
+                                      records (set when link_checker is, and in its workers)
+            Optional[only] - Content-relative sources to generate (all if None)
+    """
+
+    def __init__(self, metrics: Optional[BuildMetrics] = None,
+                 page_index: Optional[PageIndex] = None,
+                 content_dir: str = ".", output_dir: str = ".",
+                 stream_threshold: Optional[int] = None,
+                 limits: Optional[PageLimits] = None,
+                 shard: Optional[Tuple[int, int]] = None,
+                 cache: Optional[ArtifactCache] = None,
+                 mirrors: Optional[List[Tuple[str, str]]] = None,
+                 assets: Optional[AssetManifest] = None,
+                 minify: bool = False,
+                 memory_profile: Optional[MemoryProfile] = None,
+                 profiler: Optional[SamplingProfiler] = None,
+                 search_index: Optional[SearchIndex] = None,
+                 search_terms: bool = False,
+                 link_checker: Optional[LinkChecker] = None,
+                 collect_links: bool = False,
+                 only: Optional[Set[str]] = None) -> None:
+        self.metrics = metrics
+        self.page_index = page_index
+        self.content_dir = content_dir
+        self.output_dir = output_dir
+        self.stream_threshold = stream_threshold
+        self.limits = limits if limits is not None else PageLimits()
+        self.shard = shard
+        self.cache = cache
+        self.mirrors = mirrors if mirrors is not None else []
+        self.assets = assets
+        self.minify = minify
+        self.memory_profile = memory_profile
+        self.profiler = profiler
+        self.search_index = search_index
+        self.search_terms = search_terms or search_index is not None
+        self.link_checker = link_checker
+        self.collect_links = collect_links or link_checker is not None
+        self.only = only
+
+    def __repr__(self) -> str:
+        return f"BuildContext(content_dir={self.content_dir}, output_dir={self.output_dir})"
+
+
+def _posix_relpath(path: str, start: str) -> str:
+    return os.path.relpath(path, start).replace(os.sep, '/')
+
+
+def mirror_targets(dest_path: str, context: BuildContext) -> List[Tuple[str, str]]:
+    """Returns: (basepath, path) of the copies of the page at dest_path in the mirror
+       output directories of the context, creating their parent directories."""
+    targets = []
+    for mirror_basepath, mirror_dir in context.mirrors:
+        mirror_path = os.path.join(mirror_dir, os.path.relpath(dest_path, context.output_dir))
+        os.makedirs(os.path.dirname(mirror_path), exist_ok=True)
+        targets.append((mirror_basepath, mirror_path))
+    return targets
 
 
 def generate_page(from_path: str, template_path: str, 
-                  dest_path: str, basepath: str) -> None:
-    """Generates an HTML page from a markdown file using a template."""
+                  dest_path: str, basepath: str,
+                  context: Optional[BuildContext] = None) -> Tuple[PageRecord, float]:
+    """Generates an HTML page from a markdown file using a template.
+       The page is rendered once and written for basepath to dest_path and for every
+       mirror of the context, patching only the basepath-dependent attributes per target.
+       Raises PageLimitExceeded when the page goes over one of context.limits.
+       Returns: (record of the page at dest_path, seconds spent generating it)."""
     print(f"Generating page from {from_path} to {dest_path} using template {template_path}")
-    with open(from_path) as md_file:
-        markdown_content = md_file.read()
+    context = context if context is not None else BuildContext()
+    limits = context.limits
+    template_content, template_hit = _read_template(template_path)
+    # Recorded on the page, so that the lookups of pages generated by workers are counted
+    cache_lookups = [("template", template_hit)]
+    if context.minify:
+        template_content = minify_html(template_content)
+    source_stat = os.stat(from_path)
+    limits.check_source(from_path, source_stat.st_size)
+    stream_threshold = (context.stream_threshold if context.stream_threshold is not None
+                        else MMAP_THRESHOLD_BYTES)
+    mirrors = mirror_targets(dest_path, context)
+    asset_urls = context.assets.urls if context.assets is not None else {}
+    output_options = (f"assets={asset_digest(context.assets)};"
+                      f"minify={context.minify}")
 
-    title = extract_title(markdown_content)
-    html_content = markdown_to_html_node(markdown_content).to_html()
+    terms = links = None
 
-    with open(template_path) as template_file:
-        template_content = template_file.read()
-    final_html = (
-        template_content
-        .replace("{{ Title }}", title)
-        .replace("{{ Content }}", html_content)
-        .replace('href="/', f'href="{basepath}')
-        .replace('src="/', f'src="{basepath}')
-    )
+    render_start = time.perf_counter()
+    with limits.deadline(from_path), span("page", CATEGORY_PAGE, page=from_path):
+        if source_stat.st_size >= stream_threshold:
+            terms = Counter() if context.search_terms else None
+            links = [] if context.collect_links else None
+            with span("stream", CATEGORY_PAGE, page=from_path):
+                metadata, source_hash, output_hash = generate_large_page(
+                    from_path, template_content, dest_path, basepath, mirrors, asset_urls,
+                    context.minify, terms, links)
+            title, front_matter = metadata.title, metadata.front_matter
+            bytes_written = os.path.getsize(dest_path)
+            for _, path in [(basepath, dest_path)] + mirrors:
+                limits.check_output(from_path, os.path.getsize(path), time.perf_counter() - render_start)
+        else:
+            with span("read", CATEGORY_PAGE, page=from_path):
+                with open(from_path, "rb") as md_file:
+                    source_bytes = md_file.read()
+                front_matter, body_start = parse_front_matter(source_bytes)
+                # Decode like a text-mode read, translating universal newlines
+                markdown_content = (source_bytes[body_start:].decode('utf-8')
+                                    .replace('\r\n', '\n').replace('\r', '\n'))
+                source_hash = hashlib.sha256(source_bytes).hexdigest()
+                title = require_title(front_matter.get(TITLE_KEY) or scan_title(source_bytes, body_start))
+            cache = context.cache
+            page_html = None  # Page before basepath patching, rendered at most once
 
-    with open(dest_path, "w") as output_file:
-        output_file.write(final_html)
+            for target_basepath, target_path in [(basepath, dest_path)] + mirrors:
+                key = (cache_key(source_bytes, template_content, target_basepath, options=output_options)
+                       if cache is not None else "")
+                final_html = cache.get(key) if cache is not None else None
+                cache_hit = final_html is not None
+                if cache is not None:
+                    cache_lookups.append(("page", cache_hit))
+                if final_html is None:
+                    if page_html is None:
+                        with span("split", CATEGORY_PAGE, page=from_path):
+                            spans = list(iter_block_spans(markdown_content))
+                        with span("parse", CATEGORY_PAGE, page=from_path):
+                            document = markdown_to_flat_document(markdown_content, spans)
+                        if context.search_terms:
+                            terms = document_terms(document)
+                        if context.collect_links:
+                            links = locate_links(source_bytes, document_links(document))
+                        with span("serialize", CATEGORY_PAGE, page=from_path):
+                            html_content = document.to_html(context.minify)
+                            page_html = render_template(template_content, title, html_content,
+                                                        asset_urls)
+                        if context.memory_profile is not None:
+                            context.memory_profile.checkpoint()
+                    final_html = apply_basepath(page_html, target_basepath).encode()
+                limits.check_output(from_path, len(final_html), time.perf_counter() - render_start)
+                if cache is not None and not cache_hit:
+                    cache.put(key, final_html)
 
+                with span("write", CATEGORY_PAGE, page=target_path), \
+                     open(target_path, "wb") as output_file:
+                    output_file.write(final_html)
+                if target_path == dest_path:
+                    bytes_written = len(final_html)
+                    output_hash = hashlib.sha256(final_html).hexdigest()
+            del source_bytes
+    render_seconds = time.perf_counter() - render_start
+    limits.check_elapsed(from_path, render_seconds)
 
-def generate_pages_recursive(dir_path_content: str, template_path: str, 
-                             dest_dir_path: str, basepath: str) -> None:
-    """Recursively generates HTML pages from markdown files in a directory."""
+    record = PageRecord(
+        source=_posix_relpath(from_path, context.content_dir),
+        dest=_posix_relpath(dest_path, context.output_dir),
+        title=title, source_hash=source_hash,
+        mtime_ns=source_stat.st_mtime_ns, output_bytes=bytes_written, output_hash=output_hash,
+        front_matter=front_matter)
+    record.terms, record.links, record.cache_lookups = terms, links, cache_lookups
+    record_page(context, record, render_seconds)
+    return record, render_seconds
+
+
+def record_page(context: BuildContext, record: PageRecord, render_seconds: float) -> None:
+    """Adds a generated page to the build metrics, page index, search index and link
+       checker of the context."""
+    if context.metrics is not None:
+        context.metrics.pages_rendered += 1
+        context.metrics.observe_render(render_seconds)
+        context.metrics.bytes_written += record.output_bytes
+        for cache, hit in record.cache_lookups:
+            context.metrics.record_cache(cache, hit)
+        record.cache_lookups = []
+    if context.page_index is not None:
+        context.page_index.add(record)
+    record_page_state(context, record)
+
+
+def record_page_state(context: BuildContext, record: PageRecord) -> None:
+    """Adds a page to the search index and link checker of the context, if any.
+       Terms and links are dropped once added; a worker keeps them on the record for
+       the build process."""
+    if context.search_index is not None:
+        context.search_index.add(record)
+        record.terms = None
+    if context.link_checker is not None:
+        context.link_checker.add(record)
+        record.links = None
+
+
+def apply_limit_policy(exc: PageLimitExceeded, dest_path: str, context: BuildContext) -> None:
+    """Reports a page that exceeded a limit, then skips it, replaces it with an
+       error stub or re-raises to fail the build, depending on the limit policy."""
+    print(f"Page limit exceeded: {exc}", file=sys.stderr)
+    if context.limits.policy == POLICY_FAIL:
+        raise exc
+    if context.metrics is not None:
+        context.metrics.pages_skipped += 1
+    for path in [dest_path] + [path for _, path in mirror_targets(dest_path, context)]:
+        if context.limits.policy == POLICY_STUB:
+            with open(path, "w") as output_file:
+                output_file.write(error_stub(exc))
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def generate_large_page(from_path: str, template_content: str,
+                        dest_path: str, basepath: str,
+                        mirrors: Sequence[Tuple[str, str]] = (),
+                        asset_urls: Optional[Dict[str, str]] = None,
+                        minify: bool = False,
+                        terms: Optional[Counter] = None,
+                        links: Optional[List[Tuple[str, int]]] = None) -> Tuple[PageMetadata, str, str]:
+    """Streams a large markdown file to HTML through a read-only mmap, decoding and
+       rendering one block at a time so peak memory stays near the largest block.
+       Each block is rendered once and written to dest_path and every (basepath, path) mirror,
+       with asset references rewritten through asset_urls and, with minify, minified.
+       Given terms, the search terms of the blocks are counted into it; given links, the
+       internal links of the page are appended to it with their source lines.
+       Returns: (metadata of the page, SHA-256 hex digests of the source and of the page
+       at dest_path)."""
+    targets = [(basepath, dest_path)] + list(mirrors)
+    output_hash = hashlib.sha256()
+    with open(from_path, "rb") as md_file, \
+         mmap.mmap(md_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer, \
+         contextlib.ExitStack() as files:
+        metadata = scan_metadata(buffer)
+        title = require_title(metadata.title)
+        head, placeholder, tail = template_content.replace("{{ Title }}", title).partition("{{ Content }}")
+        outputs = [(target_basepath, files.enter_context(open(path, "wb")))
+                   for target_basepath, path in targets]
+
+        def write(html: str) -> None:
+            html = rewrite_asset_urls(html, asset_urls or {})
+            for i, (target_basepath, output_file) in enumerate(outputs):
+                data = apply_basepath(html, target_basepath).encode()
+                output_file.write(data)
+                if i == 0:
+                    output_hash.update(data)
+
+        urls: List[str] = []
+        write(head)
+        if placeholder:
+            write("<div>")
+            for block in iter_blocks_from_buffer(buffer, metadata.body_start):
+                if terms is None and links is None:
+                    writer = HTMLWriter(minify)
+                    emit_block(writer, block)
+                    write(writer.to_html())
+                else:
+                    document = FlatDocument()
+                    emit_block(document, block)
+                    if terms is not None:
+                        document_terms(document, terms)
+                    if links is not None:
+                        urls.extend(document_links(document))
+                    write(document.to_html(minify))
+            write("</div>")
+        write(tail)
+        if links is not None:
+            links.extend(locate_links(buffer, urls))
+        return metadata, hashlib.sha256(buffer).hexdigest(), output_hash.hexdigest()
+
+
+def discover_pages(dir_path_content: str, dest_dir_path: str) -> List[Tuple[str, str]]:
+    """Recursively lists (markdown path, HTML path) pairs, creating the output directories."""
+    pages = []
     for item in os.listdir(dir_path_content):
         item_path = os.path.join(dir_path_content, item)
         dest_path = os.path.join(dest_dir_path, item)
         if os.path.isdir(item_path):
             os.makedirs(dest_path, exist_ok=True)
-            generate_pages_recursive(item_path, template_path, dest_path, basepath)
+            pages.extend(discover_pages(item_path, dest_path))
         elif item.endswith(".md"):
-            dest_file_path = os.path.join(dest_dir_path, item).replace(".md", ".html")
-            generate_page(item_path, template_path, dest_file_path, basepath)
- 
+            pages.append((item_path, os.path.join(dest_dir_path, item).replace(".md", ".html")))
+    return pages
+
+
+def pages_to_build(dir_path_content: str, dest_dir_path: str,
+                   context: BuildContext) -> List[Tuple[str, str]]:
+    """Discovers the pages and keeps those of the context's shard and subset, if any."""
+    with span("discovery"):
+        pages = discover_pages(dir_path_content, dest_dir_path)
+        if context.shard is not None:
+            pages = select_shard(pages, dir_path_content, context.shard)
+        if context.only is not None:
+            pages = [(from_path, dest_path) for from_path, dest_path in pages
+                     if _posix_relpath(from_path, dir_path_content) in context.only]
+    return pages
+
+
+def list_sources(dir_path_content: str) -> List[str]:
+    """Returns: content-relative paths of all markdown sources, as recorded in the page index."""
+    return [_posix_relpath(os.path.join(root, name), dir_path_content)
+            for root, _, files in os.walk(dir_path_content)
+            for name in files if name.endswith(".md")]
+
+
+def generate_pages_recursive(dir_path_content: str, template_path: str, 
+                             dest_dir_path: str, basepath: str,
+                             context: Optional[BuildContext] = None) -> None:
+    """Recursively generates HTML pages from markdown files in a directory."""
+    context = context if context is not None else BuildContext()
+    profile = context.memory_profile
+    for from_path, dest_path in pages_to_build(dir_path_content, dest_dir_path, context):
+        try:
+            with profile.page(from_path) if profile is not None else contextlib.nullcontext():
+                generate_page(from_path, template_path, dest_path, basepath, context)
+        except PageLimitExceeded as exc:
+            apply_limit_policy(exc, dest_path, context)
+
+
+def generate_page_instrumented(from_path: str, template_path: str, dest_path: str, basepath: str,
+                               context: Optional[BuildContext] = None, trace: bool = False,
+                               sample_interval: Optional[float] = None
+                               ) -> Tuple[PageRecord, float, List[Dict], Dict[str, int]]:
+    """Worker job of a traced or sampled build: generate_page, also returning the trace
+       events it recorded and the stacks the worker sampled since its previous page,
+       for the build process to merge into its timeline and profile."""
+    profiler = worker_profiler(sample_interval) if sample_interval is not None else None
+    with install_tracer(Tracer() if trace else None) as tracer:
+        record, render_seconds = generate_page(from_path, template_path, dest_path, basepath, context)
+    return (record, render_seconds, tracer.events if tracer is not None else [],
+            profiler.drain() if profiler is not None else {})
+
+
+def page_pool(jobs: int, template_path: str, metrics: Optional[BuildMetrics] = None) -> WorkerPool:
+    """Returns: the started pool of jobs page workers, reused by every parallel build of
+       this process so rebuilds skip starting workers. A new pool imports the parser
+       modules and reads the template before forking, so its workers start warm; that
+       read is recorded in metrics, as the workers' own reads then all hit the cache."""
+    global _page_pool
+    if _page_pool is not None and _page_pool.processes != jobs:
+        close_page_pool()
+    if _page_pool is None:
+        load_template(template_path, metrics)
+        _page_pool = WorkerPool(generate_page, jobs, start_method=default_start_method(),
+                                preload=WORKER_PRELOAD + (generate_page.__module__,))
+    _page_pool.start()
+    return _page_pool
+
+
+@atexit.register
+def close_page_pool() -> None:
+    """Stops the workers of page_pool, if any were started."""
+    global _page_pool
+    if _page_pool is not None:
+        _page_pool.close()
+        _page_pool = None
+
+
+def generate_pages_parallel(dir_path_content: str, template_path: str,
+                            dest_dir_path: str, basepath: str,
+                            context: BuildContext, jobs: int) -> None:
+    """Generates HTML pages in the worker processes of page_pool.
+       Pages are rendered and written by the workers; records and metrics are collected here.
+       A worker still busy KILL_GRACE_SECONDS after the render time limit (e.g. stuck
+       in C code the in-worker deadline cannot interrupt) is killed and replaced."""
+    limits = context.limits
+    worker_context = BuildContext(content_dir=context.content_dir, output_dir=context.output_dir,
+                                  stream_threshold=context.stream_threshold, limits=limits,
+                                  cache=context.cache, mirrors=context.mirrors,
+                                  assets=context.assets, minify=context.minify,
+                                  search_terms=context.search_terms,
+                                  collect_links=context.collect_links)
+    task_timeout = (limits.max_render_seconds + KILL_GRACE_SECONDS
+                    if limits.max_render_seconds is not None else None)
+    pages = pages_to_build(dir_path_content, dest_dir_path, context)
+    tasks = [(from_path, template_path, dest_path, basepath) for from_path, dest_path in pages]
+
+    pool = page_pool(jobs, template_path, context.metrics)
+    pool.task_timeout = task_timeout
+    tracer, profiler = current_tracer(), context.profiler
+    instrumented = tracer is not None or profiler is not None
+    job = (functools.partial(generate_page_instrumented, context=worker_context,
+                             trace=tracer is not None,
+                             sample_interval=profiler.interval if profiler is not None else None)
+           if instrumented else functools.partial(generate_page, context=worker_context))
+    with contextlib.closing(pool.run(tasks, job)) as results:
+        for (from_path, _, dest_path, _), status, value, elapsed in results:
+            if status == STATUS_OK:
+                if instrumented:
+                    record, render_seconds, events, samples = value
+                    if tracer is not None:
+                        tracer.extend(events)
+                    if profiler is not None:
+                        profiler.merge(samples)
+                    value = record, render_seconds
+                record_page(context, *value)
+            elif status == STATUS_TIMEOUT:
+                apply_limit_policy(PageLimitExceeded(from_path, "render time", elapsed,
+                                                     f"worker killed after {elapsed:.2f}s"),
+                                   dest_path, context)
+            elif status == STATUS_ERROR and isinstance(value, PageLimitExceeded):
+                apply_limit_policy(value, dest_path, context)
+            elif status == STATUS_ERROR:
+                raise value
+            else:
+                raise RuntimeError(f"Worker crashed (exit code {value}) while generating {from_path}")
+    if context.metrics is not None:
+        context.metrics.observe_worker_rss(pool.peak_rss)
+
+
+def generate_site_files(page_index: PageIndex, template_path: str, basepath: str,
+                        context: BuildContext, sections: Sequence[str] = (),
+                        listing_size: int = DEFAULT_LISTING_SIZE,
+                        site_url: Optional[str] = None) -> Dict[str, bytes]:
+    """Builds the paginated listing pages of sections and, given the site_url (scheme and
+       host) the site is served from, the sitemap for basepath. Only the page index is
+       read, never a markdown source.
+       Raises: ValueError if a listing would overwrite a content page.
+       Returns: output path -> content."""
+    template_content = load_template(template_path, context.metrics)
+    if context.minify:
+        template_content = minify_html(template_content)
+    asset_urls = context.assets.urls if context.assets is not None else {}
+    files = {}
+    urls = []
+    for section in sections:
+        for path, title, html_content in listing_pages(section, page_index, listing_size, context.minify):
+            files[path] = apply_basepath(render_template(template_content, title, html_content, asset_urls),
+                                         basepath).encode()
+            urls.append((page_url(path), ""))
+    if site_url is not None:
+        urls.extend((page_url(record.dest), modified_date(record)) for record in page_index)
+        files.update(sitemap_files(urls, site_url.rstrip("/") + basepath))
+    return files
+
+
+def _target_arg(spec: str) -> Tuple[str, str]:
+    target_basepath, separator, output_dir = spec.partition("=")
+    if not separator or not target_basepath or not output_dir:
+        raise argparse.ArgumentTypeError(f"Invalid target '{spec}', expected BASEPATH=DIR")
+    return target_basepath, output_dir
+
+
+def _extensions_arg(spec: str) -> Tuple[str, ...]:
+    extensions = tuple(ext if ext.startswith(".") else f".{ext}"
+                       for ext in (part.strip() for part in spec.split(",")) if ext)
+    if not extensions:
+        raise argparse.ArgumentTypeError("Expected at least one extension, e.g. .html,.css")
+    return extensions
+
+
+def _shard_arg(spec: str) -> Tuple[int, int]:
+    try:
+        return parse_shard(spec)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate the static site from markdown content.")
+    parser.add_argument("basepath", nargs="?", default="/",
+                        help="URL prefix the site is served under (default: /)")
+    parser.add_argument("--content", default="./content", help="markdown content directory")
+    parser.add_argument("--static", default="./static", help="static files directory")
+    parser.add_argument("--template", default="./template.html", help="page template")
+    parser.add_argument("--output", default="./docs",
+                        help="output directory, replaced on every build (default: ./docs)")
+    parser.add_argument("--target", metavar="BASEPATH=DIR", type=_target_arg, action="append",
+                        default=[],
+                        help="also write the site for BASEPATH into DIR, from the same render "
+                             "(repeatable)")
+    parser.add_argument("--fingerprint-assets", action="store_true",
+                        help="copy static assets under content-hashed names (index.3fa9c1d2.css) "
+                             "so they can be cached forever, rewrite references to them, and "
+                             "recopy only assets that changed since the last build")
+    parser.add_argument("--minify", action="store_true",
+                        help="collapse insignificant whitespace and drop optional quotes while "
+                             "serializing the template and pages (<pre>/<code> kept verbatim)")
+    parser.add_argument("--gzip", action="store_true",
+                        help="write .gz sidecars next to outputs for gzip_static, recompressing "
+                             "only files that changed since the last build")
+    parser.add_argument("--gzip-level", metavar="N", type=int, default=DEFAULT_GZIP_LEVEL,
+                        choices=range(1, 10), help=f"gzip level 1-9 (default: {DEFAULT_GZIP_LEVEL})")
+    parser.add_argument("--gzip-min-size", metavar="BYTES", type=int, default=DEFAULT_GZIP_MIN_SIZE,
+                        help=f"skip files smaller than BYTES (default: {DEFAULT_GZIP_MIN_SIZE})")
+    parser.add_argument("--gzip-extensions", metavar="EXT,...", type=_extensions_arg,
+                        default=DEFAULT_GZIP_EXTENSIONS,
+                        help="comma separated extensions to compress "
+                             f"(default: {','.join(DEFAULT_GZIP_EXTENSIONS)})")
+    parser.add_argument("--check-links", action="store_true",
+                        help="report internal links (href/src) of the pages that point to no "
+                             "generated page or static file, with their source line")
+    parser.add_argument("--fail-on-broken-links", action="store_true",
+                        help="with --check-links, fail the build if any link is broken")
+    parser.add_argument("--listing", metavar="SECTION", action="append", default=[],
+                        help="generate SECTION/index.html listing the pages under SECTION, newest "
+                             "first, paginated into SECTION/page/N/ (repeatable)")
+    parser.add_argument("--listing-size", metavar="N", type=int, default=DEFAULT_LISTING_SIZE,
+                        help=f"pages per listing page (default: {DEFAULT_LISTING_SIZE})")
+    parser.add_argument("--sitemap", metavar="URL",
+                        help="write sitemap.xml with the page URLs under URL, the scheme and host "
+                             "the site is served from (e.g. https://example.com)")
+    parser.add_argument("--shard", metavar="K/N", type=_shard_arg,
+                        help="generate only the K-th of N deterministic page partitions, "
+                             "e.g. one per machine")
+    parser.add_argument("--only", metavar="GLOB",
+                        help="update a complete previous build, generating only the pages whose "
+                             "content-relative source matches GLOB (* also matches /) and the "
+                             "listings, sitemap and search shards depending on them")
+    parser.add_argument("--changed-from", metavar="FILE",
+                        help="like --only, for the markdown files listed in FILE (one path per "
+                             "line, - for stdin, e.g. from git diff --name-only)")
+    parser.add_argument("--merge-shards", metavar="DIR", nargs="+",
+                        help="instead of building, merge the outputs of shards 1..N into "
+                             "the output directory, checking every page was rendered once")
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        help="reuse and store finished pages in a content-addressed cache "
+                             "that may be shared between checkouts and machines")
+    parser.add_argument("--cache-size", metavar="MB", type=int, default=DEFAULT_CACHE_SIZE_MB,
+                        help="evict least recently used cache entries beyond MB megabytes "
+                             f"(default: {DEFAULT_CACHE_SIZE_MB})")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write build metrics to PATH in Prometheus text format")
+    parser.add_argument("--memory-budget", metavar="MB", type=int,
+                        help="bound build memory: stream large pages, spill the page index "
+                             "to disk and fail if the peak RSS of the build process or of any "
+                             "worker exceeds MB megabytes")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write a timeline of the build phases and page stages, including "
+                             "those of worker processes, to PATH as Chrome trace events")
+    parser.add_argument("--sample-profile", metavar="PATH",
+                        help="sample the stacks of the build (and its workers) in a background "
+                             "thread and write them to PATH as collapsed stacks for flamegraphs")
+    parser.add_argument("--sample-interval", metavar="S", type=float, default=DEFAULT_INTERVAL,
+                        help=f"seconds between stack samples (default: {DEFAULT_INTERVAL})")
+    parser.add_argument("--search-index", action="store_true",
+                        help="write a sharded full-text search index of the pages and a client "
+                             "script loading it to search/, updating only changed shards "
+                             "(shard builds leave it to --merge-shards)")
+    parser.add_argument("--memory-profile", action="store_true",
+                        help="trace the memory of each page with tracemalloc and report the "
+                             "pages with the highest peaks and the top allocation sites")
+    parser.add_argument("--memory-profile-top", metavar="N", type=int, default=DEFAULT_TOP,
+                        help=f"pages and sites listed by --memory-profile (default: {DEFAULT_TOP})")
+    parser.add_argument("--jobs", "-j", metavar="N", type=int, default=1,
+                        help="generate pages in N worker processes (default: 1)")
+    parser.add_argument("--max-source-bytes", metavar="N", type=int,
+                        help="limit the size of each markdown source")
+    parser.add_argument("--max-render-seconds", metavar="S", type=float,
+                        help="limit the wall time spent generating each page")
+    parser.add_argument("--max-output-bytes", metavar="N", type=int,
+                        help="limit the size of each generated page")
+    parser.add_argument("--on-limit", choices=POLICIES, default=POLICY_FAIL,
+                        help="skip the page, write an error stub, or fail the build "
+                             "when a page exceeds a limit (default: fail)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    tracer = Tracer() if args.trace else None
+    profiler = SamplingProfiler(args.sample_interval) if args.sample_profile else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        with install_tracer(tracer):
+            build(args, profiler)
+    finally:
+        if tracer is not None:
+            print(f"Writing build trace to {args.trace}...")
+            tracer.write(args.trace)
+        if profiler is not None:
+            profiler.stop()
+            print(f"Writing {profiler.samples} stack samples to {args.sample_profile}...")
+            profiler.write(args.sample_profile)
+
+
+def build_options(args: argparse.Namespace) -> Dict[str, object]:
+    """Returns: the options the outputs of a build depend on, recorded with the build;
+       a subset build may only update a build made with the same options."""
+    return {"basepath": args.basepath, "content": os.path.abspath(args.content),
+            "static": os.path.abspath(args.static), "template": os.path.abspath(args.template),
+            "targets": [[target_basepath, os.path.abspath(output_dir)]
+                        for target_basepath, output_dir in args.target],
+            "minify": args.minify, "fingerprint_assets": args.fingerprint_assets,
+            "gzip": [args.gzip, args.gzip_level, args.gzip_min_size, list(args.gzip_extensions)],
+            "listing": args.listing, "listing_size": args.listing_size, "sitemap": args.sitemap,
+            "search_index": args.search_index}
 
-def main():
-    dir_path_static = "./static"
-    dir_path_public = "./docs"
-    dir_path_content = "./content"
-    template_path = "./template.html"
-    default_basepath = "/"
 
-    basepath = default_basepath
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
+def load_subset(args: argparse.Namespace, previous: Optional[Dict],
+                page_index: PageIndex) -> Optional[SubsetPlan]:
+    """Plans an --only/--changed-from build on top of the previous build of the output
+       directory, whose dependencies are previous, loading its page records into page_index.
+       Returns: the plan, or None if there is no complete previous build with the same
+       options, so every page has to be built."""
+    if previous is None or not os.path.exists(manifest_path(args.output)):
+        print("No complete previous build in the output directory; building every page")
+        return None
+    if previous["options"] != build_options(args):
+        print("Build options differ from the previous build; building every page")
+        return None
+    for record in read_manifest(manifest_path(args.output)):
+        page_index.add(record)
+    sources = list_sources(args.content)
+    plan = plan_subset({record.source for record in page_index}, sources, args.content, args.only,
+                       read_path_list(args.changed_from) if args.changed_from else None)
+    if previous["template"] != file_digest(args.template):
+        print("The template changed; generating every page")
+        plan.render = set(sources)
+    return plan
 
-    print("Deleting public directory...")
-    if os.path.exists(dir_path_public):
-        shutil.rmtree(dir_path_public)
 
-    print("Copying static files to public directory...")
-    copy_static_to_docs(dir_path_static, dir_path_public)
+def asset_digest(assets: Optional[AssetManifest]) -> str:
+    """Returns: digest of the asset URLs pages are rewritten to ("" if none are)."""
+    return assets.digest() if assets is not None and assets.urls else ""
+
+
+def remove_pages(page_index: PageIndex, sources: Iterable[str], output_dirs: Sequence[str]) -> None:
+    """Removes pages from the index and deletes their outputs from every output directory."""
+    for source in sources:
+        if (record := page_index.get(source)) is None:
+            continue
+        for output_dir in output_dirs:
+            if os.path.exists(path := os.path.join(output_dir, record.dest)):
+                os.remove(path)
+        page_index.remove(source)
+
+
+def build(args: argparse.Namespace, profiler: Optional[SamplingProfiler] = None) -> None:
+    """Runs the build (or shard merge) described by the parsed command line,
+       sampled by profiler if given."""
+    dir_path_static = args.static
+    dir_path_public = args.output
+    dir_path_content = args.content
+    template_path = args.template
+    basepath = args.basepath
+
+    if args.merge_shards:
+        print(f"Merging {len(args.merge_shards)} shard(s) into {dir_path_public}...")
+        try:
+            merged = merge_shards(args.merge_shards, dir_path_public, list_sources(dir_path_content))
+        except ShardMergeError as exc:
+            raise SystemExit(f"Merge failed: {exc}")
+        print(f"Merged {len(merged)} pages")
+        if args.search_index:
+            # Shards skip the index: their postings cover only their own pages
+            print("Writing search index...")
+            search_index = SearchIndex(dir_path_public, dir_path_content)
+            for record in merged:
+                search_index.add(record)
+            written, unchanged = search_index.write([(basepath, dir_path_public)])
+            print(f"Search index: {written} files written, {unchanged} unchanged")
+        if args.listing or args.sitemap:
+            # Shards skip these too; the shards share the static files and so their assets
+            context = BuildContext(content_dir=dir_path_content, output_dir=dir_path_public,
+                                   assets=AssetManifest.load(args.merge_shards[0]), minify=args.minify)
+            try:
+                files = generate_site_files(merged, template_path, basepath, context, args.listing,
+                                            args.listing_size, args.sitemap)
+            except ValueError as exc:
+                raise SystemExit(f"Merge failed: {exc}")
+            written, _ = write_generated(dir_path_public, files)
+            print(f"{dir_path_public}: {len(written)} of {len(files)} listing and sitemap files written")
+        return
+
+    metrics = BuildMetrics()
+    budget = args.memory_budget * 1024 * 1024 if args.memory_budget else None
+    state_dir = os.path.join(dir_path_public, STATE_DIR_NAME)
+    page_index = (PageIndex(budget // INDEX_BUDGET_DIVISOR, os.path.join(state_dir, "pages.sqlite"))
+                  if budget else PageIndex())
+    limits = PageLimits(args.max_source_bytes, args.max_render_seconds,
+                        args.max_output_bytes, args.on_limit)
+    cache = ArtifactCache(args.cache_dir) if args.cache_dir else None
+    mirrors = args.target
+    context = BuildContext(metrics, page_index, dir_path_content, dir_path_public,
+                           min(MMAP_THRESHOLD_BYTES, budget // PAGE_MEMORY_FACTOR) if budget else None,
+                           limits, args.shard, cache, mirrors, minify=args.minify,
+                           memory_profile=MemoryProfile() if args.memory_profile else None,
+                           profiler=profiler,
+                           search_index=(SearchIndex(dir_path_public, dir_path_content)
+                                         if args.search_index and args.shard is None else None),
+                           link_checker=(LinkChecker(dir_path_public, dir_path_content)
+                                         if args.check_links and args.shard is None else None))
+    output_dirs = [dir_path_public] + [mirror_dir for _, mirror_dir in mirrors]
+    static = static_snapshot(dir_path_static)
+
+    subset = None
+    previous_deps = load_deps(dir_path_public)
+    if args.only is not None or args.changed_from is not None:
+        if args.shard is not None:
+            raise SystemExit("--only and --changed-from cannot be combined with --shard")
+        subset = load_subset(args, previous_deps, page_index)
+    invalidate_deps(dir_path_public)
+
+    if subset is not None:
+        print("Syncing changed static files...")
+        with metrics.phase("static"):
+            static_bytes = 0
+            for output_dir in output_dirs:
+                if args.fingerprint_assets or args.gzip:
+                    context.assets, copied = sync_assets(dir_path_static, output_dir,
+                                                         args.fingerprint_assets)
+                else:
+                    copied = sync_static_changes(dir_path_static, output_dir, changed_static(
+                        load_changes(output_dir).get("static", {}), static))
+                static_bytes += copied
+        if asset_digest(context.assets) != previous_deps["assets"]:
+            print("Fingerprinted assets changed; generating every page")
+            subset.render = set(list_sources(dir_path_content))
+        remove_pages(page_index, subset.removed, output_dirs)
+        for source in subset.render:
+            page_index.remove(source)
+        context.only = subset.render
+        print(f"Updating {len(subset.render)} page(s), removing {len(subset.removed)}")
+    elif args.fingerprint_assets or args.gzip:
+        print("Syncing static assets...")
+        with metrics.phase("static"):
+            static_bytes = 0
+            for output_dir in output_dirs:
+                # Keep the assets and sidecars of the previous build; only changed ones are redone
+                prune_output(output_dir, {entry["dest"] for entry in
+                                          AssetManifest.load(output_dir).entries.values()} |
+                             sidecars(output_dir) | search_outputs(output_dir) |
+                             generated_outputs(output_dir))
+                context.assets, copied = sync_assets(dir_path_static, output_dir,
+                                                     args.fingerprint_assets)
+                static_bytes += copied
+    else:
+        print("Deleting public directory...")
+        for output_dir in output_dirs:
+            clear_output_dir(output_dir)
+
+        print("Copying static files to public directory...")
+        with metrics.phase("static"):
+            static_bytes = sum(copy_static_to_docs(dir_path_static, output_dir)
+                               for output_dir in output_dirs)
 
     print("Generating content...")
-    generate_pages_recursive(dir_path_content, template_path, dir_path_public, basepath)
+    if context.memory_profile is not None:
+        if args.jobs > 1:
+            print("Memory profiling generates every page in this process; ignoring --jobs")
+        context.memory_profile.start()
+    with metrics.phase("pages"):
+        try:
+            if args.jobs > 1 and context.memory_profile is None:
+                generate_pages_parallel(dir_path_content, template_path, dir_path_public,
+                                        basepath, context, args.jobs)
+            else:
+                generate_pages_recursive(dir_path_content, template_path, dir_path_public,
+                                         basepath, context)
+        except PageLimitExceeded as exc:
+            raise SystemExit(f"Build failed: {exc}")
+        finally:
+            if context.memory_profile is not None:
+                context.memory_profile.stop()
+    if context.memory_profile is not None:
+        print(context.memory_profile.report(args.memory_profile_top))
+    if subset is not None:
+        # Pages kept from the previous build bring their recorded terms and links
+        for record in page_index:
+            if record.source not in subset.render:
+                record_page_state(context, record)
+
+    if context.search_index is not None:
+        print("Writing search index...")
+        with metrics.phase("search"):
+            written, unchanged = context.search_index.write([(basepath, dir_path_public)] + mirrors)
+        print(f"Search index: {written} files written, {unchanged} unchanged")
+
+    site_changed: Dict[str, List[str]] = {}
+    if args.shard is not None:
+        if args.listing or args.sitemap or args.search_index or args.check_links:
+            print("A shard indexes only its own pages; listings, sitemap, search index and links "
+                  "are skipped (--merge-shards writes all but the link check)")
+    else:
+        with metrics.phase("site"):
+            for target_basepath, output_dir in [(basepath, dir_path_public)] + mirrors:
+                try:
+                    files = (generate_site_files(page_index, template_path, target_basepath, context,
+                                                 args.listing, args.listing_size, args.sitemap)
+                             if args.listing or args.sitemap else {})
+                except ValueError as exc:
+                    raise SystemExit(f"Build failed: {exc}")
+                written, site_changed[output_dir] = write_generated(output_dir, files)
+                if files:
+                    print(f"{output_dir}: {len(written)} of {len(files)} listing and sitemap "
+                          f"files written")
+
+    if context.link_checker is not None:
+        with metrics.phase("links"):
+            outputs = ({record.dest for record in page_index} | set(static) |
+                       generated_outputs(dir_path_public) | search_outputs(dir_path_public))
+            broken = context.link_checker.check(outputs)
+            context.link_checker.save()
+        for link in broken:
+            print(link, file=sys.stderr)
+        print(f"Link check: {len(broken)} broken internal links")
+        if broken and args.fail_on_broken_links:
+            raise SystemExit(f"Build failed: {len(broken)} broken internal links")
+
+    if args.gzip:
+        print("Compressing changed outputs...")
+        with metrics.phase("gzip"):
+            for output_dir in output_dirs:
+                compressed, unchanged = precompress(output_dir, args.gzip_extensions, args.gzip_level,
+                                                    args.gzip_min_size, args.jobs)
+                print(f"{output_dir}: {compressed} compressed, {unchanged} unchanged")
+
+    print("Writing page manifest...")
+    with metrics.phase("manifest"):
+        # Compared before the manifest of the previous build is overwritten
+        changed = changed_pages(manifest_path(dir_path_public), page_index)
+        for output_dir in output_dirs:
+            publish_changes(output_dir, changed_outputs(output_dir, changed, static, context.assets,
+                                                        site_changed.get(output_dir, ())),
+                            static)
+        page_index.write_manifest(manifest_path(dir_path_public))
+        for _, mirror_dir in mirrors:
+            metrics.bytes_written += write_mirror_manifest(page_index, mirror_dir)
+        if args.shard is not None:
+            for output_dir in output_dirs:
+                write_shard_info(output_dir, args.shard, len(page_index))
+        page_index.close()
+
+    if args.shard is None:
+        write_deps(dir_path_public, {"options": build_options(args), "template": file_digest(template_path),
+                                     "assets": asset_digest(context.assets)})
+
+    if cache is not None:
+        with metrics.phase("cache_gc"):
+            freed = cache.collect(args.cache_size * 1024 * 1024)
+        if freed:
+            print(f"Evicted {freed} bytes from the build cache")
+
+    metrics.static_bytes_copied = static_bytes
+    if args.metrics:
+        print(f"Writing build metrics to {args.metrics}...")
+        metrics.write(args.metrics)
+
+    if budget is not None:
+        check_memory_budget(budget, metrics.worker_peak_rss)
+
+
+def changed_outputs(output_dir: str, changed_page_paths: Optional[List[str]],
+                    static: Dict[str, List[int]], assets: Optional[AssetManifest],
+                    generated: Iterable[str] = ()) -> Optional[List[str]]:
+    """Returns: the output paths of output_dir this build changed (its pages as compared
+       by changed_pages, static files by snapshot and the generated site files given),
+       or None if any may have changed."""
+    if changed_page_paths is None or not os.path.exists(manifest_path(output_dir)):
+        return None
+    previous = load_changes(output_dir)
+    if previous["sequence"] == 0:
+        return None
+    entries = assets.entries if assets is not None else {}
+    static_paths = [entries[path]["dest"] if path in entries else path
+                    for path in changed_static(previous.get("static", {}), static)]
+    return sorted(set(changed_page_paths) | set(static_paths) | set(generated))
+
+
+def write_mirror_manifest(page_index: PageIndex, mirror_dir: str) -> int:
+    """Writes the manifest of a mirror output directory: the records of the primary
+       build with the output sizes and hashes of the mirror's pages.
+       Returns: the total size of the mirror's pages."""
+    total = 0
+
+    def mirror_records() -> Iterator[PageRecord]:
+        nonlocal total
+        for record in page_index:
+            mirror_record = PageRecord.from_dict(record.to_dict())
+            with open(os.path.join(mirror_dir, record.dest), "rb") as page_file:
+                page = page_file.read()
+            mirror_record.output_bytes = len(page)
+            mirror_record.output_hash = hashlib.sha256(page).hexdigest()
+            total += mirror_record.output_bytes
+            yield mirror_record
+
+    write_manifest_records(manifest_path(mirror_dir), mirror_records())
+    return total
+
+
+def check_memory_budget(budget: int, worker_peak: int = 0) -> None:
+    """Fails the build (non-zero exit) if the peak RSS exceeded the budget in bytes.
+       The budget applies to each process on its own, not to their sum: the build
+       process, its exited children and, given their reported worker_peak, live workers
+       (whose RSS also counts the pages they share copy-on-write with this process)."""
+    if (peak := peak_rss_bytes(worker_peak)) is None:
+        print("Peak RSS is not available on this platform; memory budget not enforced.")
+        return
+    print(f"Peak RSS: {peak / 2**20:.1f} MiB (budget {budget / 2**20:.1f} MiB)")
+    if peak > budget:
+        raise SystemExit(f"Peak RSS {peak / 2**20:.1f} MiB exceeded the memory budget "
+                         f"of {budget / 2**20:.1f} MiB")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
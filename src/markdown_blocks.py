@@ -1,9 +1,11 @@
+import mmap
 import re
 from enum import Enum
-from typing import List
-from htmlnode import HTMLNode, LeafNode, ParentNode, text_node_to_html_node
-from textnode import TextNode, TextType
+from typing import Iterable, Iterator, List, Optional, Tuple
+from htmlnode import HTMLNode, HTMLWriter, LeafNode, ParentNode, text_node_to_html_node
 from inline_markdown import text_to_textnodes
+from flat_ir import FlatDocument
+from metadata import iter_line_bounds
 
 
 class BlockType(Enum):
@@ -16,56 +18,158 @@ class BlockType(Enum):
     HORIZONTAL_RULE = 'horizontal_rule'
 
 
+# Blank lines and code fence lines, the only lines that delimit blocks
+_BOUNDARY_LINE = re.compile(r'^[^\S\n]*(?:(```)|$)', re.MULTILINE)
+# The line boundaries of str.splitlines()
+_LINE_BREAK = re.compile('\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+_ORDERED_ITEM = re.compile(r'\d+\. ')
+_HORIZONTAL_RULE = re.compile(r'-{3,}|\*{3,}|_{3,}')
+
+HEADING_PREFIXES = ('# ', '## ', '### ', '#### ', '##### ', '###### ')
+
+
+def strip_span(source: str, start: int, end: int) -> Tuple[int, int]:
+    """Returns: the (start, end) of source[start:end].strip() within source, without copying."""
+    while start < end and source[start].isspace():
+        start += 1
+    while end > start and source[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def iter_block_spans(markdown: str) -> Iterator[Tuple[int, int]]:
+    """Find the blocks of markdown_to_blocks as (start, end) offsets into markdown,
+        so no block is copied until it is emitted. Only blank and fence lines are
+        visited; the lines between them (including all code) are skipped in C.
+        Args: markdown - The markdown text to split into blocks.
+        Returns: An iterator of (start, end) spans of stripped, non-empty blocks.
+    """
+    block_start = -1
+    in_code_block = False
+    next_line = 0   # Start of the line after the previous boundary line
+
+    for boundary in _BOUNDARY_LINE.finditer(markdown):
+        line_start = boundary.start()
+        if block_start == -1 and line_start > next_line:
+            block_start = next_line     # Text lines since the previous boundary
+        if boundary.group(1) is not None:
+            in_code_block = not in_code_block
+            if block_start == -1:
+                block_start = line_start
+            line_end = markdown.find('\n', boundary.end())
+            next_line = len(markdown) + 1 if line_end == -1 else line_end + 1
+            continue
+        if not in_code_block and block_start != -1:
+            # Empty line outside code block = end of block
+            span = strip_span(markdown, block_start, line_start)
+            if span[0] < span[1]:
+                yield span
+            block_start = -1
+        next_line = boundary.end() + 1
+
+    if block_start == -1 and next_line < len(markdown):
+        block_start = next_line
+    if block_start != -1:
+        span = strip_span(markdown, block_start, len(markdown))
+        if span[0] < span[1]:
+            yield span
+
+
 def markdown_to_blocks(markdown: str) -> List[str]:
     """Parse markdown into blocks, handling fenced code blocks correctly.
         Args: markdown - The markdown text to convert to blocks.
         Returns: A list of markdown blocks.
     """
-    blocks: List[str] = []
-    lines: List[str] = markdown.split('\n')
-    current_block: List[str] = []
-    in_code_block: bool = False
-
-    for line in lines:
-        # Check if we're entering/exiting a code block
-        if line.strip().startswith('```'):
-            in_code_block = not in_code_block
-            current_block.append(line)
-        elif not in_code_block and line.strip() == '':
+    return [markdown[start:end] for start, end in iter_block_spans(markdown)]
+
+
+def iter_line_spans(source: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+    """Yield the (start, end) of each line of source[start:end], split like str.splitlines()."""
+    pos = start
+    for line_break in _LINE_BREAK.finditer(source, start, end):
+        yield pos, line_break.start()
+        pos = line_break.end()
+    if pos < end:
+        yield pos, end
+
+
+# ASCII characters that str.strip() treats as whitespace
+_ASCII_WHITESPACE = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
+
+
+def _classify_line(line: bytes) -> Tuple[bool, bool]:
+    """Returns: (is_blank, is_fence) for a raw line, decoding it only if it is not ASCII."""
+    if line.isascii():
+        stripped_bytes = line.strip(_ASCII_WHITESPACE)
+        return not stripped_bytes, stripped_bytes.startswith(b'```')
+    stripped = line.decode('utf-8').strip()
+    return not stripped, stripped.startswith('```')
+
+
+def iter_blocks_from_buffer(buffer: bytes | mmap.mmap, start: int = 0) -> Iterator[str]:
+    """Yield the same blocks as markdown_to_blocks from raw UTF-8 bytes (e.g. an mmap),
+        finding block boundaries over the bytes and decoding one block at a time.
+        Line breaks (LF, CRLF or a lone CR) are normalized like text-mode reads.
+        Args: buffer - The markdown source as bytes or a memory-mapped file.
+              Optional[start] - Byte offset to parse from (e.g. past the front matter).
+        Returns: An iterator of markdown blocks.
+    """
+    block_start, block_end = -1, -1
+    in_code_block = False
+
+    for pos, line_end in iter_line_bounds(buffer, start):
+        is_blank, is_fence = _classify_line(buffer[pos:line_end])
+
+        if not is_fence and not in_code_block and is_blank:
             # Empty line outside code block = end of block
-            if current_block:
-                blocks.append('\n'.join(current_block))
-                current_block = []
+            if block_start != -1:
+                if block := _decode_block(buffer, block_start, block_end):
+                    yield block
+                block_start = -1
         else:
-            # Regular line or line inside code block
-            current_block.append(line)
+            if is_fence:
+                in_code_block = not in_code_block
+            if block_start == -1:
+                block_start = pos
+            block_end = line_end
 
-    # Don't forget the last block
-    if current_block:
-        blocks.append('\n'.join(current_block))
+    if block_start != -1 and (block := _decode_block(buffer, block_start, block_end)):
+        yield block
+
+
+def _decode_block(buffer: bytes | mmap.mmap, start: int, end: int) -> str:
+    return buffer[start:end].decode('utf-8').replace('\r\n', '\n').replace('\r', '\n').strip()
 
-    return [block.strip() for block in blocks if block.strip()]
-    
 
 
 def block_to_block_type(block: str) -> BlockType:
     """Args: block - The markdown block to determine the type of.
        Returns: The BlockType of the given markdown block."""
-    if block.startswith(('# ', '## ', '### ', '#### ', '##### ', '###### ')):
+    return span_block_type(block, 0, len(block))
+
+
+def span_block_type(source: str, start: int, end: int) -> BlockType:
+    """Returns: The BlockType of the (stripped) block source[start:end], without slicing it."""
+    if source.startswith(HEADING_PREFIXES, start, end):
         return BlockType.HEADING
-    elif block.startswith('```') and block.endswith('```') and '\n' in block:
+    elif (source.startswith('```', start, end) and source.endswith('```', start, end)
+          and source.find('\n', start, end) != -1):
         return BlockType.CODE
-    elif all(line.startswith('>') for line in block.splitlines()):
-        return BlockType.QUOTE
-    elif all(line.startswith(("- ", "* ", "+ ")) for line in block.splitlines()):
-        return BlockType.UNORDERED_LIST
-    elif all(re.match(r'^\d+\. ', line) for line in block.splitlines()):
-        return BlockType.ORDERED_LIST
-    elif re.match(r'^(-{3,}|\*{3,}|_{3,})$', block.strip()):
+    # Only blocks whose first line could be a quote or list item are split into lines
+    if source.startswith(('>', '- ', '* ', '+ '), start, end) or source[start].isdigit():
+        lines = list(iter_line_spans(source, start, end))
+        if all(source.startswith('>', line_start, line_end) for line_start, line_end in lines):
+            return BlockType.QUOTE
+        elif all(source.startswith(("- ", "* ", "+ "), line_start, line_end)
+                 for line_start, line_end in lines):
+            return BlockType.UNORDERED_LIST
+        elif all(_ORDERED_ITEM.match(source, line_start, line_end) for line_start, line_end in lines):
+            return BlockType.ORDERED_LIST
+    if _HORIZONTAL_RULE.fullmatch(source, start, end):
         return BlockType.HORIZONTAL_RULE
     else:
         return BlockType.PARAGRAPH
-    
+
 
 def parse_children(text: str) -> List[HTMLNode | LeafNode | ParentNode]:
     """Parse markdown text into HTML nodes.
@@ -90,49 +194,105 @@ def parse_children(text: str) -> List[HTMLNode | LeafNode | ParentNode]:
     return result
 
 
-def markdown_to_html_node(markdown: str) -> ParentNode:
-    """Convert a markdown string to an HTML ParentNode."""
-    blocks = markdown_to_blocks(markdown)
-    children: List[HTMLNode] = []
-    
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        
-        if block_type == BlockType.PARAGRAPH:
-            children.append(ParentNode(tag="p", children=parse_children(block)))
-
-        elif block_type == BlockType.HEADING:
-            heading_text = block.lstrip('# ').strip()  # Remove leading '#'s and space
-            heading_level = len(block) - len(block.lstrip('#'))  # Count number of '#'s
-            children.append(ParentNode(tag=f"h{heading_level}", children=parse_children(heading_text)))
-
-        elif block_type == BlockType.CODE:
-            # Extract code content (skip first line with ``` and optional language)
-            first_newline = block.find('\n')
-            code_content = block[first_newline + 1 : -3]
-            children.append(ParentNode(tag="pre", children=[
-                            ParentNode(tag="code", children=[
-                            text_node_to_html_node(TextNode(code_content, TextType.TEXT))])]))
-
-        elif block_type == BlockType.QUOTE:
-            quote_text = '\n'.join(
-                line[2:] if line.startswith('> ') else line[1:]
-                for line in block.splitlines()
-            )
-            children.append(ParentNode(tag="blockquote", children=parse_children(quote_text)))
-
-        elif block_type == BlockType.UNORDERED_LIST:
-            list_items = [line[2:] for line in block.splitlines()]  # Skip "- ", "* ", or "+ "
-            children.append(ParentNode(tag="ul", children=[
-                            ParentNode(tag="li", children=parse_children(item)) for item in list_items]))
-            
-        elif block_type == BlockType.ORDERED_LIST:
-            list_items = [line.split('. ', 1)[1].strip() for line in block.splitlines()]
-            children.append(ParentNode(tag="ol", children=[
-                            ParentNode(tag="li", children=parse_children(item)) for item in list_items]))
-        
-        elif block_type == BlockType.HORIZONTAL_RULE:
-            children.append(LeafNode(tag="hr", value=""))
-            
-    return ParentNode(tag="div", children=children)
+def emit_children(doc: FlatDocument | HTMLWriter, text: str) -> None:
+    """Parse markdown text and append its inline content to a FlatDocument or HTMLWriter.
+        Mirrors parse_children without building HTMLNodes.
+    """
+    if not text:
+        return
+
+    parts = text.split('  \n')
+    for i, part in enumerate(parts):
+        if part:
+            doc.inline(text_to_textnodes(' '.join(part.split())))
+        if i < len(parts) - 1:
+            doc.void("br")
+
+
+def _emit_element(doc: FlatDocument | HTMLWriter, tag: str, text: str) -> None:
+    doc.open(tag)
+    emit_children(doc, text)
+    doc.close(tag)
+
+
+def emit_markdown(doc: FlatDocument | HTMLWriter, markdown: str,
+                  spans: Optional[Iterable[Tuple[int, int]]] = None) -> None:
+    """Append the content of a markdown document, wrapped in a <div>, to doc.
+       Blocks are parsed as spans of markdown (those of iter_block_spans unless given);
+       text is sliced out only where it is emitted."""
+    doc.open("div")
+    for start, end in spans if spans is not None else iter_block_spans(markdown):
+        emit_block_span(doc, markdown, start, end)
+    doc.close("div")
+
+
+def emit_block(doc: FlatDocument | HTMLWriter, block: str) -> None:
+    """Parse a single markdown block and append its content to doc."""
+    emit_block_span(doc, block, 0, len(block))
+
+
+def emit_block_span(doc: FlatDocument | HTMLWriter, source: str, start: int, end: int) -> None:
+    """Parse the markdown block source[start:end] and append its content to doc.
+       Heading markers, fences and list markers are skipped by offset, so each piece of
+       text is copied once, when it is handed to the inline parser or escaped."""
+    block_type = span_block_type(source, start, end)
+
+    if block_type == BlockType.PARAGRAPH:
+        _emit_element(doc, "p", source[start:end])
+
+    elif block_type == BlockType.HEADING:
+        text_start = start
+        while text_start < end and source[text_start] in '# ':  # Remove leading '#'s and space
+            text_start += 1
+        heading_level = 0  # Count number of '#'s
+        while source[start + heading_level] == '#':
+            heading_level += 1
+        _emit_element(doc, f"h{heading_level}", source[slice(*strip_span(source, text_start, end))])
+
+    elif block_type == BlockType.CODE:
+        # Extract code content (skip first line with ``` and optional language)
+        first_newline = source.find('\n', start, end)
+        doc.open("pre")
+        doc.open("code")
+        doc.text(source[first_newline + 1 : max(end - 3, first_newline + 1)])
+        doc.close("code")
+        doc.close("pre")
+
+    elif block_type == BlockType.QUOTE:
+        quote_text = '\n'.join(
+            source[line_start + 2 if source.startswith('> ', line_start, line_end) else line_start + 1
+                   :line_end]
+            for line_start, line_end in iter_line_spans(source, start, end)
+        )
+        _emit_element(doc, "blockquote", quote_text)
+
+    elif block_type == BlockType.UNORDERED_LIST:
+        doc.open("ul")
+        for line_start, line_end in iter_line_spans(source, start, end):
+            _emit_element(doc, "li", source[line_start + 2:line_end])  # Skip "- ", "* ", or "+ "
+        doc.close("ul")
+
+    elif block_type == BlockType.ORDERED_LIST:
+        doc.open("ol")
+        for line_start, line_end in iter_line_spans(source, start, end):
+            item = strip_span(source, source.find('. ', line_start, line_end) + 2, line_end)
+            _emit_element(doc, "li", source[slice(*item)])
+        doc.close("ol")
+
+    elif block_type == BlockType.HORIZONTAL_RULE:
+        doc.void("hr")
+
+
+def markdown_to_flat_document(markdown: str,
+                              spans: Optional[Iterable[Tuple[int, int]]] = None) -> FlatDocument:
+    """Convert a markdown string directly to a FlatDocument, without building node trees.
+       Args: spans - Block spans of markdown already found by iter_block_spans, if any."""
+    doc = FlatDocument()
+    emit_markdown(doc, markdown, spans)
+    return doc
+
 
+def markdown_to_html_node(markdown: str) -> HTMLNode:
+    """Convert a markdown string to an HTML node tree.
+        The tree is a view built on demand from markdown_to_flat_document."""
+    return markdown_to_flat_document(markdown).to_html_node()
@@ -0,0 +1,115 @@
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Pages and allocation sites listed by MemoryProfile.report
+DEFAULT_TOP = 10
+
+# Stack frames recorded per allocation; one attributes memory to the allocating line
+DEFAULT_FRAMES = 1
+
+
+def _format_size(size: float) -> str:
+    return f"{size / 2**20:.2f} MiB" if abs(size) >= 2**20 else f"{size / 1024:.1f} KiB"
+
+
+class PageMemory:
+    """Traced memory of generating one page.
+        Args:
+            path - Markdown source path of the page
+            peak - Highest traced memory above that at the start of the page, in bytes
+            retained - Traced memory still held after the page, in bytes
+    """
+
+    def __init__(self, path: str, peak: int, retained: int) -> None:
+        self.path = path
+        self.peak = peak
+        self.retained = retained
+
+    def __repr__(self) -> str:
+        return f"PageMemory({self.path}, peak={self.peak}, retained={self.retained})"
+
+
+class MemoryProfile:
+    """Profiles the memory of a build page by page with tracemalloc. For every page the
+        peak traced memory is measured, and the allocations alive at its checkpoint (when
+        the page is fully rendered) are attributed to the lines that made them and summed
+        over the build. Tracing slows the build severalfold; it is a diagnostic mode.
+        Args:
+            Optional[frames] - Stack frames recorded per allocation
+    """
+
+    def __init__(self, frames: int = DEFAULT_FRAMES) -> None:
+        self.frames = frames
+        self.pages: List[PageMemory] = []
+        self.sites: Dict[tracemalloc.Traceback, List[int]] = {}   # -> [bytes, blocks]
+        self._started_tracing = False
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._checkpoint: Optional[tracemalloc.Snapshot] = None
+
+    def __repr__(self) -> str:
+        return f"MemoryProfile(pages={len(self.pages)}, sites={len(self.sites)})"
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def page(self, path: str) -> Iterator[None]:
+        """Profiles the generation of the page at path inside the block."""
+        self._baseline = self._snapshot()
+        self._checkpoint = None
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            self.pages.append(PageMemory(path, peak - start, current - start))
+            if self._checkpoint is not None:
+                for stat in self._checkpoint.compare_to(self._baseline, "traceback"):
+                    if stat.size_diff > 0:
+                        site = self.sites.setdefault(stat.traceback, [0, 0])
+                        site[0] += stat.size_diff
+                        site[1] += max(stat.count_diff, 0)
+            self._baseline = self._checkpoint = None
+
+    def checkpoint(self) -> None:
+        """Marks the point of the current page where its rendered state is alive: what
+           was allocated since the page started is attributed to its allocation sites."""
+        if self._baseline is not None:
+            self._checkpoint = self._snapshot()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        # Leaves out the allocations of tracemalloc itself and of this module
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def top_pages(self, top: int = DEFAULT_TOP) -> List[PageMemory]:
+        return sorted(self.pages, key=lambda page: page.peak, reverse=True)[:top]
+
+    def top_sites(self, top: int = DEFAULT_TOP) -> List[Tuple[str, int, int]]:
+        """Returns: (site, bytes, blocks) of the sites that allocated the most, summed over pages."""
+        ranked = sorted(self.sites.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        return [(" <- ".join(f"{frame.filename}:{frame.lineno}" for frame in traceback), size, count)
+                for traceback, (size, count) in ranked]
+
+    def report(self, top: int = DEFAULT_TOP) -> str:
+        """Returns: the top pages by peak memory and the top allocation sites, as text."""
+        lines = [f"Top {top} pages by peak traced memory (of {len(self.pages)}):"]
+        for page in self.top_pages(top):
+            lines.append(f"  {_format_size(page.peak):>12} peak  {_format_size(page.retained):>12} "
+                         f"retained  {page.path}")
+        lines.append(f"Top {top} allocation sites of rendered pages:")
+        for site, size, count in self.top_sites(top):
+            lines.append(f"  {_format_size(size):>12}  {count:9} blocks  {site}")
+        return "\n".join(lines)
@@ -0,0 +1,107 @@
+import mmap
+from typing import Dict, Iterator, Optional, Tuple
+
+
+# Front matter is a block of "key: value" lines (blank and '#' comment lines allowed)
+# between two '---' lines at the very start of a page; it is not rendered
+FRONT_MATTER_DELIMITER = b"---"
+
+# A page whose front matter does not close within this many bytes has none
+MAX_FRONT_MATTER_BYTES = 64 * 1024
+
+# Front matter key that overrides the first H1 as the page title
+TITLE_KEY = "title"
+
+
+class PageMetadata:
+    """Metadata of a page, read from the head of its source without rendering it.
+        Args:
+            Optional[title] - Front matter title, or the text of the first H1
+            Optional[front_matter] - Front matter fields
+            Optional[body_start] - Byte offset of the markdown after the front matter
+    """
+
+    def __init__(self, title: Optional[str] = None,
+                 front_matter: Optional[Dict[str, str]] = None,
+                 body_start: int = 0) -> None:
+        self.title = title
+        self.front_matter = front_matter if front_matter is not None else {}
+        self.body_start = body_start
+
+    def __repr__(self) -> str:
+        return f"PageMetadata(title={self.title}, front_matter={self.front_matter})"
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def parse_front_matter(buffer: bytes | mmap.mmap) -> Tuple[Dict[str, str], int]:
+    """Args: buffer - The markdown source as bytes or a memory-mapped file.
+       Returns: (front matter fields, byte offset of the markdown after it); ({}, 0)
+       if the source does not start with a closed front matter block, or if the block
+       holds other lines (a '---' rule followed by text, which is rendered)."""
+    first_end = buffer.find(b"\n", 0, len(FRONT_MATTER_DELIMITER) + 2)
+    if first_end == -1 or buffer[:first_end].rstrip() != FRONT_MATTER_DELIMITER:
+        return {}, 0
+
+    fields: Dict[str, str] = {}
+    pos = first_end + 1
+    limit = min(len(buffer), MAX_FRONT_MATTER_BYTES)
+    while pos < limit:
+        line_end = buffer.find(b"\n", pos, limit)
+        if line_end == -1:
+            line_end = limit
+        line = buffer[pos:line_end].decode("utf-8").strip()
+        pos = line_end + 1
+        if line == FRONT_MATTER_DELIMITER.decode():
+            return fields, min(pos, len(buffer))
+        if not line or line.startswith("#"):
+            continue
+        key, colon, value = line.partition(":")
+        if not colon or not key.strip():
+            return {}, 0
+        fields[key.strip()] = _unquote(value.strip())
+    return {}, 0
+
+
+def iter_line_bounds(buffer: bytes | mmap.mmap, start: int = 0) -> Iterator[Tuple[int, int]]:
+    """Yields (start, end) of every line of buffer from start, without its line break.
+       Lines end at LF, CRLF or a lone CR, like a text-mode read with universal newlines;
+       the last line ends at the end of the buffer (and is empty after a final break)."""
+    size = len(buffer)
+    next_lf = next_cr = -1   # Next break of each kind, searched again only once passed
+    pos = start
+    while pos <= size:
+        if next_lf < pos:
+            next_lf = buffer.find(b"\n", pos)
+            next_lf = size if next_lf == -1 else next_lf
+        if next_cr < pos:
+            next_cr = buffer.find(b"\r", pos)
+            next_cr = size if next_cr == -1 else next_cr
+        line_end = min(next_lf, next_cr)
+        yield pos, line_end
+        pos = line_end + (2 if line_end == next_cr and next_lf == line_end + 1 else 1)
+
+
+def scan_title(buffer: bytes | mmap.mmap, start: int = 0) -> Optional[str]:
+    """Finds the title of a page: the rest of the first line from start that begins
+        with "# ", wherever it is (the title rule of every build path, so a page gets the
+        same title whether it is rendered, streamed or reused from the cache).
+        Only the lines up to the title are decoded.
+        Returns: the stripped title (possibly empty), or None if no line begins with "# "."""
+    for line_start, line_end in iter_line_bounds(buffer, start):
+        if buffer[line_start:line_start + 2] == b"# ":
+            return buffer[line_start + 2:line_end].decode("utf-8").strip()
+    return None
+
+
+def scan_metadata(buffer: bytes | mmap.mmap) -> PageMetadata:
+    """Reads the front matter and, unless it sets the title, the first H1 of a source,
+       stopping at whichever comes last; the rest of the source is never touched."""
+    front_matter, body_start = parse_front_matter(buffer)
+    title = front_matter.get(TITLE_KEY) or scan_title(buffer, body_start)
+    return PageMetadata(title, front_matter, body_start)
+
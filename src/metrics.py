@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from tracing import span
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore[assignment]
+
+
+# Upper bounds (seconds) of the per-page render time histogram buckets
+RENDER_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+METRIC_PREFIX = "ssg_build"
+
+
+def peak_rss_bytes(worker_peak: int = 0) -> Optional[int]:
+    """Returns: peak resident set size in bytes of the largest process of the build, or
+       None if unknown: this process, its child processes that have exited (e.g. gzip
+       workers and killed page workers), or worker_peak, the peak reported by live workers.
+       Args: worker_peak - Peak RSS in bytes reported by workers that are still running."""
+    if resource is None:
+        return None
+    max_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return max(max_rss if sys.platform == "darwin" else max_rss * 1024, worker_peak)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class BuildMetrics:
+    """Counters, timings and cache statistics collected during one build,
+       exported in the Prometheus text exposition format."""
+
+    def __init__(self, buckets: Tuple[float, ...] = RENDER_TIME_BUCKETS) -> None:
+        self.pages_rendered = 0
+        self.pages_skipped = 0
+        self.static_bytes_copied = 0
+        self.bytes_written = 0
+        self.phase_seconds: Dict[str, float] = {}
+        self.cache_hits: Dict[str, int] = {}
+        self.cache_misses: Dict[str, int] = {}
+        self.buckets = buckets
+        self.render_bucket_counts: List[int] = [0] * len(buckets)
+        self.render_seconds_sum = 0.0
+        self.render_count = 0
+        self.worker_peak_rss = 0
+
+    def __repr__(self) -> str:
+        return (f"BuildMetrics(pages_rendered={self.pages_rendered}, "
+                f"pages_skipped={self.pages_skipped}, bytes_written={self.bytes_written})")
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a build phase; repeated phases with the same name accumulate.
+           The phase is also a span of the installed tracer, if any."""
+        start = time.perf_counter()
+        try:
+            with span(name):
+                yield
+        finally:
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def observe_render(self, seconds: float) -> None:
+        """Record the render time of one page."""
+        self.render_count += 1
+        self.render_seconds_sum += seconds
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.render_bucket_counts[i] += 1
+                break
+
+    def observe_worker_rss(self, rss: int) -> None:
+        """Record the peak RSS in bytes reported by worker processes."""
+        self.worker_peak_rss = max(self.worker_peak_rss, rss)
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        counts = self.cache_hits if hit else self.cache_misses
+        counts[cache] = counts.get(cache, 0) + 1
+
+    def cache_hit_ratio(self, cache: str) -> float:
+        hits, misses = self.cache_hits.get(cache, 0), self.cache_misses.get(cache, 0)
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def to_prometheus(self) -> str:
+        """Returns: the metrics in Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str,
+                   samples: List[Tuple[str, Dict[str, str], float]]) -> None:
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+                label_text = f"{{{label_text}}}" if label_text else ''
+                lines.append(f"{full_name}{suffix}{label_text} {_format_value(value)}")
+
+        metric("pages_rendered", "gauge", "Pages rendered by the last build.",
+               [('', {}, self.pages_rendered)])
+        metric("pages_skipped", "gauge", "Pages skipped by the last build.",
+               [('', {}, self.pages_skipped)])
+        metric("static_bytes_copied", "gauge", "Bytes of static assets copied by the last build.",
+               [('', {}, self.static_bytes_copied)])
+        metric("bytes_written", "gauge", "Bytes of generated pages written by the last build.",
+               [('', {}, self.bytes_written)])
+        metric("phase_duration_seconds", "gauge", "Wall time of each build phase.",
+               [('', {"phase": phase}, seconds) for phase, seconds in self.phase_seconds.items()])
+
+        caches = sorted(set(self.cache_hits) | set(self.cache_misses))
+        metric("cache_hits", "gauge", "Cache hits during the last build.",
+               [('', {"cache": cache}, self.cache_hits.get(cache, 0)) for cache in caches])
+        metric("cache_misses", "gauge", "Cache misses during the last build.",
+               [('', {"cache": cache}, self.cache_misses.get(cache, 0)) for cache in caches])
+        metric("cache_hit_ratio", "gauge", "Cache hit ratio during the last build.",
+               [('', {"cache": cache}, self.cache_hit_ratio(cache)) for cache in caches])
+
+        if (rss := peak_rss_bytes(self.worker_peak_rss)) is not None:
+            metric("peak_rss_bytes", "gauge",
+                   "Peak resident set size of the largest build or worker process.",
+                   [('', {}, rss)])
+
+        cumulative, samples = 0, []
+        for bound, count in zip(self.buckets, self.render_bucket_counts):
+            cumulative += count
+            samples.append(("_bucket", {"le": _format_value(float(bound))}, cumulative))
+        samples.append(("_bucket", {"le": "+Inf"}, self.render_count))
+        samples.append(("_sum", {}, self.render_seconds_sum))
+        samples.append(("_count", {}, self.render_count))
+        metric("page_render_seconds", "histogram", "Per-page render time.", samples)
+
+        metric("last_run_timestamp_seconds", "gauge", "Unix time the build finished.",
+               [('', {}, time.time())])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """Atomically write the metrics file, so the textfile collector never reads a partial file."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as metrics_file:
+            metrics_file.write(self.to_prometheus())
+        os.replace(tmp_path, path)
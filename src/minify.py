@@ -0,0 +1,88 @@
+import functools
+import re
+from typing import List
+from htmlnode import PRESERVE_WHITESPACE, VOID_ELEMENTS, attribute_to_html, collapse_whitespace
+
+
+# Elements that start and end a line box: whitespace next to their tags never renders
+BLOCK_ELEMENTS = frozenset(
+    ['html', 'head', 'body', 'title', 'meta', 'link', 'base', 'script', 'style', 'noscript',
+     'article', 'aside', 'section', 'nav', 'header', 'footer', 'main', 'div', 'p', 'hr', 'br',
+     'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'dl', 'dt', 'dd', 'blockquote',
+     'pre', 'figure', 'figcaption', 'table', 'caption', 'thead', 'tbody', 'tfoot', 'tr',
+     'td', 'th', 'form', 'fieldset', 'legend', 'details', 'summary', 'address']
+)
+
+# Comments, doctypes, and start/end tags (quoted attribute values may contain '>')
+_TOKEN = re.compile(r'<!--.*?-->|<![^>]*>|<(/?)([a-zA-Z][a-zA-Z0-9-]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>',
+                    re.DOTALL)
+_ATTRIBUTE = re.compile(r'\s*([^\s=/>"\']+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+# The '/' of '<br />' or '<img src="x"/>', but not the end of an unquoted value like href=a/
+_SELF_CLOSING_SLASH = re.compile(r'(?:^|(?<=[\s"\']))/\s*$')
+_TEMPLATE_PLACEHOLDER = '{{'
+
+
+def _minify_tag(name: str, attributes: str, closing: bool) -> str:
+    if closing:
+        return f"</{name}>"
+    parts = [f"<{name}"]
+    for match in _ATTRIBUTE.finditer(_SELF_CLOSING_SLASH.sub('', attributes)):
+        key, double, single, bare = match.groups()
+        value = next((group for group in (double, single, bare) if group is not None), None)
+        if value is None:
+            parts.append(f" {key}")
+        elif _TEMPLATE_PLACEHOLDER in value or '"' in value:
+            # Placeholders are filled per page; a '"' can only appear in a single-quoted value
+            quote = "'" if '"' in value else '"'
+            parts.append(f" {key}={quote}{value}{quote}")
+        else:
+            parts.append(attribute_to_html(key, value, True))
+    parts.append(">")
+    return ''.join(parts)
+
+
+def _is_block_boundary(token: re.Match) -> bool:
+    """True for comments, doctypes and tags of BLOCK_ELEMENTS."""
+    return token.group(2) is None or token.group(2).lower() in BLOCK_ELEMENTS
+
+
+@functools.lru_cache(maxsize=16)
+def minify_html(html: str) -> str:
+    """Minify hand-written HTML such as the page template: collapse whitespace runs,
+        drop whitespace next to block-level tags, drop optional attribute quotes and
+        the '/' of void tags. Text inside <pre>, <code>, <textarea>, <script> and <style>
+        is kept verbatim, and {{ placeholders }} in attribute values keep their quotes.
+        Cached, so a template is compiled once per build rather than once per page."""
+    out: List[str] = []
+    preserve_depth = 0
+    pos = 0
+    previous = None
+    tokens = list(_TOKEN.finditer(html)) + [None]
+
+    for token in tokens:
+        text = html[pos:token.start() if token is not None else len(html)]
+        if text:
+            if preserve_depth:
+                out.append(text)
+            else:
+                text = collapse_whitespace(text)
+                if previous is None or _is_block_boundary(previous):
+                    text = text.lstrip(' ')
+                if token is None or _is_block_boundary(token):
+                    text = text.rstrip(' ')
+                out.append(text)
+        if token is None:
+            break
+
+        closing, name = token.group(1), token.group(2)
+        if name is None:
+            out.append(token.group(0))
+        else:
+            lower = name.lower()
+            out.append(_minify_tag(name, token.group(3), bool(closing)))
+            if lower in PRESERVE_WHITESPACE and lower not in VOID_ELEMENTS:
+                preserve_depth = max(preserve_depth - 1, 0) if closing else preserve_depth + 1
+        previous = token
+        pos = token.end()
+
+    return ''.join(out)
@@ -0,0 +1,213 @@
+import json
+import os
+import sqlite3
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Name of the directory inside the output directory that holds build state
+STATE_DIR_NAME = ".ssg"
+MANIFEST_NAME = "manifest.jsonl"
+
+# Rough fixed per-record overhead (object, dict slot, small ints) used for memory accounting
+RECORD_OVERHEAD_BYTES = 400
+
+RECORD_FIELDS = ("source", "dest", "title", "source_hash", "mtime_ns", "output_bytes", "output_hash",
+                 "front_matter")
+
+
+class PageRecord:
+    """Metadata of one generated page.
+        Args:
+            source - Markdown path relative to the content directory (POSIX separators)
+            dest - HTML path relative to the output directory (POSIX separators)
+            title - Page title
+            source_hash - SHA-256 hex digest of the markdown source
+            mtime_ns - Modification time of the markdown source
+            output_bytes - Size of the generated page
+            Optional[output_hash] - SHA-256 hex digest of the generated page
+            Optional[front_matter] - Front matter fields of the source
+    """
+
+    def __init__(self, source: str, dest: str, title: str,
+                 source_hash: str, mtime_ns: int, output_bytes: int,
+                 output_hash: str = "", front_matter: Optional[Dict[str, str]] = None) -> None:
+        self.source = source
+        self.dest = dest
+        self.title = title
+        self.source_hash = source_hash
+        self.mtime_ns = mtime_ns
+        self.output_bytes = output_bytes
+        self.output_hash = output_hash
+        self.front_matter = front_matter if front_matter is not None else {}
+        # Search terms counted and internal links with their source lines collected while
+        # rendering, handed to the search index and link checker; not persisted
+        self.terms: Optional[Dict[str, int]] = None
+        self.links: Optional[List[Tuple[str, int]]] = None
+        # (cache, hit) of the template and artifact cache lookups made generating the page,
+        # added to the build metrics; not persisted
+        self.cache_lookups: List[Tuple[str, bool]] = []
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PageRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"PageRecord(source={self.source}, dest={self.dest}, title={self.title})"
+
+    def to_dict(self) -> Dict[str, object]:
+        return {field: getattr(self, field) for field in RECORD_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PageRecord":
+        # Manifests written before output_hash and front_matter existed lack them
+        return cls(**{field: data[field] for field in RECORD_FIELDS if field in data})
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> "PageRecord":
+        """Build a record from a row of the spill database, where front_matter is JSON."""
+        *columns, front_matter = row
+        return cls(*columns, front_matter=json.loads(front_matter))
+
+    def to_row(self) -> Tuple:
+        return tuple(getattr(self, field) for field in RECORD_FIELDS[:-1]) + (
+            json.dumps(self.front_matter, ensure_ascii=False),)
+
+    def estimated_size(self) -> int:
+        """Returns: approximate bytes this record occupies in memory."""
+        return (RECORD_OVERHEAD_BYTES + sys.getsizeof(self.source) + sys.getsizeof(self.dest) +
+                sys.getsizeof(self.title) + sys.getsizeof(self.source_hash) +
+                sys.getsizeof(self.output_hash) + sys.getsizeof(self.front_matter) +
+                sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in self.front_matter.items()))
+
+
+class PageIndex:
+    """Index of generated pages keyed by source path.
+        Records are kept in memory until their estimated size exceeds max_memory_bytes,
+        then the whole index spills to an on-disk SQLite database and stays there.
+        Args:
+            Optional[max_memory_bytes] - In-memory budget for records (None = unlimited)
+            Optional[spill_path] - SQLite file used when spilling (required with a budget)
+    """
+
+    def __init__(self, max_memory_bytes: Optional[int] = None,
+                 spill_path: Optional[str] = None) -> None:
+        if max_memory_bytes is not None and spill_path is None:
+            raise ValueError("PageIndex with a memory budget needs a spill_path")
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_path = spill_path
+        self.memory_bytes = 0
+        self._records: Dict[str, PageRecord] = {}
+        self._db: Optional[sqlite3.Connection] = None
+
+    def __repr__(self) -> str:
+        return f"PageIndex(pages={len(self)}, spilled={self.spilled})"
+
+    @property
+    def spilled(self) -> bool:
+        return self._db is not None
+
+    def __len__(self) -> int:
+        if self._db is not None:
+            return self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[PageRecord]:
+        """Iterate records ordered by source path, streaming from disk when spilled."""
+        if self._db is not None:
+            columns = ', '.join(RECORD_FIELDS)
+            for row in self._db.execute(f"SELECT {columns} FROM pages ORDER BY source"):
+                yield PageRecord.from_row(row)
+        else:
+            for source in sorted(self._records):
+                yield self._records[source]
+
+    def get(self, source: str) -> Optional[PageRecord]:
+        if self._db is not None:
+            columns = ', '.join(RECORD_FIELDS)
+            row = self._db.execute(f"SELECT {columns} FROM pages WHERE source = ?", (source,)).fetchone()
+            return PageRecord.from_row(row) if row else None
+        return self._records.get(source)
+
+    def add(self, record: PageRecord) -> None:
+        """Add or replace the record of a page."""
+        if self._db is not None:
+            self._insert(record)
+            return
+        if (previous := self._records.get(record.source)) is not None:
+            self.memory_bytes -= previous.estimated_size()
+        self._records[record.source] = record
+        self.memory_bytes += record.estimated_size()
+        if self.max_memory_bytes is not None and self.memory_bytes > self.max_memory_bytes:
+            self._spill()
+
+    def remove(self, source: str) -> None:
+        """Remove the record of a page, if any."""
+        if self._db is not None:
+            self._db.execute("DELETE FROM pages WHERE source = ?", (source,))
+        elif (previous := self._records.pop(source, None)) is not None:
+            self.memory_bytes -= previous.estimated_size()
+
+    def _insert(self, record: PageRecord) -> None:
+        assert self._db is not None
+        placeholders = ', '.join('?' for _ in RECORD_FIELDS)
+        self._db.execute(f"INSERT OR REPLACE INTO pages VALUES ({placeholders})", record.to_row())
+
+    def _spill(self) -> None:
+        assert self.spill_path is not None
+        os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+        if os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+        self._db = sqlite3.connect(self.spill_path)
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.execute("CREATE TABLE pages (source TEXT PRIMARY KEY, dest TEXT, title TEXT, "
+                         "source_hash TEXT, mtime_ns INTEGER, output_bytes INTEGER, output_hash TEXT, "
+                         "front_matter TEXT)")
+        for record in self._records.values():
+            self._insert(record)
+        self._records.clear()
+        self.memory_bytes = 0
+
+    def close(self) -> None:
+        """Close and delete the spill database, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            if self.spill_path and os.path.exists(self.spill_path):
+                os.remove(self.spill_path)
+
+    def write_manifest(self, path: str) -> None:
+        """Atomically write the index as JSON lines, one record per line, streaming the records."""
+        write_manifest_records(path, self)
+
+    @classmethod
+    def load_manifest(cls, path: str, max_memory_bytes: Optional[int] = None,
+                      spill_path: Optional[str] = None) -> "PageIndex":
+        """Build an index from a manifest written by write_manifest."""
+        index = cls(max_memory_bytes, spill_path)
+        for record in read_manifest(path):
+            index.add(record)
+        return index
+
+
+def read_manifest(path: str) -> Iterator[PageRecord]:
+    """Yields the records of a manifest written by write_manifest, one line at a time."""
+    with open(path) as manifest_file:
+        for line in manifest_file:
+            if line.strip():
+                yield PageRecord.from_dict(json.loads(line))
+
+
+def write_manifest_records(path: str, records: Iterable[PageRecord]) -> None:
+    """Atomically write records as a JSON lines manifest, consuming them one at a time."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as manifest_file:
+        for record in records:
+            manifest_file.write(json.dumps(record.to_dict(), ensure_ascii=False) + '\n')
+    os.replace(tmp_path, path)
+
+
+def manifest_path(output_dir: str) -> str:
+    """Returns: the path of the page manifest of an output directory."""
+    return os.path.join(output_dir, STATE_DIR_NAME, MANIFEST_NAME)
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from flat_ir import TEXT, FlatDocument
+from markdown_blocks import markdown_to_flat_document
+from metadata import parse_front_matter
+from pageindex import STATE_DIR_NAME, PageRecord
+
+
+# Directory of the output that holds the index files served to the client
+SEARCH_DIR_NAME = "search"
+SEARCH_STATE_NAME = "search.json"
+INDEX_NAME = "index.json"
+CLIENT_NAME = "search.js"
+
+# Term shards; a query loads the index and only the shards of its terms
+DEFAULT_SHARDS = 64
+
+# Indexed terms are runs of word characters, lowercased, of this many characters
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+
+_WORD = re.compile(r"\w+")
+
+# Loads index.json and the shards of the query terms on demand; results are the pages
+# that contain every term, best first, with the URLs of index.json (basepath included).
+# The term hash and tokenizer mirror search.py.
+CLIENT_SCRIPT = """\
+(function (global) {
+  "use strict";
+  var cache = {};
+  function load(base, name) {
+    if (!cache[base + name]) {
+      cache[base + name] = fetch(base + name).then(function (response) { return response.json(); });
+    }
+    return cache[base + name];
+  }
+  function fnv1a(term) {
+    var bytes = new TextEncoder().encode(term), hash = 0x811c9dc5;
+    for (var i = 0; i < bytes.length; i++) {
+      hash = Math.imul(hash ^ bytes[i], 0x01000193) >>> 0;
+    }
+    return hash;
+  }
+  function shardName(term, shards) {
+    var shard = (fnv1a(term) %% shards).toString(16);
+    return "terms-" + (shard.length < 2 ? "0" + shard : shard) + ".json";
+  }
+  // base: URL of the search directory, e.g. "/search/"
+  global.siteSearch = function (query, base) {
+    var terms = (query.toLowerCase().match(/[\\p{L}\\p{N}_]+/gu) || []).filter(function (term) {
+      return term.length >= %(min)d && term.length <= %(max)d;
+    });
+    return load(base, "index.json").then(function (index) {
+      return Promise.all(terms.map(function (term) {
+        return load(base, shardName(term, index.shards)).then(function (shard) { return shard[term] || []; });
+      })).then(function (postings) {
+        var scores = null;
+        postings.forEach(function (posting) {
+          var next = {};
+          for (var i = 0; i < posting.length; i += 2) {
+            if (scores === null || posting[i] in scores) {
+              next[posting[i]] = (scores === null ? 0 : scores[posting[i]]) + posting[i + 1];
+            }
+          }
+          scores = next;
+        });
+        return Object.keys(scores || {}).map(function (id) {
+          var page = index.pages[id];
+          return {url: page[0], title: page[1], score: scores[id]};
+        }).sort(function (a, b) { return b.score - a.score; });
+      });
+    });
+  };
+})(this);
+""" % {"min": MIN_TERM_LENGTH, "max": MAX_TERM_LENGTH}
+
+
+def count_terms(text: str, counts: Counter) -> None:
+    """Adds the search terms of text to counts."""
+    for match in _WORD.finditer(text):
+        term = match.group().lower()
+        if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH:
+            counts[term] += 1
+
+
+def document_terms(doc: FlatDocument, counts: Optional[Counter] = None) -> Counter:
+    """Returns: counts of the search terms in the text leaves of a rendered document,
+       read from its event list without serializing or re-parsing it."""
+    counts = counts if counts is not None else Counter()
+    strings = doc.strings
+    for op, arg in zip(doc.ops, doc.args):
+        if op == TEXT:
+            count_terms(strings[arg], counts)
+    return counts
+
+
+def source_terms(path: str) -> Counter:
+    """Returns: the search terms of a markdown source, rendering it (for pages whose
+       output was reused without a render and that have no recorded terms)."""
+    with open(path, "rb") as md_file:
+        source_bytes = md_file.read()
+    _, body_start = parse_front_matter(source_bytes)
+    markdown = source_bytes[body_start:].decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    return document_terms(markdown_to_flat_document(markdown))
+
+
+def term_shard(term: str, shards: int) -> int:
+    """Returns: the shard of a term, from the 32-bit FNV-1a hash of its UTF-8 bytes."""
+    term_hash = 0x811c9dc5
+    for byte in term.encode('utf-8'):
+        term_hash = ((term_hash ^ byte) * 0x01000193) & 0xffffffff
+    return term_hash % shards
+
+
+def shard_name(shard: int) -> str:
+    return f"terms-{shard:02x}.json"
+
+
+def search_state_path(output_dir: str) -> str:
+    return os.path.join(output_dir, STATE_DIR_NAME, SEARCH_STATE_NAME)
+
+
+def _dumps(data: object) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode('utf-8')
+
+
+class SearchIndex:
+    """Inverted index of the text of all pages (term -> page ids with term counts),
+        written as term shards that the client script loads on demand.
+        The terms of every page are kept in the build state with the hash of its source,
+        so pages that are not rendered keep their postings without being parsed again,
+        and page ids are stable so a changed page only rewrites the shards of its terms.
+        Args:
+            state_dir_parent - Output directory whose build state holds the index state
+            content_dir - Content directory, to parse pages that have no recorded terms
+            Optional[shards] - Number of term shards
+    """
+
+    def __init__(self, state_dir_parent: str, content_dir: str, shards: int = DEFAULT_SHARDS) -> None:
+        self.state_path = search_state_path(state_dir_parent)
+        self.content_dir = content_dir
+        self.shards = shards
+        self.pages: Dict[str, Dict] = {}     # source -> {"id", "hash", "dest", "title", "terms"}
+        self.reparsed = 0
+        state = self._load_state()
+        if state.get("shards") != shards:
+            state = {}
+        self._previous: Dict[str, Dict] = state.get("pages", {})
+        self.digests: Dict[str, str] = state.get("digests", {})
+
+    def __repr__(self) -> str:
+        return f"SearchIndex(pages={len(self.pages)}, shards={self.shards})"
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_path, encoding="utf-8") as state_file:
+                return json.load(state_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def add(self, record: PageRecord) -> None:
+        """Adds a page of this build, with the terms its render left on record.terms.
+           Without them the previous terms are reused if the source is unchanged, else
+           the source is parsed."""
+        terms = record.terms
+        previous = self._previous.get(record.source)
+        if terms is None:
+            if previous is not None and previous["hash"] == record.source_hash:
+                terms = previous["terms"]
+            else:
+                terms = source_terms(os.path.join(self.content_dir, record.source))
+                self.reparsed += 1
+        self.pages[record.source] = {"id": previous["id"] if previous is not None else None,
+                                     "hash": record.source_hash, "dest": record.dest,
+                                     "title": record.title, "terms": dict(terms)}
+
+    def _assign_ids(self) -> List[Optional[Tuple[str, str]]]:
+        """Gives new pages the next free ids, renumbering everything only once more than
+           half of the ids belong to removed pages. Returns: id -> (dest, title)."""
+        used = {page["id"] for page in self.pages.values() if page["id"] is not None}
+        next_id = max(used, default=-1) + 1
+        if next_id > 2 * len(self.pages):
+            for page in self.pages.values():
+                page["id"] = None
+            next_id = 0
+        for source in sorted(self.pages):
+            if self.pages[source]["id"] is None:
+                self.pages[source]["id"] = next_id
+                next_id += 1
+        table: List[Optional[Tuple[str, str]]] = [None] * next_id
+        for page in self.pages.values():
+            table[page["id"]] = (page["dest"], page["title"])
+        return table
+
+    def _term_files(self) -> Dict[str, bytes]:
+        """Returns: name -> content of the term shards and the client script, which do not
+           depend on the basepath. Page ids must be assigned."""
+        shards: List[Dict[str, List[int]]] = [{} for _ in range(self.shards)]
+        for source in sorted(self.pages, key=lambda source: self.pages[source]["id"]):
+            page = self.pages[source]
+            for term, count in page["terms"].items():
+                shards[term_shard(term, self.shards)].setdefault(term, []).extend((page["id"], count))
+        files = {shard_name(shard): _dumps(postings) for shard, postings in enumerate(shards)}
+        files[CLIENT_NAME] = CLIENT_SCRIPT.encode('utf-8')
+        return files
+
+    def _index_file(self, table: List[Optional[Tuple[str, str]]], basepath: str) -> bytes:
+        """Returns: index.json, with the page URLs of a site served under basepath."""
+        pages = [(basepath + page[0], page[1]) if page is not None else None for page in table]
+        return _dumps({"version": 2, "shards": self.shards, "pages": pages})
+
+    def files(self, basepath: str = "/") -> Dict[str, bytes]:
+        """Returns: name -> content of every file of the search directory of a site
+           served under basepath."""
+        table = self._assign_ids()
+        files = self._term_files()
+        files[INDEX_NAME] = self._index_file(table, basepath)
+        return files
+
+    def write(self, targets: Iterable[Tuple[str, str]]) -> Tuple[int, int]:
+        """Writes the changed index files into the search directory of every
+           (basepath, output directory) target and saves the state for the next build.
+           Returns: (files written, files already current) for the first target."""
+        table = self._assign_ids()
+        term_files = self._term_files()
+        digests: Dict[str, Dict[str, str]] = {}   # basepath -> name -> digest
+        counts = None
+        for basepath, output_dir in targets:
+            files = dict(term_files)
+            files[INDEX_NAME] = self._index_file(table, basepath)
+            if basepath not in digests:
+                digests[basepath] = {name: hashlib.sha256(content).hexdigest()
+                                     for name, content in files.items()}
+            previous = self.digests.get(basepath, {})
+            written = unchanged = 0
+            search_dir = os.path.join(output_dir, SEARCH_DIR_NAME)
+            os.makedirs(search_dir, exist_ok=True)
+            for name, content in files.items():
+                path = os.path.join(search_dir, name)
+                if previous.get(name) == digests[basepath][name] and os.path.exists(path):
+                    unchanged += 1
+                    continue
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as index_file:
+                    index_file.write(content)
+                os.replace(tmp_path, path)
+                written += 1
+            for name in set(os.listdir(search_dir)) - set(files):
+                os.remove(os.path.join(search_dir, name))   # Shards of a former shard count
+            if counts is None:
+                counts = (written, unchanged)
+
+        self.digests = digests
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as state_file:
+            state_file.write(_dumps({"shards": self.shards, "pages": self.pages, "digests": digests}))
+        os.replace(tmp_path, self.state_path)
+        return counts if counts is not None else (0, 0)
+
+
+def search_outputs(output_dir: str) -> Set[str]:
+    """Returns: POSIX relative paths of the search files of output_dir, kept when the
+       output directory is pruned for an incremental build."""
+    search_dir = os.path.join(output_dir, SEARCH_DIR_NAME)
+    if not os.path.isdir(search_dir):
+        return set()
+    return {f"{SEARCH_DIR_NAME}/{name}" for name in os.listdir(search_dir)}
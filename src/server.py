@@ -0,0 +1,566 @@
+import argparse
+import email.utils
+import errno
+import json
+import mimetypes
+import os
+import stat as stat_module
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from assets import AssetManifest
+from compress import SIDECAR_SUFFIX, load_state, state_path as gzip_state_path
+from livereload import HEARTBEAT_SECONDS, RELOAD_PATH, ChangeFeed, inject_client
+from pageindex import STATE_DIR_NAME, PageRecord, manifest_path
+
+
+DEFAULT_PORT = 8888
+
+# Open file descriptors kept between requests
+DEFAULT_FILE_CACHE_SIZE = 64
+
+# Seconds between checks of the build state files for a rebuild
+RELOAD_INTERVAL = 1.0
+
+# Seconds an idle keep-alive connection may hold a handler thread
+CONNECTION_TIMEOUT = 30
+
+# Pending connections the listening socket queues while all handler threads are busy
+REQUEST_QUEUE_SIZE = 128
+
+# Digits of the content hash used in strong ETags
+ETAG_HASH_LENGTH = 20
+
+SEND_CHUNK_BYTES = 1 << 16
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Text types are served as UTF-8, which is what the generator writes
+_TEXT_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+class _Content:
+    """Content hash of an output file as recorded by the build, valid while the file
+       still has the recorded size and was not modified after the state was written."""
+    __slots__ = ("digest", "size", "recorded_ns", "immutable")
+
+    def __init__(self, digest: str, size: int, recorded_ns: int, immutable: bool = False) -> None:
+        self.digest = digest
+        self.size = size
+        self.recorded_ns = recorded_ns
+        self.immutable = immutable
+
+    def matches(self, stat: os.stat_result) -> bool:
+        return stat.st_size == self.size and stat.st_mtime_ns <= self.recorded_ns
+
+
+class SiteIndex:
+    """Content hashes of an output directory, read from its build state (page manifest,
+        asset manifest and gzip sidecar state) instead of hashing files per request.
+        The state is reloaded when a rebuild rewrites it, checked at most once per interval.
+        Args:
+            root - Output directory
+            Optional[interval] - Seconds between checks for a rebuild
+    """
+
+    def __init__(self, root: str, interval: float = RELOAD_INTERVAL) -> None:
+        self.root = root
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._checked = float("-inf")
+        self._signature: Optional[Tuple] = None
+        self._contents: Dict[str, _Content] = {}
+        self._sidecars: Dict[str, str] = {}
+
+    def __repr__(self) -> str:
+        return f"SiteIndex({self.root}, files={len(self._contents)})"
+
+    def _state_files(self) -> List[str]:
+        return [manifest_path(self.root), AssetManifest.path(self.root), gzip_state_path(self.root)]
+
+    def refresh(self) -> None:
+        """Reloads the build state if it changed since the last load."""
+        if time.monotonic() - self._checked < self.interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked < self.interval:
+                return
+            signature = tuple(_stat_key(path) for path in self._state_files())
+            if signature != self._signature:
+                self._load(signature)
+            self._checked = time.monotonic()
+
+    def _load(self, signature: Tuple) -> None:
+        page_state, asset_state, _ = signature
+        contents: Dict[str, _Content] = {}
+        if page_state is not None:
+            with open(manifest_path(self.root)) as manifest_file:
+                for line in manifest_file:
+                    if not line.strip():
+                        continue
+                    record = PageRecord.from_dict(json.loads(line))
+                    if record.output_hash:
+                        contents[record.dest] = _Content(record.output_hash, record.output_bytes,
+                                                         page_state[0])
+        if asset_state is not None:
+            for path, entry in AssetManifest.load(self.root).entries.items():
+                contents[entry["dest"]] = _Content(entry["hash"], entry["size"], asset_state[0],
+                                                   immutable=entry["dest"] != path)
+        # Readers see either the old or the new state, never a mix
+        self._contents, self._sidecars = contents, load_state(self.root)
+        self._signature = signature
+
+    def content(self, path: str, stat: os.stat_result) -> Optional[_Content]:
+        """Returns: the recorded content of the POSIX relative path if it is still current."""
+        content = self._contents.get(path)
+        return content if content is not None and content.matches(stat) else None
+
+    def has_sidecar(self, path: str) -> bool:
+        return path in self._sidecars
+
+    def sidecar_current(self, path: str, stat: os.stat_result,
+                        sidecar_stat: os.stat_result) -> bool:
+        """True if the .gz sidecar of path was compressed from its current content."""
+        compressed_from = self._sidecars.get(path)
+        if compressed_from is None:
+            return False
+        if (content := self.content(path, stat)) is not None:
+            return content.digest == compressed_from
+        return sidecar_stat.st_mtime_ns >= stat.st_mtime_ns
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class OpenFile:
+    """An open file descriptor shared by concurrent responses; read with os.pread,
+       so readers need no shared file position."""
+    __slots__ = ("path", "fd", "stat", "refs", "retired")
+
+    def __init__(self, path: str, fd: int) -> None:
+        self.path = path
+        self.fd = fd
+        self.stat = os.fstat(fd)
+        self.refs = 0
+        self.retired = False
+
+    def __repr__(self) -> str:
+        return f"OpenFile({self.path}, refs={self.refs})"
+
+    def read(self, offset: int, length: int) -> bytes:
+        return os.pread(self.fd, length, offset)
+
+
+def _identity(stat: os.stat_result) -> Tuple[int, int, int, int]:
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class FileCache:
+    """Least recently used cache of open files. A file replaced or rewritten on disk is
+        reopened; an evicted file is closed once the last response reading it is done.
+        Args:
+            Optional[capacity] - Number of files kept open
+    """
+
+    def __init__(self, capacity: int = DEFAULT_FILE_CACHE_SIZE) -> None:
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[str, OpenFile]" = OrderedDict()
+
+    def __repr__(self) -> str:
+        return f"FileCache(open={len(self._files)}, capacity={self.capacity})"
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def acquire(self, path: str) -> OpenFile:
+        """Returns: the open file at path, which the caller must release().
+           Raises: OSError if it is not a regular file or cannot be opened."""
+        stat = os.stat(path)
+        if not stat_module.S_ISREG(stat.st_mode):
+            raise FileNotFoundError(errno.ENOENT, "Not a regular file", path)
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and _identity(cached.stat) == _identity(stat):
+                self._files.move_to_end(path)
+                cached.refs += 1
+                return cached
+            if cached is not None:
+                self._retire(self._files.pop(path))
+            opened = OpenFile(path, os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0)))
+            opened.refs = 1
+            self._files[path] = opened
+            while len(self._files) > self.capacity:
+                self._retire(self._files.popitem(last=False)[1])
+            return opened
+
+    def release(self, opened: OpenFile) -> None:
+        with self._lock:
+            opened.refs -= 1
+            if opened.retired and opened.refs == 0:
+                os.close(opened.fd)
+
+    def _retire(self, opened: OpenFile) -> None:
+        opened.retired = True
+        if opened.refs == 0:
+            os.close(opened.fd)
+
+    def close(self) -> None:
+        with self._lock:
+            while self._files:
+                self._retire(self._files.popitem()[1])
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Args: header - Range header value, e.g. "bytes=0-99" or "bytes=-500".
+             size - Size of the file.
+       Returns: inclusive (first, last) byte positions, or None if the header is not a
+       single byte range (the full file is served then).
+       Raises: ValueError if the range cannot be satisfied."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    first, last = first.strip(), last.strip()
+    if not (first or last) or not all(bound.isdigit() for bound in (first, last) if bound):
+        return None
+    if not first:
+        if int(last) == 0:
+            raise ValueError(f"Empty suffix range '{header}'")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(f"Range '{header}' not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+
+def accepts_gzip(header: Optional[str]) -> bool:
+    """True if an Accept-Encoding header allows gzip (and does not give it q=0)."""
+    for coding in (header or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag."""
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any((tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()) == opaque
+               for tag in header.split(","))
+
+
+def content_type(path: str) -> str:
+    mime, _ = mimetypes.guess_type(path)
+    if mime is None:
+        return "application/octet-stream"
+    if mime.startswith(_TEXT_TYPES):
+        return f"{mime}; charset=utf-8"
+    return mime
+
+
+class PreviewServer(ThreadingHTTPServer):
+    """Threaded HTTP server for an output directory, one thread per connection.
+        Args:
+            address - (host, port) to listen on; port 0 picks a free port
+            root - Output directory to serve
+            Optional[basepath] - URL prefix the site was built with
+            Optional[file_cache_size] - Number of files kept open
+            Optional[quiet] - Do not log requests
+            Optional[live_reload] - Inject a client into HTML pages that reloads them when
+                a build changes them, as published by the builder in the change log
+    """
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+    def __init__(self, address: Tuple[str, int], root: str, basepath: str = "/",
+                 file_cache_size: int = DEFAULT_FILE_CACHE_SIZE, quiet: bool = False,
+                 live_reload: bool = False) -> None:
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"Output directory '{root}' does not exist.")
+        self.root = os.path.abspath(root)
+        self.basepath = "/" + basepath.strip("/") + "/" if basepath.strip("/") else "/"
+        self.index = SiteIndex(self.root)
+        self.files = FileCache(file_cache_size)
+        self.quiet = quiet
+        self.feed = ChangeFeed(self.root) if live_reload else None
+        super().__init__(address, PreviewHandler)
+        if self.feed is not None:
+            self.feed.start()
+
+    def __repr__(self) -> str:
+        return f"PreviewServer({self.root}, port={self.server_port})"
+
+    def server_close(self) -> None:
+        if self.feed is not None:
+            self.feed.close()
+        super().server_close()
+        self.files.close()
+
+    def resolve(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """Maps a request URL to a file of the output directory.
+           Returns: (POSIX path relative to root, None), (None, URL to redirect to) for a
+           directory requested without its trailing slash, or (None, None) if not found."""
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(url).path)
+        if url_path + "/" == self.basepath:
+            return None, self.basepath
+        if not url_path.startswith(self.basepath):
+            return None, None
+        parts = [part for part in url_path[len(self.basepath):].split("/") if part]
+        if any(part in (".", "..") or "\\" in part or "\0" in part for part in parts):
+            return None, None
+        if parts and parts[0] == STATE_DIR_NAME:
+            return None, None
+        if os.path.isdir(os.path.join(self.root, *parts)):
+            if not url_path.endswith("/"):
+                return None, urllib.parse.quote(url_path + "/")
+            parts.append("index.html")
+        return "/".join(parts), None
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    """Serves GET and HEAD with manifest ETags, gzip sidecars and single byte ranges."""
+    server: PreviewServer
+    protocol_version = "HTTP/1.1"
+    server_version = "SSGPreview/1.0"
+    timeout = CONNECTION_TIMEOUT
+
+    def do_GET(self) -> None:
+        self._serve(head=False)
+
+    def do_HEAD(self) -> None:
+        self._serve(head=True)
+
+    def log_message(self, format: str, *args: object) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _serve(self, head: bool) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == RELOAD_PATH and self.server.feed is not None:
+            self._stream_changes(url.query)
+            return
+        path, redirect = self.server.resolve(self.path)
+        if redirect is not None:
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", redirect)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if path is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        full_path = os.path.join(self.server.root, *path.split("/"))
+        try:
+            opened = self.server.files.acquire(full_path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        sidecar = None
+        try:
+            index = self.server.index
+            index.refresh()
+            stat = opened.stat
+            content = index.content(path, stat)
+            if content is not None:
+                etag = f'"{content.digest[:ETAG_HASH_LENGTH]}"'
+            else:
+                etag = f'W/"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+            has_sidecar = index.has_sidecar(path)
+
+            # Ranges are served from the identity encoding only
+            range_header = self.headers.get("Range")
+            if (has_sidecar and range_header is None
+                    and accepts_gzip(self.headers.get("Accept-Encoding"))):
+                sidecar = self._open_sidecar(full_path, path, stat)
+            if sidecar is not None:
+                etag = etag[:-1] + '-gz"'
+
+            headers = [("ETag", etag),
+                       ("Cache-Control", IMMUTABLE_CACHE_CONTROL if content is not None
+                        and content.immutable else REVALIDATE_CACHE_CONTROL)]
+            if has_sidecar:
+                headers.append(("Vary", "Accept-Encoding"))
+
+            feed = self.server.feed
+            if feed is not None and content_type(path).startswith("text/html"):
+                # Read before the page, so a build in between triggers a reload, not a miss
+                since = feed.sequence
+                etag = etag[:-1] + f'-lr{since}"'
+                headers = [("ETag", etag), ("Cache-Control", REVALIDATE_CACHE_CONTROL)]
+                if not self._not_modified(etag, headers):
+                    self._send_page(inject_client(opened.read(0, stat.st_size), path, since),
+                                    path, stat, headers, head)
+                return
+
+            if self._not_modified(etag, headers):
+                return
+
+            body = sidecar if sidecar is not None else opened
+            start, end = 0, body.stat.st_size - 1
+            status = HTTPStatus.OK
+            if range_header is not None and self._range_applies(etag):
+                try:
+                    byte_range = parse_range(range_header, stat.st_size)
+                except ValueError:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{stat.st_size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if byte_range is not None:
+                    start, end = byte_range
+                    status = HTTPStatus.PARTIAL_CONTENT
+
+            self.send_response(status)
+            self.send_header("Content-Type", content_type(path))
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+            self.send_header("Accept-Ranges", "bytes")
+            if sidecar is not None:
+                self.send_header("Content-Encoding", "gzip")
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{stat.st_size}")
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if not head:
+                self._send_body(body, start, end + 1)
+        finally:
+            self.server.files.release(opened)
+            if sidecar is not None:
+                self.server.files.release(sidecar)
+
+    def _not_modified(self, etag: str, headers: List[Tuple[str, str]]) -> bool:
+        """Answers 304 if the client's If-None-Match holds etag. Returns: whether it did."""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is None or not etag_matches(if_none_match, etag):
+            return False
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        return True
+
+    def _send_page(self, body: bytes, path: str, stat: os.stat_result,
+                   headers: List[Tuple[str, str]], head: bool) -> None:
+        """Sends a page rewritten at serve time in full, without ranges or gzip."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type(path))
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _stream_changes(self, query: str) -> None:
+        """Server-sent events for one page: a "reload" event once a build after the
+           client's sequence changes the page, and keep-alive comments until then."""
+        params = urllib.parse.parse_qs(query)
+        page = params.get("page", [""])[0]
+        try:
+            since = int(params.get("since", ["0"])[0])
+        except ValueError:
+            self.send_error(HTTPStatus.BAD_REQUEST, "since must be a build number")
+            return
+        feed = self.server.feed
+        assert feed is not None
+        self.close_connection = True
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            self.wfile.write(b"retry: 1000\n\n")
+            while not feed.closed:
+                affected, since = feed.changed_since(page, since)
+                if affected:
+                    self.wfile.write(f"event: reload\ndata: {since}\n\n".encode())
+                    return
+                if feed.wait(since, HEARTBEAT_SECONDS) == since:
+                    self.wfile.write(b": ping\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Tab closed or navigated away
+
+    def _open_sidecar(self, full_path: str, path: str, stat: os.stat_result) -> Optional[OpenFile]:
+        try:
+            sidecar = self.server.files.acquire(full_path + SIDECAR_SUFFIX)
+        except FileNotFoundError:
+            return None
+        if self.server.index.sidecar_current(path, stat, sidecar.stat):
+            return sidecar
+        self.server.files.release(sidecar)
+        return None
+
+    def _range_applies(self, etag: str) -> bool:
+        """If-Range: serve the range only while the client's copy is current (strong match)."""
+        if_range = self.headers.get("If-Range")
+        return if_range is None or (not etag.startswith("W/") and if_range.strip() == etag)
+
+    def _send_body(self, opened: OpenFile, start: int, stop: int) -> None:
+        offset = start
+        try:
+            while offset < stop:
+                chunk = opened.read(offset, min(SEND_CHUNK_BYTES, stop - offset))
+                if not chunk:
+                    break  # Truncated since it was opened; the client sees a short body
+                self.wfile.write(chunk)
+                offset += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve a generated site for preview.")
+    parser.add_argument("--directory", "-d", default="./docs", help="output directory to serve")
+    parser.add_argument("--port", "-p", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--bind", "-b", default="127.0.0.1",
+                        help="address to listen on (0.0.0.0 for other machines)")
+    parser.add_argument("--basepath", default="/", help="URL prefix the site was built with")
+    parser.add_argument("--file-cache-size", metavar="N", type=int, default=DEFAULT_FILE_CACHE_SIZE,
+                        help="number of files kept open between requests")
+    parser.add_argument("--quiet", "-q", action="store_true", help="do not log requests")
+    parser.add_argument("--live-reload", action="store_true",
+                        help="reload open pages when a build changes them")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    with PreviewServer((args.bind, args.port), args.directory, args.basepath,
+                       args.file_cache_size, args.quiet, args.live_reload) as server:
+        print(f"Serving {server.root} at http://{args.bind}:{server.server_port}{server.basepath}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
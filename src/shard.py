@@ -0,0 +1,115 @@
+import filecmp
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional, Tuple
+from pageindex import PageIndex, STATE_DIR_NAME, manifest_path
+
+
+SHARD_INFO_NAME = "shard.json"
+
+
+class ShardMergeError(Exception):
+    """Raised when shard outputs cannot be combined into one complete site."""
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Args: spec - Shard specification "K/N" with 1 <= K <= N.
+       Returns: (K, N)."""
+    try:
+        index_text, count_text = spec.split('/')
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}', expected K/N (e.g. 2/4)")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{spec}', K must be between 1 and N")
+    return index, count
+
+
+def shard_of(source: str, count: int) -> int:
+    """Returns: the 1-based shard a page belongs to, from a stable hash of its
+       content-relative source path (independent of machine, order and PYTHONHASHSEED)."""
+    digest = hashlib.sha256(source.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def select_shard(pages: Iterable[Tuple[str, str]], content_dir: str,
+                 shard: Tuple[int, int]) -> List[Tuple[str, str]]:
+    """Filters (markdown path, HTML path) pairs down to the pages of one shard."""
+    index, count = shard
+    return [(from_path, dest_path) for from_path, dest_path in pages
+            if shard_of(os.path.relpath(from_path, content_dir).replace(os.sep, '/'), count) == index]
+
+
+def shard_info_path(output_dir: str) -> str:
+    return os.path.join(output_dir, STATE_DIR_NAME, SHARD_INFO_NAME)
+
+
+def write_shard_info(output_dir: str, shard: Tuple[int, int], pages: int) -> None:
+    """Marks an output directory as holding shard K of N."""
+    os.makedirs(os.path.dirname(shard_info_path(output_dir)), exist_ok=True)
+    with open(shard_info_path(output_dir), "w") as info_file:
+        json.dump({"shard": shard[0], "of": shard[1], "pages": pages}, info_file)
+
+
+def _read_shard_info(output_dir: str) -> Dict[str, int]:
+    try:
+        with open(shard_info_path(output_dir)) as info_file:
+            return json.load(info_file)
+    except FileNotFoundError:
+        raise ShardMergeError(f"'{output_dir}' is not a shard output (missing {SHARD_INFO_NAME})")
+
+
+def _copy_tree(shard_dir: str, output_dir: str) -> None:
+    """Copies a shard's files into output_dir; files present in several shards
+       (static assets) must be identical."""
+    for root, dirs, files in os.walk(shard_dir):
+        dirs[:] = [name for name in dirs if name != STATE_DIR_NAME]
+        dest_root = os.path.join(output_dir, os.path.relpath(root, shard_dir))
+        os.makedirs(dest_root, exist_ok=True)
+        for name in files:
+            source, dest = os.path.join(root, name), os.path.join(dest_root, name)
+            if not os.path.exists(dest):
+                shutil.copy2(source, dest)
+            elif not filecmp.cmp(source, dest, shallow=False):
+                raise ShardMergeError(f"Conflicting versions of '{os.path.relpath(dest, output_dir)}' "
+                                      f"across shards")
+
+
+def merge_shards(shard_dirs: List[str], output_dir: str,
+                 expected_sources: Optional[Iterable[str]] = None) -> PageIndex:
+    """Combines shard outputs and manifests into output_dir, verifying that the
+        shards form one complete K/N set and that every page was rendered exactly once.
+        Args: shard_dirs - Output directories of the shards (any order).
+              output_dir - Directory to create the merged site in (replaced if present).
+              expected_sources - Content-relative sources that must all be present.
+        Returns: The merged page index."""
+    infos = [_read_shard_info(shard_dir) for shard_dir in shard_dirs]
+    counts = {info["of"] for info in infos}
+    if len(counts) != 1:
+        raise ShardMergeError(f"Shards come from different splits: N = {sorted(counts)}")
+    count = counts.pop()
+    indices = sorted(info["shard"] for info in infos)
+    if indices != list(range(1, count + 1)):
+        raise ShardMergeError(f"Expected shards 1..{count} exactly once, got {indices}")
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    merged = PageIndex()
+    for shard_dir in shard_dirs:
+        for record in PageIndex.load_manifest(manifest_path(shard_dir)):
+            if merged.get(record.source) is not None:
+                raise ShardMergeError(f"Page '{record.source}' was rendered by more than one shard")
+            merged.add(record)
+        _copy_tree(shard_dir, output_dir)
+
+    if expected_sources is not None:
+        missing = sorted(set(expected_sources) - {record.source for record in merged})
+        if missing:
+            raise ShardMergeError(f"Pages not rendered by any shard: {', '.join(missing)}")
+
+    merged.write_manifest(manifest_path(output_dir))
+    return merged
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Set, Tuple
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+from htmlnode import HTMLWriter
+from pageindex import STATE_DIR_NAME, PageRecord
+
+
+# Build state recording the site files generated into an output directory and their digests
+SITEGEN_STATE_NAME = "sitegen.json"
+
+# Posts per listing page
+DEFAULT_LISTING_SIZE = 10
+
+# Front matter field that orders listings; pages without it use the modification date of their source
+DATE_KEY = "date"
+
+SITEMAP_NAME = "sitemap.xml"
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+# URLs per sitemap file allowed by the sitemap protocol; larger sites get a sitemap index
+SITEMAP_MAX_URLS = 50000
+
+
+def page_url(dest: str) -> str:
+    """Returns: the root-relative URL of an output path, directory URLs for index pages."""
+    return "/" + (dest[:-len("index.html")] if dest == "index.html" or dest.endswith("/index.html")
+                  else dest)
+
+
+def modified_date(record: PageRecord) -> str:
+    """Returns: the modification date of the source of a page (UTC, YYYY-MM-DD)."""
+    return datetime.fromtimestamp(record.mtime_ns / 1e9, timezone.utc).date().isoformat()
+
+
+def page_date(record: PageRecord) -> str:
+    """Returns: the date of a page, from its front matter or else its modification date."""
+    return record.front_matter.get(DATE_KEY) or modified_date(record)
+
+
+def listing_path(section: str, number: int, count: int) -> str:
+    """Returns: the output path of listing page number (1 = oldest posts) of count.
+       The newest page is the section index; older pages keep their path as posts are added."""
+    return f"{section}/index.html" if number == count else f"{section}/page/{number}/index.html"
+
+
+def listing_pages(section: str, records: Iterable[PageRecord], size: int = DEFAULT_LISTING_SIZE,
+                  minify: bool = False) -> List[Tuple[str, str, str]]:
+    """Paginates the pages under section into listings of size posts, newest first.
+       Pages are numbered from the oldest posts, so a new post changes only the newest page
+       (and, when that one fills up, the link of the page before it).
+       Raises: ValueError if a content page is generated at a listing path.
+       Returns: (output path, title, content HTML) of every listing page."""
+    section = section.strip("/")
+    name = section.rsplit("/", 1)[-1].replace("-", " ").capitalize()
+    members = sorted((record for record in records if record.dest.startswith(section + "/")),
+                     key=lambda record: (page_date(record), record.source))
+    count = max(1, -(-len(members) // size))
+    paths = [listing_path(section, number, count) for number in range(1, count + 1)]
+    clashes = sorted({record.dest for record in members} & set(paths))
+    if clashes:
+        raise ValueError(f"Listing of '{section}' would overwrite the content page {clashes[0]}")
+
+    pages = []
+    for number in range(1, count + 1):
+        writer = HTMLWriter(minify)
+        title = name if number == count else f"{name}, page {number}"
+        writer.open("div")
+        writer.open("h1")
+        writer.text(title)
+        writer.close("h1")
+        writer.open("ul")
+        for record in reversed(members[(number - 1) * size:number * size]):
+            writer.open("li")
+            writer.open("a", {"href": page_url(record.dest)})
+            writer.text(record.title)
+            writer.close("a")
+            writer.text(" ")
+            writer.open("time", {"datetime": page_date(record)})
+            writer.text(page_date(record))
+            writer.close("time")
+            writer.close("li")
+        writer.close("ul")
+        writer.open("nav")
+        if number < count:
+            writer.open("a", {"href": page_url(paths[number]), "rel": "prev"})
+            writer.text("Newer posts")
+            writer.close("a")
+        if number > 1:
+            writer.open("a", {"href": page_url(paths[number - 2]), "rel": "next"})
+            writer.text("Older posts")
+            writer.close("a")
+        writer.close("nav")
+        writer.close("div")
+        pages.append((paths[number - 1], title, writer.to_html()))
+    return pages
+
+
+def sitemap_files(urls: Iterable[Tuple[str, str]], site_url: str) -> Dict[str, bytes]:
+    """Builds the sitemap of (root-relative URL, last modification date or "") pairs, with
+       site_url (scheme, host and basepath) prefixed. Beyond SITEMAP_MAX_URLS the URLs are
+       split into numbered sitemaps listed by a sitemap index.
+       Returns: output path -> content."""
+    site_url = site_url.rstrip("/")
+    entries = []
+    for url, lastmod in sorted(urls):
+        entry = f"<url><loc>{escape(site_url + quote(url))}</loc>"
+        entries.append(entry + (f"<lastmod>{escape(lastmod)}</lastmod></url>" if lastmod else "</url>"))
+
+    def document(root: str, lines: List[str]) -> bytes:
+        return (f'<?xml version="1.0" encoding="UTF-8"?>\n<{root} xmlns="{SITEMAP_NAMESPACE}">\n' +
+                "".join(line + "\n" for line in lines) + f"</{root}>\n").encode('utf-8')
+
+    if len(entries) <= SITEMAP_MAX_URLS:
+        return {SITEMAP_NAME: document("urlset", entries)}
+    files = {}
+    for number, start in enumerate(range(0, len(entries), SITEMAP_MAX_URLS), 1):
+        files[f"sitemap-{number}.xml"] = document("urlset", entries[start:start + SITEMAP_MAX_URLS])
+    files[SITEMAP_NAME] = document("sitemapindex", [
+        f"<sitemap><loc>{escape(site_url)}/{name}</loc></sitemap>" for name in sorted(files)])
+    return files
+
+
+def sitegen_state_path(output_dir: str) -> str:
+    return os.path.join(output_dir, STATE_DIR_NAME, SITEGEN_STATE_NAME)
+
+
+def load_generated(output_dir: str) -> Dict[str, str]:
+    """Returns: output path -> SHA-256 hex digest of the site files of the last build."""
+    try:
+        with open(sitegen_state_path(output_dir)) as state_file:
+            return json.load(state_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_generated(output_dir: str, files: Dict[str, bytes]) -> Tuple[List[str], List[str]]:
+    """Writes the site files whose content changed since the last build (or that are
+       missing), deletes those the build no longer generates and records the digests.
+       Returns: (output paths written, output paths whose content changed or that were deleted)."""
+    previous = load_generated(output_dir)
+    digests = {path: hashlib.sha256(content).hexdigest() for path, content in files.items()}
+    written = []
+    changed = sorted(path for path in set(previous) | set(digests)
+                     if previous.get(path) != digests.get(path))
+    for path, content in sorted(files.items()):
+        full_path = os.path.join(output_dir, path)
+        if previous.get(path) == digests[path] and os.path.exists(full_path):
+            continue
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = f"{full_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as output_file:
+            output_file.write(content)
+        os.replace(tmp_path, full_path)
+        written.append(path)
+    for path in set(previous) - set(files):
+        if os.path.exists(full_path := os.path.join(output_dir, path)):
+            os.remove(full_path)
+    if files or previous:
+        state_path = sitegen_state_path(output_dir)
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        tmp_path = f"{state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as state_file:
+            json.dump(digests, state_file, sort_keys=True)
+        os.replace(tmp_path, state_path)
+    return written, changed
+
+
+def generated_outputs(output_dir: str) -> Set[str]:
+    """Returns: the site files of the last build, kept when the output directory is pruned."""
+    return set(load_generated(output_dir))
@@ -0,0 +1,116 @@
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import Dict, Iterable, List, Optional, Set
+from pageindex import STATE_DIR_NAME
+
+
+# Build state recording the inputs every page of the last complete build depends on
+DEPS_NAME = "deps.json"
+
+
+def deps_path(output_dir: str) -> str:
+    return os.path.join(output_dir, STATE_DIR_NAME, DEPS_NAME)
+
+
+def load_deps(output_dir: str) -> Optional[Dict]:
+    """Returns: the dependencies recorded by the last build of output_dir, or None if it
+       did not complete (or predates them)."""
+    try:
+        with open(deps_path(output_dir)) as deps_file:
+            return json.load(deps_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_deps(output_dir: str, deps: Dict) -> None:
+    path = deps_path(output_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as deps_file:
+        json.dump(deps, deps_file, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def invalidate_deps(output_dir: str) -> None:
+    """Forgets the dependencies of output_dir while a build changes it, so that a build
+       that does not complete is never the base of a subset build."""
+    if os.path.exists(path := deps_path(output_dir)):
+        os.remove(path)
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as input_file:
+        return hashlib.sha256(input_file.read()).hexdigest()
+
+
+def read_path_list(path: str) -> List[str]:
+    """Returns: the paths listed one per line in the file at path ("-" for stdin),
+       e.g. the output of git diff --name-only."""
+    if path == "-":
+        return [line.strip() for line in sys.stdin if line.strip()]
+    with open(path) as list_file:
+        return [line.strip() for line in list_file if line.strip()]
+
+
+def relative_to(path: str, directory: str) -> Optional[str]:
+    """Returns: path relative to directory (POSIX separators), or None if it lies outside."""
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(directory))
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return None
+    return relative.replace(os.sep, '/')
+
+
+class SubsetPlan:
+    """Pages a subset build generates and removes.
+        Args:
+            render - Content-relative sources to generate
+            removed - Content-relative sources of the previous build that are gone
+    """
+
+    def __init__(self, render: Set[str], removed: Set[str]) -> None:
+        self.render = render
+        self.removed = removed
+
+    def __repr__(self) -> str:
+        return f"SubsetPlan(render={len(self.render)}, removed={len(self.removed)})"
+
+    @property
+    def selected(self) -> Set[str]:
+        return self.render | self.removed
+
+
+def plan_subset(previous: Set[str], existing: Iterable[str], content_dir: str,
+                only: Optional[str] = None, changed: Optional[Iterable[str]] = None) -> SubsetPlan:
+    """Selects the pages of a subset build from the sources of the previous build and
+       those that exist now: the sources matching the only glob (matched against
+       content-relative paths, where * also matches /), and the markdown files among
+       the changed paths (relative to the working directory, or absolute).
+       Selected sources that exist are generated; those that are gone are removed."""
+    existing = set(existing)
+    selected: Set[str] = set()
+    if only is not None:
+        selected |= {source for source in previous | existing if fnmatch.fnmatchcase(source, only)}
+    for path in changed or ():
+        if (source := relative_to(path, content_dir)) is not None and source.endswith(".md"):
+            selected.add(source)
+    return SubsetPlan(selected & existing, (selected - existing) & previous)
+
+
+def sync_static_changes(static_dir: str, output_dir: str, paths: Iterable[str]) -> int:
+    """Copies the static files at paths (relative to static_dir) into output_dir,
+       deleting the copies of those that are gone.
+       Returns: the number of bytes copied."""
+    copied = 0
+    for path in paths:
+        source, dest = os.path.join(static_dir, path), os.path.join(output_dir, path)
+        if os.path.exists(source):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copy2(source, dest)
+            copied += os.path.getsize(source)
+        elif os.path.exists(dest):
+            os.remove(dest)
+    return copied
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+import unittest
+from artifact_cache import ArtifactCache, STALE_TMP_SECONDS, cache_key, generator_version
+
+
+class TestCacheKey(unittest.TestCase):
+
+    def test_key_covers_every_input(self):
+        base = cache_key(b"# Title", "{{ Content }}", "/", "v1")
+        self.assertEqual(base, cache_key(b"# Title", "{{ Content }}", "/", "v1"))
+        self.assertNotEqual(base, cache_key(b"# Title!", "{{ Content }}", "/", "v1"))
+        self.assertNotEqual(base, cache_key(b"# Title", "<p>{{ Content }}</p>", "/", "v1"))
+        self.assertNotEqual(base, cache_key(b"# Title", "{{ Content }}", "/base/", "v1"))
+        self.assertNotEqual(base, cache_key(b"# Title", "{{ Content }}", "/", "v2"))
+
+    def test_key_parts_do_not_run_together(self):
+        self.assertNotEqual(cache_key(b"", "ab", "/", "v1"), cache_key(b"", "b", "/a", "v1"))
+
+    def test_default_version_is_generator_version(self):
+        self.assertEqual(len(generator_version()), 64)
+        self.assertEqual(cache_key(b"x", "t", "/"), cache_key(b"x", "t", "/", generator_version()))
+
+
+class TestArtifactCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ArtifactCache(os.path.join(self.tmp.name, "cache"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_and_get(self):
+        key = cache_key(b"# Page", "{{ Content }}", "/", "v1")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, b"<html></html>")
+        self.assertEqual(self.cache.get(key), b"<html></html>")
+        self.assertEqual(os.listdir(os.path.dirname(self.cache.path(key))),
+                         [os.path.basename(self.cache.path(key))])
+        self.cache.put(key, b"<html></html>")  # Concurrent writers of one key both succeed
+        self.assertEqual(self.cache.size(), len(b"<html></html>"))
+
+    def test_collect_evicts_least_recently_used(self):
+        keys = [cache_key(str(i).encode(), "t", "/", "v1") for i in range(4)]
+        for age, key in enumerate(keys):
+            self.cache.put(key, b"x" * 100)
+            past = time.time() - 1000 * (age + 1)
+            os.utime(self.cache.path(key), (past, past))
+        self.cache.get(keys[3])  # Oldest entry, but just used
+
+        self.assertEqual(self.cache.collect(250), 200)
+        self.assertEqual([self.cache.get(key) is not None for key in keys], [True, False, False, True])
+        self.assertEqual(self.cache.collect(1000), 0)
+
+    def test_collect_removes_abandoned_tmp_files(self):
+        key = cache_key(b"", "t", "/", "v1")
+        self.cache.put(key, b"page")
+        shard_dir = os.path.dirname(self.cache.path(key))
+        stale, fresh = os.path.join(shard_dir, "a.tmp"), os.path.join(shard_dir, "b.tmp")
+        for path in (stale, fresh):
+            with open(path, "wb") as tmp_file:
+                tmp_file.write(b"partial")
+        past = time.time() - STALE_TMP_SECONDS - 60
+        os.utime(stale, (past, past))
+
+        self.cache.collect(1 << 20)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertEqual(self.cache.get(key), b"page")
+
+
+if __name__ == "__main__":
+    unittest.main()
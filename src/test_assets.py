@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from assets import (AssetManifest, fingerprinted_name, prune_output, rewrite_asset_urls,
+                    sync_assets)
+
+
+class TestRewriteAssetUrls(unittest.TestCase):
+
+    def test_fingerprinted_name(self):
+        self.assertEqual(fingerprinted_name("index.css", "3fa9c1d2e5"), "index.3fa9c1d2.css")
+        self.assertEqual(fingerprinted_name("images/a.b.png", "0123456789"), "images/a.b.01234567.png")
+
+    def test_rewrite(self):
+        urls = {"index.css": "index.11111111.css", "images/a.png": "images/a.22222222.png"}
+        html = ('<link href="/index.css"><img src="/images/a.png?v=1" /><img src="/images/a.png#x">'
+                '<a href="/index.css.map"></a><a href="https://x.org/index.css"></a><a href="/blog">')
+        self.assertEqual(rewrite_asset_urls(html, urls),
+                         '<link href="/index.11111111.css"><img src="/images/a.22222222.png?v=1" />'
+                         '<img src="/images/a.22222222.png#x"><a href="/index.css.map"></a>'
+                         '<a href="https://x.org/index.css"></a><a href="/blog">')
+        self.assertEqual(rewrite_asset_urls(html, {}), html)
+
+
+class TestSyncAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.output = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write("index.css", "body { margin: 0; }")
+        self.write("images/logo.png", "PNG")
+        self.write("favicon.ico", "ICO")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(os.path.join(self.static, path), "w") as static_file:
+            static_file.write(text)
+
+    def outputs(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.output).replace(os.sep, '/')
+                      for root, dirs, files in os.walk(self.output) if ".ssg" not in root
+                      for name in files)
+
+    def test_sync_fingerprints_and_recopies_only_changes(self):
+        manifest, copied = sync_assets(self.static, self.output)
+        self.assertEqual(copied, len("body { margin: 0; }") + len("PNG") + len("ICO"))
+        css = manifest.entries["index.css"]["dest"]
+        self.assertRegex(css, r"^index\.[0-9a-f]{8}\.css$")
+        self.assertEqual(manifest.urls, {"index.css": css,
+                                         "images/logo.png": manifest.entries["images/logo.png"]["dest"]})
+        self.assertEqual(self.outputs(), sorted([css, manifest.entries["images/logo.png"]["dest"],
+                                                 "favicon.ico"]))
+        self.assertEqual(AssetManifest.load(self.output).entries, manifest.entries)
+
+        self.assertEqual(sync_assets(self.static, self.output)[1], 0)
+
+        self.write("index.css", "body { margin: 1px; }")
+        manifest2, copied = sync_assets(self.static, self.output)
+        self.assertEqual(copied, len("body { margin: 1px; }"))
+        self.assertNotEqual(manifest2.entries["index.css"]["dest"], css)
+        self.assertNotEqual(manifest2.digest(), manifest.digest())
+        self.assertNotIn(css, self.outputs())
+
+        os.remove(os.path.join(self.static, "images", "logo.png"))
+        manifest3, _ = sync_assets(self.static, self.output)
+        self.assertNotIn("images/logo.png", manifest3.entries)
+        self.assertEqual(self.outputs(), sorted([manifest3.entries["index.css"]["dest"], "favicon.ico"]))
+
+    def test_sync_without_fingerprints(self):
+        manifest, _ = sync_assets(self.static, self.output, fingerprint=False)
+        self.assertEqual(manifest.urls, {})
+        self.assertEqual(self.outputs(), ["favicon.ico", "images/logo.png", "index.css"])
+
+    def test_prune_output_keeps_assets_and_state(self):
+        manifest, _ = sync_assets(self.static, self.output)
+        os.makedirs(os.path.join(self.output, "blog"))
+        with open(os.path.join(self.output, "blog", "old.html"), "w") as page:
+            page.write("stale")
+        prune_output(self.output, {entry["dest"] for entry in manifest.entries.values()})
+        self.assertFalse(os.path.exists(os.path.join(self.output, "blog")))
+        self.assertEqual(len(self.outputs()), 3)
+        self.assertTrue(os.path.exists(AssetManifest.path(self.output)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from bench import ADVERSARIAL_CORPUS, MEMORY_CORPUS, run_adversarial, run_memory
+
+
+class TestAdversarialCorpus(unittest.TestCase):
+
+    def test_inputs_stay_under_time_ceilings(self):
+        for name, elapsed, ceiling in run_adversarial(size=20_000):
+            with self.subTest(input=name):
+                self.assertLessEqual(elapsed, ceiling)
+
+    def test_inputs_stay_under_memory_ceilings(self):
+        for name, peak, ceiling in run_memory(size=20_000):
+            with self.subTest(input=name):
+                self.assertLessEqual(peak, ceiling)
+
+    def test_memory_subset(self):
+        results = run_memory(size=1000, names=["headings"])
+        self.assertEqual([name for name, _, _ in results], ["headings"])
+        self.assertGreater(results[0][1], 0)
+        self.assertIn("headings", MEMORY_CORPUS)
+
+    def test_run_subset(self):
+        results = run_adversarial(size=100, names=["unclosed_brackets"])
+        self.assertEqual([name for name, _, _ in results], ["unclosed_brackets"])
+        self.assertEqual(len(ADVERSARIAL_CORPUS["unclosed_brackets"][0](100)), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
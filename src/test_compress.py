@@ -0,0 +1,73 @@
+import gzip
+import os
+import tempfile
+import unittest
+from compress import load_state, precompress, sidecar_path
+
+
+class TestPrecompress(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = self.tmp.name
+        os.makedirs(os.path.join(self.output, "blog"))
+        self.write("index.html", "<p>home</p>" * 100)
+        self.write("blog/post.html", "<p>post</p>" * 100)
+        self.write("tiny.html", "<p></p>")
+        self.write("index.css", "body { margin: 0; }" * 50)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(os.path.join(self.output, path), "w") as output_file:
+            output_file.write(text)
+
+    def read_sidecar(self, path):
+        with open(sidecar_path(os.path.join(self.output, path)), "rb") as sidecar_file:
+            return sidecar_file.read()
+
+    def test_compresses_matching_files_above_min_size(self):
+        self.assertEqual(precompress(self.output, min_size=100), (2, 0))
+        self.assertEqual(gzip.decompress(self.read_sidecar("index.html")), b"<p>home</p>" * 100)
+        self.assertFalse(os.path.exists(os.path.join(self.output, "tiny.html.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.output, "index.css.gz")))
+        self.assertEqual(set(load_state(self.output)), {"index.html", "blog/post.html"})
+
+        self.assertEqual(precompress(self.output, (".html", ".css"), min_size=100), (1, 2))
+        self.assertTrue(os.path.exists(os.path.join(self.output, "index.css.gz")))
+
+    def test_only_changed_files_are_recompressed(self):
+        precompress(self.output, min_size=100)
+        before = os.stat(sidecar_path(os.path.join(self.output, "index.html"))).st_mtime_ns
+        self.write("blog/post.html", "<p>edited</p>" * 100)
+        os.remove(os.path.join(self.output, "index.html"))
+        self.write("index.html", "<p>home</p>" * 100)  # Rewritten with the same content
+
+        self.assertEqual(precompress(self.output, min_size=100), (1, 1))
+        self.assertEqual(os.stat(sidecar_path(os.path.join(self.output, "index.html"))).st_mtime_ns, before)
+        self.assertEqual(gzip.decompress(self.read_sidecar("blog/post.html")), b"<p>edited</p>" * 100)
+
+    def test_sidecars_of_removed_files_are_deleted(self):
+        precompress(self.output, min_size=100)
+        os.remove(os.path.join(self.output, "blog", "post.html"))
+        self.write("index.html", "<p></p>")
+        self.assertEqual(precompress(self.output, min_size=100), (0, 0))
+        self.assertFalse(os.path.exists(os.path.join(self.output, "blog", "post.html.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.output, "index.html.gz")))
+        self.assertEqual(load_state(self.output), {})
+
+    def test_parallel_output_is_identical_and_deterministic(self):
+        precompress(self.output, min_size=100, level=6)
+        serial = self.read_sidecar("blog/post.html")
+        os.remove(sidecar_path(os.path.join(self.output, "blog", "post.html")))
+        self.assertEqual(precompress(self.output, min_size=100, level=6, jobs=2), (1, 1))
+        self.assertEqual(self.read_sidecar("blog/post.html"), serial)
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            precompress(self.output, level=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
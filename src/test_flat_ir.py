@@ -0,0 +1,144 @@
+import unittest
+from flat_ir import FlatDocument, emit_text_node, OPEN, TEXT, CLOSE
+from htmlnode import HTMLWriter, ParentNode, text_node_to_html_node
+from markdown_blocks import markdown_to_flat_document, parse_children, emit_children, emit_markdown
+from textnode import TextNode, TextType
+
+
+class TestFlatDocument(unittest.TestCase):
+
+    def test_events_and_string_table(self):
+        doc = FlatDocument()
+        doc.open("p")
+        doc.text("Hello")
+        doc.close("p")
+        self.assertEqual(list(doc.ops), [OPEN, TEXT, CLOSE])
+        self.assertEqual(doc.strings, ["p", "Hello"])
+        self.assertEqual(list(doc.args), [0, 1, 0])
+
+    def test_to_html_escapes_text_and_attributes(self):
+        doc = FlatDocument()
+        doc.open("a", {"href": 'x"y'})
+        doc.text("<b> & co")
+        doc.close("a")
+        self.assertEqual(doc.to_html(), '<a href="x&quot;y">&lt;b&gt; &amp; co</a>')
+
+    def test_void_elements(self):
+        doc = FlatDocument()
+        doc.open("p")
+        doc.void("img", {"src": "a.png", "alt": "A"})
+        doc.void("br")
+        doc.close("p")
+        self.assertEqual(doc.to_html(), '<p><img src="a.png" alt="A" /><br /></p>')
+
+    def test_empty_element(self):
+        doc = FlatDocument()
+        doc.open("p")
+        doc.close("p")
+        self.assertEqual(doc.to_html(), "<p></p>")
+
+    def test_to_html_node_view(self):
+        doc = markdown_to_flat_document("# Title\n\nSome [**bold** link](/x) ![img](/i.png)")
+        node = doc.to_html_node()
+        self.assertIsInstance(node, ParentNode)
+        self.assertEqual(node.tag, "div")
+        self.assertEqual(node.to_html(), doc.to_html())
+
+    def test_to_html_node_unbalanced(self):
+        doc = FlatDocument()
+        doc.open("div")
+        with self.assertRaises(ValueError):
+            doc.to_html_node()
+        doc.close("p")
+        with self.assertRaises(ValueError):
+            doc.to_html_node()
+
+
+class TestEmitTextNode(unittest.TestCase):
+
+    def assert_same_as_node(self, text_node: TextNode):
+        doc = FlatDocument()
+        emit_text_node(doc, text_node)
+        self.assertEqual(doc.to_html(), text_node_to_html_node(text_node).to_html())
+
+    def test_simple_types(self):
+        self.assert_same_as_node(TextNode("plain & text"))
+        self.assert_same_as_node(TextNode("bold", TextType.BOLD))
+        self.assert_same_as_node(TextNode("it", TextType.ITALIC))
+        self.assert_same_as_node(TextNode("x < y", TextType.CODE))
+        self.assert_same_as_node(TextNode("gone", TextType.STRIKETHROUGH))
+        self.assert_same_as_node(TextNode("link", TextType.LINK, "https://example.com"))
+        self.assert_same_as_node(TextNode("alt", TextType.IMAGE, "/a.png"))
+
+    def test_nested_children(self):
+        self.assert_same_as_node(TextNode("", TextType.LINK, "/x", children=[
+            TextNode("a "), TextNode("b", TextType.BOLD), TextNode("i", TextType.ITALIC)]))
+
+    def test_missing_url(self):
+        with self.assertRaises(ValueError):
+            emit_text_node(FlatDocument(), TextNode("link", TextType.LINK))
+        with self.assertRaises(ValueError):
+            emit_text_node(FlatDocument(), TextNode("alt", TextType.IMAGE))
+
+
+class TestMarkdownToFlatDocument(unittest.TestCase):
+
+    def test_matches_node_tree_rendering(self):
+        md = """# Heading with _style_
+
+A paragraph with **bold**, `code` and a [link](https://example.com).  
+Hard break here.
+
+```
+code <block>
+```
+
+> quoted **text**
+
+- one
+- [two](/two)
+
+1. first
+2. second
+
+---
+"""
+        expected = ("<div><h1>Heading with <i>style</i></h1>"
+                    "<p>A paragraph with <b>bold</b>, <code>code</code> and a "
+                    '<a href="https://example.com">link</a>.<br />Hard break here.</p>'
+                    "<pre><code>code &lt;block&gt;\n</code></pre>"
+                    "<blockquote>quoted <b>text</b></blockquote>"
+                    '<ul><li>one</li><li><a href="/two">two</a></li></ul>'
+                    "<ol><li>first</li><li>second</li></ol>"
+                    "<hr /></div>")
+        self.assertEqual(markdown_to_flat_document(md).to_html(), expected)
+
+    def test_children_match_parse_children(self):
+        text = "Some *mixed* ~~inline~~ __content__  \nwith a break"
+        doc = FlatDocument()
+        doc.open("p")
+        emit_children(doc, text)
+        doc.close("p")
+        self.assertEqual(doc.to_html(), ParentNode("p", parse_children(text)).to_html())
+
+    def test_minified_serializers_agree(self):
+        md = ("# Title with *style*\n\nText with  'quotes' & [a link](https://example.com/x) "
+              "and ![img](/a.png)  \nnext line\n\n```\n  indented  'code'\n\n  kept\n```\n\n---")
+        doc = markdown_to_flat_document(md)
+        minified = doc.to_html(minify=True)
+        self.assertEqual(minified, doc.to_html_node().to_html(minify=True))
+        writer = HTMLWriter(minify=True)
+        emit_markdown(writer, md)
+        self.assertEqual(writer.to_html(), minified)
+        self.assertIn("<pre><code>  indented  &#x27;code&#x27;\n\n  kept\n</code></pre>", minified)
+        self.assertIn('<a href=https://example.com/x>a link</a> and <img src="/a.png" alt=img><br>',
+                      minified)
+        self.assertIn("<hr></div>", minified)
+        self.assertLess(len(minified), len(doc.to_html()))
+
+    def test_empty_markdown(self):
+        self.assertEqual(markdown_to_flat_document("").to_html(), "<div></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
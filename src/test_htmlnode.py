@@ -1,5 +1,6 @@
 import unittest
-from htmlnode import HTMLNode, LeafNode, ParentNode, text_node_to_html_node, html_escape
+from htmlnode import (HTMLNode, HTMLWriter, LeafNode, ParentNode, text_node_to_html_node,
+                      text_node_to_html, html_escape)
 from textnode import TextNode, TextType
 
 
@@ -271,3 +272,84 @@ class TestHTMLEscaping(unittest.TestCase):
         html = node.to_html()
         self.assertIn("&quot;", html)
         self.assertNotIn('" onclick="', html)
+
+    ### Tests for direct TextNode serialization ###
+
+    def test_text_node_to_html_matches_node_path(self):
+        nodes = [
+            TextNode("Tom & Jerry"),
+            TextNode("bold", TextType.BOLD),
+            TextNode("italic", TextType.ITALIC),
+            TextNode("a < b", TextType.CODE),
+            TextNode("old", TextType.STRIKETHROUGH),
+            TextNode("link", TextType.LINK, 'https://example.com/?a=1&b="2"'),
+            TextNode("alt 'text'", TextType.IMAGE, "/img.png"),
+            TextNode("", TextType.BOLD, children=[
+                TextNode("plain "), TextNode("it", TextType.ITALIC),
+                TextNode("", TextType.LINK, "/x", children=[TextNode("x", TextType.CODE)])]),
+        ]
+        for node in nodes:
+            self.assertEqual(text_node_to_html(node), text_node_to_html_node(node).to_html())
+
+    def test_text_node_to_html_missing_url(self):
+        with self.assertRaises(ValueError):
+            text_node_to_html(TextNode("link", TextType.LINK))
+        with self.assertRaises(ValueError):
+            text_node_to_html(TextNode("alt", TextType.IMAGE))
+
+    def test_html_writer(self):
+        writer = HTMLWriter()
+        writer.open("p", {"class": "x&y"})
+        writer.text("<hi>")
+        writer.inline([TextNode("b", TextType.BOLD)])
+        writer.void("br")
+        writer.close("p")
+        self.assertEqual(writer.to_html(), '<p class="x&amp;y">&lt;hi&gt;<b>b</b><br /></p>')
+
+    ### Tests for minified serialization ###
+
+    def test_minified_attributes_and_void_tags(self):
+        node = ParentNode("p", [
+            LeafNode("a", "x", {"href": "https://example.com/a", "class": "two words"}),
+            LeafNode("img", "", {"src": "/img.png", "alt": "it's"}),
+            LeafNode("input", "", {"value": "a=b", "title": ""}),
+        ])
+        self.assertEqual(node.to_html(minify=True),
+                         '<p><a href=https://example.com/a class="two words">x</a>'
+                         '<img src="/img.png" alt=it&#x27;s><input value="a=b" title=""></p>')
+
+    def test_minified_text_keeps_pre_and_code_verbatim(self):
+        node = ParentNode("div", [
+            LeafNode(None, "Say   \"hi\"\n  & go"),
+            ParentNode("pre", [LeafNode("code", "  keep\n    this 'x'")]),
+            LeafNode("code", "a  b"),
+            LeafNode(None, "non\u00a0\u00a0breaking"),
+        ])
+        self.assertEqual(node.to_html(minify=True),
+                         '<div>Say "hi" &amp; go<pre><code>  keep\n    this &#x27;x&#x27;</code></pre>'
+                         '<code>a  b</code>non\u00a0\u00a0breaking</div>')
+
+    def test_minified_text_node_matches_node_path(self):
+        nodes = [
+            TextNode("Tom   & 'Jerry'"),
+            TextNode("a  < b", TextType.CODE),
+            TextNode("link", TextType.LINK, "https://example.com/?a=1"),
+            TextNode("alt text", TextType.IMAGE, "/img.png"),
+            TextNode("", TextType.BOLD, children=[TextNode("plain  "), TextNode("it", TextType.ITALIC)]),
+        ]
+        for node in nodes:
+            self.assertEqual(text_node_to_html(node, minify=True),
+                             text_node_to_html_node(node).to_html(minify=True))
+
+    def test_minified_html_writer(self):
+        writer = HTMLWriter(minify=True)
+        writer.open("p", {"class": "x"})
+        writer.text("a   b")
+        writer.void("br")
+        writer.close("p")
+        writer.open("pre")
+        writer.text("a   b")
+        writer.inline([TextNode("x   y")])
+        writer.close("pre")
+        self.assertEqual(writer.to_html(), "<p class=x>a b<br></p><pre>a   bx   y</pre>")
+
@@ -478,6 +478,16 @@ class TestTextToTextnodes(unittest.TestCase):
                 TextNode("bold", TextType.BOLD),
                 TextNode(" text", TextType.TEXT)])])
 
+    def test_text_to_textnodes_many_matches_no_recursion_limit(self):
+        nodes = text_to_textnodes("**b** " * 5000)
+        self.assertEqual(len(nodes), 10000)
+        self.assertEqual(nodes[-2], TextNode("b", TextType.BOLD))
+
+    def test_text_to_textnodes_unclosed_brackets_before_link(self):
+        self.assertEqual(
+            text_to_textnodes("[[[[[a](u)"),
+            [TextNode("[[[[", TextType.TEXT), TextNode("a", TextType.LINK, "u")])
+
 
 if __name__ == "__main__":
     unittest.main()
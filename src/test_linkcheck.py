@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from linkcheck import (UNKNOWN_LINE, BrokenLink, LinkChecker, document_links, is_internal,
+                       link_exists, locate_links, resolve_link, source_links)
+from markdown_blocks import markdown_to_flat_document
+from pageindex import PageRecord
+
+
+def record(source, source_hash, links=None):
+    page = PageRecord(source, source.replace(".md", ".html"), "T", source_hash, 0, 0)
+    page.links = links
+    return page
+
+
+class TestLinks(unittest.TestCase):
+
+    def test_is_internal(self):
+        self.assertEqual([is_internal(url) for url in ("/a", "a/b.html", "../c", "#top", "//cdn/x",
+                                                      "https://x", "mailto:me@x", "")],
+                         [True, True, True, False, False, False, False, False])
+
+    def test_document_links(self):
+        doc = markdown_to_flat_document("# T\n\n[a](/a) ![i](img.png) [e](https://x)\n\n"
+                                        "- [b](/b#frag)\n\n[![logo](/l.png)](/home)")
+        self.assertEqual(document_links(doc), ["/a", "img.png", "/b#frag", "/home", "/l.png"])
+
+    def test_locate_links(self):
+        source = b"---\ntitle: x\n---\n# T\n\n[a](/a) [b](/b)\n\n[a again](/a)\n\n![x](/x)"
+        self.assertEqual(locate_links(source, ["/a", "/b", "/a", "/missing", "/x"]),
+                         [("/a", 6), ("/b", 6), ("/a", 8), ("/missing", UNKNOWN_LINE), ("/x", 10)])
+
+    def test_resolve_and_exists(self):
+        outputs = {"index.html", "blog/post/index.html", "about.html", "images/a b.png"}
+        for url, dest, expected in (("/", "x.html", ""), ("/blog/post/", "x.html", "blog/post"),
+                                    ("../about#team", "blog/post/index.html", "blog/about"),
+                                    ("../../about?q=1", "blog/post/index.html", "about"),
+                                    ("#top", "x.html", None), ("/images/a%20b.png", "x.html", "images/a b.png")):
+            self.assertEqual(resolve_link(url, dest), expected, url)
+        self.assertEqual([link_exists(target, outputs) for target in ("", "blog/post", "about",
+                                                                      "blog/about", "images/a b.png")],
+                         [True, True, True, False, True])
+
+
+class TestLinkChecker(unittest.TestCase):
+
+    def test_check_and_reuse(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content, output = os.path.join(tmp, "content"), os.path.join(tmp, "out")
+            os.makedirs(os.path.join(content, "blog"))
+            with open(os.path.join(content, "blog", "post.md"), "w") as md_file:
+                md_file.write("# Post\n\n[home](/)\n[gone](../missing)\n")
+            self.assertEqual(source_links(os.path.join(content, "blog", "post.md")),
+                             [("/", 3), ("../missing", 4)])
+
+            checker = LinkChecker(output, content)
+            checker.add(record("index.md", "h1", [("/blog/post", 3), ("/nope.css", 5)]))
+            checker.add(record("blog/post.md", "h2"))
+            outputs = {"index.html", "blog/post.html"}
+            expected = [BrokenLink("blog/post.md", 4, "../missing"), BrokenLink("index.md", 5, "/nope.css")]
+            self.assertEqual((checker.check(outputs), checker.reparsed), (expected, 1))
+            self.assertEqual(str(expected[0]), "blog/post.md:4: broken link ../missing")
+            checker.save()
+
+            # Unchanged pages without links keep those of the previous build
+            checker = LinkChecker(output, content)
+            checker.add(record("index.md", "h1"))
+            checker.add(record("blog/post.md", "h2"))
+            self.assertEqual((checker.check(outputs | {"nope.css"}), checker.reparsed),
+                             ([BrokenLink("blog/post.md", 4, "../missing")], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import unittest
+from livereload import (ChangeFeed, affects, changed_pages, changed_static, inject_client,
+                        load_changes, publish_changes, static_snapshot)
+from pageindex import PageIndex, PageRecord
+
+
+def record(source, output_hash):
+    return PageRecord(source, source.replace(".md", ".html"), "Title", "s", 0, 1, output_hash)
+
+
+class TestChangedPages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest = os.path.join(self.tmp.name, "manifest.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_manifest(self, records):
+        index = PageIndex()
+        for page in records:
+            index.add(page)
+        index.write_manifest(self.manifest)
+
+    def test_added_removed_and_changed_pages(self):
+        self.write_manifest([record("a.md", "1"), record("b.md", "2"), record("c.md", "3")])
+        current = PageIndex()
+        for page in (record("a.md", "1"), record("c.md", "changed"), record("d.md", "4")):
+            current.add(page)
+        self.assertEqual(changed_pages(self.manifest, current), ["b.html", "c.html", "d.html"])
+
+    def test_unchanged_build(self):
+        records = [record("a.md", "1"), record("blog/b.md", "2")]
+        self.write_manifest(records)
+        self.assertEqual(changed_pages(self.manifest, records), [])
+
+    def test_unknown_without_a_comparable_manifest(self):
+        self.assertIsNone(changed_pages(self.manifest, [record("a.md", "1")]))
+        with open(self.manifest, "w") as manifest_file:
+            for source in ("b.md", "a.md"):
+                manifest_file.write(json.dumps(record(source, "1").to_dict()) + "\n")
+        self.assertIsNone(changed_pages(self.manifest, [record("a.md", "1")]))
+
+
+class TestChangeLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_publish_numbers_builds(self):
+        self.assertEqual(load_changes(self.output)["sequence"], 0)
+        self.assertEqual(publish_changes(self.output, None, {}), 1)
+        self.assertEqual(publish_changes(self.output, ["index.html"], {"a.css": [1, 2]}), 2)
+        self.assertEqual(load_changes(self.output),
+                         {"sequence": 2, "changed": ["index.html"], "static": {"a.css": [1, 2]}})
+
+    def test_static_snapshot(self):
+        os.makedirs(os.path.join(self.output, "images"))
+        for path in ("index.css", "images/logo.png"):
+            with open(os.path.join(self.output, path), "w") as static_file:
+                static_file.write("x")
+        before = static_snapshot(self.output)
+        self.assertEqual(set(before), {"index.css", "images/logo.png"})
+        after = dict(before, **{"index.css": [2, 0], "new.js": [1, 0]})
+        del after["images/logo.png"]
+        self.assertEqual(changed_static(before, after), ["images/logo.png", "index.css", "new.js"])
+
+    def test_affects(self):
+        self.assertTrue(affects(None, "index.html"))
+        self.assertTrue(affects(["index.html"], "index.html"))
+        self.assertFalse(affects(["blog/index.html"], "index.html"))
+        self.assertTrue(affects(["index.css"], "index.html"))
+        for asset in ("index.3fa9c1d2.css", "app.js", "images/Logo.PNG"):
+            self.assertTrue(affects(["blog/index.html", asset], "index.html"), asset)
+        self.assertFalse(affects(["blog/index.html", "sitemap.xml", "search/index.json",
+                                  "search/terms-0a.json", "blog/index.html.gz", "index.css.gz"],
+                                 "index.html"))
+
+    def test_inject_client(self):
+        html = inject_client(b"<html><body><p>x</p></BODY></html>", "blog/a b.html", 7)
+        self.assertTrue(html.startswith(b"<html><body><p>x</p><script>"))
+        self.assertTrue(html.endswith(b"</script></BODY></html>"))
+        self.assertIn(b"page=blog/a%20b.html&since=7", html)
+        self.assertTrue(inject_client(b"<p>x</p>", "a.html", 1).startswith(b"<p>x</p><script>"))
+
+
+class TestChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = self.tmp.name
+        publish_changes(self.output, None, {})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_changed_since(self):
+        feed = ChangeFeed(self.output)
+        self.assertEqual(feed.changed_since("index.html", 1), (False, 1))
+        publish_changes(self.output, ["blog/index.html"], {})
+        publish_changes(self.output, ["index.html"], {})
+        feed.poll()
+        self.assertEqual(feed.sequence, 3)
+        # Both builds landed between two polls, so the second is treated as changing everything
+        self.assertEqual(feed.changed_since("blog/index.html", 1), (True, 3))
+
+        publish_changes(self.output, ["index.html"], {})
+        feed.poll()
+        self.assertEqual(feed.changed_since("blog/index.html", 3), (False, 4))
+        self.assertEqual(feed.changed_since("index.html", 3), (True, 4))
+        self.assertEqual(feed.changed_since("index.html", 0), (True, 4))
+
+    def test_wait_wakes_on_a_build(self):
+        feed = ChangeFeed(self.output, interval=0.01)
+        feed.start()
+        try:
+            self.assertEqual(feed.wait(1, 0.01), 1)
+            publish_changes(self.output, [], {})
+            self.assertEqual(feed.wait(1, 5), 2)
+        finally:
+            feed.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
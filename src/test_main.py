@@ -1,19 +1,572 @@
+import io
+import json
+import os
+import tempfile
+import time
 import unittest
-from main import extract_title
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+import main
+from main import (generate_page, parse_args, require_title,
+                  check_memory_budget, BuildContext, generate_pages_recursive, generate_pages_parallel)
+from artifact_cache import ArtifactCache
+from assets import AssetManifest
+from livereload import CHANGES_NAME, load_changes
+from metrics import BuildMetrics
+from pageindex import PageIndex
+from subset import DEPS_NAME
+from watchdog import PageLimits, PageLimitExceeded
 
 
 class TestMainFunctions(unittest.TestCase):
-    # extract_title tests
-    def test_extract_title_with_title(self):
-        md = "# My Title\n\nSome content here."
-        self.assertEqual(extract_title(md), "My Title")
-
-    def test_extract_title_no_title(self):
-        md = "No title here."
+    # require_title tests
+    def test_require_title(self):
+        self.assertEqual(require_title(""), "")
         with self.assertRaises(Exception) as context:
-            extract_title(md)
+            require_title(None)
         self.assertEqual(str(context.exception), "No title found in markdown.")
 
-    def test_title_inside_text(self):
-        md = "This is a # Not a title\n\n# Actual Title\nMore text."
-        self.assertEqual(extract_title(md), "Actual Title")
\ No newline at end of file
+    # parse_args tests
+    def test_parse_args_defaults(self):
+        args = parse_args([])
+        self.assertEqual(args.basepath, "/")
+        self.assertIsNone(args.metrics)
+
+    def test_parse_args_basepath_and_metrics(self):
+        args = parse_args(["/StaticSiteGenerator/", "--metrics", "build.prom"])
+        self.assertEqual(args.basepath, "/StaticSiteGenerator/")
+        self.assertEqual(args.metrics, "build.prom")
+
+    def test_parse_args_memory_budget(self):
+        self.assertIsNone(parse_args([]).memory_budget)
+        self.assertEqual(parse_args(["--memory-budget", "512"]).memory_budget, 512)
+
+    # check_memory_budget tests
+    def test_check_memory_budget(self):
+        with redirect_stdout(io.StringIO()):
+            check_memory_budget(1 << 40)
+            with mock.patch.object(main, "peak_rss_bytes", return_value=2 << 20):
+                with self.assertRaises(SystemExit):
+                    check_memory_budget(1 << 20)
+            # A worker over the budget fails the build
+            with self.assertRaises(SystemExit):
+                check_memory_budget(1 << 40, 2 << 40)
+
+    # generate_page tests
+    def test_generate_page_mmap_path_matches_in_memory_path(self):
+        md = "# Big *Title*\n\nSome [link](/page) and ![img](/a.png)\n\n```\ncode\n\nblock\n```\n\n- one\n- two\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            source, template = os.path.join(tmp, "index.md"), os.path.join(tmp, "template.html")
+            with open(source, "w") as md_file:
+                md_file.write(md)
+            with open(template, "w") as template_file:
+                template_file.write('<title>{{ Title }}</title><link href="/index.css"><article>{{ Content }}</article>')
+
+            with redirect_stdout(io.StringIO()):
+                generate_page(source, template, os.path.join(tmp, "memory.html"), "/base/")
+                with mock.patch.object(main, "MMAP_THRESHOLD_BYTES", 0):
+                    generate_page(source, template, os.path.join(tmp, "mmap.html"), "/base/")
+
+            with open(os.path.join(tmp, "memory.html")) as memory_file, \
+                 open(os.path.join(tmp, "mmap.html")) as mmap_file:
+                expected = memory_file.read()
+                self.assertEqual(mmap_file.read(), expected)
+            self.assertIn('<a href="/base/page">', expected)
+            self.assertIn('<link href="/base/index.css">', expected)
+
+    def test_generate_page_mmap_path_matches_in_memory_path_line_breaks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source, template = os.path.join(tmp, "index.md"), os.path.join(tmp, "template.html")
+            with open(template, "w") as template_file:
+                template_file.write("<title>{{ Title }}</title>{{ Content }}")
+            for md in (b"# Title\rIntro\r\rBody\rline\r\r```\rcode\r\r```\r",
+                       b"# Title\r\n\r\nMixed\rbreaks\n\rend\r\n"):
+                with open(source, "wb") as md_file:
+                    md_file.write(md)
+                with redirect_stdout(io.StringIO()):
+                    generate_page(source, template, os.path.join(tmp, "memory.html"), "/")
+                    with mock.patch.object(main, "MMAP_THRESHOLD_BYTES", 0):
+                        generate_page(source, template, os.path.join(tmp, "mmap.html"), "/")
+                with open(os.path.join(tmp, "memory.html")) as memory_file, \
+                     open(os.path.join(tmp, "mmap.html")) as mmap_file:
+                    self.assertEqual(mmap_file.read(), memory_file.read(), md)
+
+    def test_generate_page_records_page_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content, output = os.path.join(tmp, "content"), os.path.join(tmp, "docs")
+            os.makedirs(os.path.join(content, "blog"))
+            os.makedirs(os.path.join(output, "blog"))
+            source = os.path.join(content, "blog", "post.md")
+            with open(source, "w") as md_file:
+                md_file.write("# Post\r\n\r\nBody\r\n")
+            template = os.path.join(tmp, "template.html")
+            with open(template, "w") as template_file:
+                template_file.write("<h1>{{ Title }}</h1>{{ Content }}")
+
+            index = PageIndex()
+            context = BuildContext(page_index=index, content_dir=content, output_dir=output)
+            dest = os.path.join(output, "blog", "post.html")
+            with redirect_stdout(io.StringIO()):
+                generate_page(source, template, dest, "/", context)
+
+            record = index.get("blog/post.md")
+            self.assertIsNotNone(record)
+            self.assertEqual(record.dest, "blog/post.html")
+            self.assertEqual(record.title, "Post")
+            self.assertEqual(record.output_bytes, os.path.getsize(dest))
+            with open(dest) as html_file:
+                self.assertEqual(html_file.read(), "<h1>Post</h1><div><h1>Post</h1><p>Body</p></div>")
+
+    def test_generate_page_front_matter(self):
+        md = "---\ntitle: Front *Title*\ntags: a, b\n---\n# Heading\n\nBody\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            source, template = os.path.join(tmp, "index.md"), os.path.join(tmp, "template.html")
+            with open(source, "w") as md_file:
+                md_file.write(md)
+            with open(template, "w") as template_file:
+                template_file.write("<title>{{ Title }}</title>{{ Content }}")
+            context = BuildContext(content_dir=tmp, output_dir=tmp)
+
+            with redirect_stdout(io.StringIO()):
+                record, _ = generate_page(source, template, os.path.join(tmp, "memory.html"), "/", context)
+                with mock.patch.object(main, "MMAP_THRESHOLD_BYTES", 0):
+                    streamed, _ = generate_page(source, template, os.path.join(tmp, "mmap.html"), "/",
+                                                context)
+
+            with open(os.path.join(tmp, "memory.html")) as memory_file, \
+                 open(os.path.join(tmp, "mmap.html")) as mmap_file:
+                html = memory_file.read()
+                self.assertEqual(mmap_file.read(), html)
+            self.assertEqual(html, "<title>Front *Title*</title><div><h1>Heading</h1><p>Body</p></div>")
+            for page in (record, streamed):
+                self.assertEqual(page.title, "Front *Title*")
+                self.assertEqual(page.front_matter, {"title": "Front *Title*", "tags": "a, b"})
+
+    def test_generate_page_title_is_the_same_on_every_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source, template = os.path.join(tmp, "index.md"), os.path.join(tmp, "template.html")
+            with open(template, "w") as template_file:
+                template_file.write("<title>{{ Title }}</title>{{ Content }}")
+            context = BuildContext(content_dir=tmp, output_dir=tmp,
+                                   cache=ArtifactCache(os.path.join(tmp, "cache")))
+            for md, title in (("Intro line\n# Real Title\n\nbody", "Real Title"), ("Text\n# \n\nbody", "")):
+                with open(source, "w") as md_file:
+                    md_file.write(md)
+                with redirect_stdout(io.StringIO()):
+                    rendered, _ = generate_page(source, template, os.path.join(tmp, "a.html"), "/", context)
+                    cached, _ = generate_page(source, template, os.path.join(tmp, "b.html"), "/", context)
+                    with mock.patch.object(main, "MMAP_THRESHOLD_BYTES", 0):
+                        streamed, _ = generate_page(source, template, os.path.join(tmp, "c.html"), "/",
+                                                    context)
+                self.assertEqual([rendered.title, cached.title, streamed.title], [title] * 3, md)
+
+    def test_generate_page_reuses_artifact_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source, template = os.path.join(tmp, "index.md"), os.path.join(tmp, "template.html")
+            with open(source, "w") as md_file:
+                md_file.write("# Cached\n\nSome [link](/page)\n")
+            with open(template, "w") as template_file:
+                template_file.write("<title>{{ Title }}</title>{{ Content }}")
+            metrics = BuildMetrics()
+            context = BuildContext(metrics=metrics, cache=ArtifactCache(os.path.join(tmp, "cache")))
+
+            with redirect_stdout(io.StringIO()):
+                generate_page(source, template, os.path.join(tmp, "cold.html"), "/base/", context)
+                with mock.patch.object(main, "markdown_to_flat_document") as render:
+                    record, _ = generate_page(source, template, os.path.join(tmp, "warm.html"),
+                                              "/base/", context)
+                    render.assert_not_called()
+                generate_page(source, template, os.path.join(tmp, "other.html"), "/other/", context)
+
+            with open(os.path.join(tmp, "cold.html"), "rb") as cold, \
+                 open(os.path.join(tmp, "warm.html"), "rb") as warm:
+                self.assertEqual(warm.read(), cold.read())
+            self.assertEqual(record.title, "Cached")
+            self.assertEqual(metrics.cache_hits, {"template": 2, "page": 1})
+            self.assertEqual(metrics.cache_misses, {"template": 1, "page": 2})
+
+
+class TestPageLimitPolicies(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content, self.output = os.path.join(root, "content"), os.path.join(root, "docs")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.output)
+        with open(os.path.join(self.content, "index.md"), "w") as md_file:
+            md_file.write("# Home\n\nWelcome")
+        with open(os.path.join(self.content, "blog", "huge.md"), "w") as md_file:
+            md_file.write("# Huge\n\n" + "word " * 1000)
+        self.template = os.path.join(root, "template.html")
+        with open(self.template, "w") as template_file:
+            template_file.write("<title>{{ Title }}</title>{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, policy, jobs=1):
+        context = BuildContext(BuildMetrics(), PageIndex(), self.content, self.output,
+                               limits=PageLimits(max_source_bytes=1000, policy=policy))
+        with redirect_stdout(io.StringIO()), mock.patch("sys.stderr", io.StringIO()):
+            if jobs > 1:
+                generate_pages_parallel(self.content, self.template, self.output, "/", context, jobs)
+            else:
+                generate_pages_recursive(self.content, self.template, self.output, "/", context)
+        return context
+
+    def test_skip_policy(self):
+        for jobs in (1, 2):
+            context = self.build("skip", jobs)
+            self.assertEqual(context.metrics.pages_rendered, 1)
+            self.assertEqual(context.metrics.pages_skipped, 1)
+            self.assertFalse(os.path.exists(os.path.join(self.output, "blog", "huge.html")))
+            self.assertTrue(os.path.exists(os.path.join(self.output, "index.html")))
+            self.assertEqual([record.source for record in context.page_index], ["index.md"])
+
+    def test_stub_policy(self):
+        for jobs in (1, 2):
+            self.build("stub", jobs)
+            with open(os.path.join(self.output, "blog", "huge.html")) as html_file:
+                self.assertIn("exceeded the source size limit", html_file.read())
+
+    def test_fail_policy(self):
+        for jobs in (1, 2):
+            with self.assertRaises(PageLimitExceeded):
+                self.build("fail", jobs)
+
+    def test_parallel_builds_reuse_workers(self):
+        main.close_page_pool()
+        main._template_cache.clear()
+        context = self.build("skip", 2)
+        # The template read before forking is the only miss; the workers inherit it
+        self.assertEqual((context.metrics.cache_misses, context.metrics.cache_hits),
+                         ({"template": 1}, {"template": 1}))
+        pids = [worker.process.pid for worker in main._page_pool.workers]
+        context = self.build("skip", 2)
+        self.assertEqual([worker.process.pid for worker in main._page_pool.workers], pids)
+        self.assertEqual(context.metrics.pages_rendered, 1)
+        self.assertEqual(context.metrics.cache_misses, {})
+        self.assertEqual(context.metrics.worker_peak_rss, main._page_pool.peak_rss)
+        main.close_page_pool()
+        self.assertIsNone(main._page_pool)
+
+
+
+class TestMultipleTargets(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        with open(os.path.join(self.content, "index.md"), "w") as md_file:
+            md_file.write("# Home\n\nSee [the blog](/blog/post) and ![logo](/images/logo.png)\n")
+        with open(os.path.join(self.content, "blog", "post.md"), "w") as md_file:
+            md_file.write("# Post\n\n" + "A [link](/index.html) per paragraph.\n\n" * 50)
+        os.makedirs(self.static)
+        with open(os.path.join(self.static, "index.css"), "w") as css_file:
+            css_file.write("body { margin: 0; }\n")
+        with open(self.template, "w") as template_file:
+            template_file.write('<title>{{ Title }}</title><link href="/index.css">{{ Content }}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, *argv):
+        with redirect_stdout(io.StringIO()):
+            main.main(["--content", self.content, "--static", self.static,
+                       "--template", self.template, *argv])
+
+    def read_tree(self, root):
+        """Returns: relative path -> bytes of every output file except the change log,
+           which numbers the builds of its directory, and the dependencies, which record
+           the options of the build."""
+        files = {}
+        for dirpath, _, names in os.walk(root):
+            for name in names:
+                if name in (CHANGES_NAME, DEPS_NAME):
+                    continue
+                path = os.path.join(dirpath, name)
+                with open(path, "rb") as file:
+                    files[os.path.relpath(path, root)] = file.read()
+        return files
+
+    def test_rebuild_publishes_changed_outputs(self):
+        output = os.path.join(self.root, "out")
+        self.build("--output", output)
+        self.assertIsNone(load_changes(output)["changed"])
+        self.build("--output", output)
+        self.assertEqual((load_changes(output)["sequence"], load_changes(output)["changed"]), (2, []))
+
+        with open(os.path.join(self.content, "blog", "post.md"), "a") as md_file:
+            md_file.write("One more paragraph.\n")
+        self.build("--output", output)
+        self.assertEqual(load_changes(output)["changed"], ["blog/post.html"])
+
+        with open(os.path.join(self.static, "index.css"), "a") as css_file:
+            css_file.write("p { margin: 1em; }\n")
+        self.build("--output", output, "--fingerprint-assets")
+        changed = load_changes(output)["changed"]
+        css = AssetManifest.load(output).entries["index.css"]["dest"]
+        self.assertEqual(changed, sorted(["blog/post.html", "index.html", css]))
+
+    def test_targets_match_separate_builds(self):
+        single = {basepath: os.path.join(self.root, f"single{i}")
+                  for i, basepath in enumerate(("/", "/Site/", "/x/"))}
+        for basepath, output in single.items():
+            self.build(basepath, "--output", output)
+
+        for extra in ([], ["--jobs", "2"]):
+            multi = {basepath: os.path.join(self.root, f"multi{i}")
+                     for i, basepath in enumerate(("/", "/Site/", "/x/"))}
+            with mock.patch.object(main, "markdown_to_flat_document",
+                                   wraps=main.markdown_to_flat_document) as render:
+                self.build("/", "--output", multi["/"], "--target", f"/Site/={multi['/Site/']}",
+                           "--target", f"/x/={multi['/x/']}", *extra)
+            if not extra:
+                self.assertEqual(render.call_count, 2)  # Once per page, not per target
+            for basepath in single:
+                self.assertEqual(self.read_tree(multi[basepath]), self.read_tree(single[basepath]))
+
+    def test_targets_with_streamed_pages(self):
+        single, multi = os.path.join(self.root, "single"), os.path.join(self.root, "multi")
+        self.build("/Site/", "--output", single)
+        with mock.patch.object(main, "MMAP_THRESHOLD_BYTES", 0):
+            self.build("/", "--output", os.path.join(self.root, "root"), "--target", f"/Site/={multi}")
+        self.assertEqual(self.read_tree(multi), self.read_tree(single))
+
+    def test_parse_target(self):
+        self.assertEqual(parse_args(["--target", "/a/=out"]).target, [("/a/", "out")])
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            parse_args(["--target", "out"])
+
+    def test_fingerprinted_assets(self):
+        output = os.path.join(self.root, "out")
+        os.makedirs(os.path.join(self.static, "images"))
+        with open(os.path.join(self.static, "images", "logo.png"), "wb") as image_file:
+            image_file.write(b"PNG")
+        self.build("/Site/", "--output", output, "--fingerprint-assets")
+
+        urls = AssetManifest.load(output).urls
+        with open(os.path.join(output, "index.html")) as html_file:
+            html = html_file.read()
+        self.assertIn(f'<link href="/Site/{urls["index.css"]}">', html)
+        self.assertIn(f'src="/Site/{urls["images/logo.png"]}"', html)
+        self.assertIn('href="/Site/blog/post"', html)
+        self.assertTrue(os.path.exists(os.path.join(output, urls["index.css"])))
+        self.assertFalse(os.path.exists(os.path.join(output, "index.css")))
+
+        metrics_path = os.path.join(self.root, "build.prom")
+        self.build("/Site/", "--output", output, "--fingerprint-assets", "--metrics", metrics_path)
+        with open(metrics_path) as metrics_file:
+            self.assertIn("ssg_build_static_bytes_copied 0\n", metrics_file.read())
+
+    def test_gzip_sidecars_survive_rebuilds(self):
+        output = os.path.join(self.root, "out")
+        self.build("/", "--output", output, "--gzip", "--gzip-min-size", "0",
+                   "--gzip-extensions", "html,css")
+        sidecar = os.path.join(output, "blog", "post.html.gz")
+        self.assertTrue(os.path.exists(os.path.join(output, "index.css.gz")))
+        mtime = os.stat(sidecar).st_mtime_ns
+
+        with redirect_stdout(io.StringIO()) as out:
+            main.main(["--content", self.content, "--static", self.static, "--template", self.template,
+                       "--output", output, "--gzip", "--gzip-min-size", "0",
+                       "--gzip-extensions", "html,css"])
+        self.assertIn(f"{output}: 0 compressed, 3 unchanged", out.getvalue())
+        self.assertEqual(os.stat(sidecar).st_mtime_ns, mtime)
+
+    def test_search_index(self):
+        output = os.path.join(self.root, "out")
+        cache_dir = os.path.join(self.root, "cache")
+        for jobs in ("2", "1"):
+            # Workers hand the terms of their pages back; no page is parsed again
+            with mock.patch("search.source_terms") as reparse:
+                self.build("/", "--output", output, "--search-index", "--jobs", jobs)
+            reparse.assert_not_called()
+            with open(os.path.join(output, "search", "terms-39.json")) as shard_file:
+                self.assertEqual(json.load(shard_file)["paragraph"], [0, 50])  # blog/post.md
+
+        # Pages reused from the cache keep their terms; unchanged shards are not rewritten
+        argv = ("/", "--output", output, "--search-index", "--cache-dir", cache_dir,
+                "--fingerprint-assets")
+        self.build(*argv)
+        index_path = os.path.join(output, "search", "index.json")
+        mtime = os.stat(index_path).st_mtime_ns
+        with mock.patch.object(main, "markdown_to_flat_document") as render, \
+             redirect_stdout(io.StringIO()) as out:
+            main.main(["--content", self.content, "--static", self.static,
+                       "--template", self.template, *argv])
+        render.assert_not_called()
+        self.assertIn("Search index: 0 files written, 66 unchanged", out.getvalue())
+        self.assertEqual(os.stat(index_path).st_mtime_ns, mtime)
+
+    def test_parallel_build_counts_cache_lookups(self):
+        cache_series = {}
+        for jobs in ("1", "2"):
+            output, metrics = os.path.join(self.root, f"out{jobs}"), os.path.join(self.root, "build.prom")
+            for _ in range(2):
+                self.build("/", "--output", output, "--cache-dir", os.path.join(self.root, f"cache{jobs}"),
+                           "--metrics", metrics, "--jobs", jobs)
+            with open(metrics) as metrics_file:
+                cache_series[jobs] = [line for line in metrics_file if 'cache="page"' in line]
+        self.assertIn('ssg_build_cache_hits{cache="page"} 2\n', cache_series["1"])
+        self.assertEqual(cache_series["2"], cache_series["1"])
+
+    def test_listing_and_sitemap(self):
+        output, mirror = os.path.join(self.root, "out"), os.path.join(self.root, "mirror")
+        argv = ("/", "--output", output, "--target", f"/Site/={mirror}", "--listing", "blog",
+                "--sitemap", "https://example.com", "--fingerprint-assets")
+        self.build(*argv)
+        with open(os.path.join(mirror, "blog", "index.html")) as html_file:
+            self.assertIn('<li><a href="/Site/blog/post.html">Post</a>', html_file.read())
+        with open(os.path.join(mirror, "sitemap.xml")) as sitemap_file:
+            self.assertIn("<loc>https://example.com/Site/blog/</loc>", sitemap_file.read())
+
+        mtime = os.stat(os.path.join(output, "blog", "index.html")).st_mtime_ns
+        with open(os.path.join(self.content, "blog", "new.md"), "w") as md_file:
+            md_file.write("---\ndate: 2999-01-01\n---\n# New\n")
+        self.build(*argv)
+        self.assertIn("blog/index.html", load_changes(output)["changed"])
+        with open(os.path.join(output, "blog", "index.html")) as html_file:
+            html = html_file.read()
+        self.assertLess(html.index("/blog/new.html"), html.index("/blog/post.html"))
+        self.assertGreater(os.stat(os.path.join(output, "blog", "index.html")).st_mtime_ns, mtime)
+
+        self.build(*argv)
+        self.assertEqual(load_changes(output)["changed"], [])
+
+        os.makedirs(os.path.join(self.content, "docs"))
+        with open(os.path.join(self.content, "docs", "index.md"), "w") as md_file:
+            md_file.write("# Docs\n")
+        with self.assertRaises(SystemExit):
+            self.build("/", "--output", output, "--listing", "docs")
+
+    def test_check_links(self):
+        output = os.path.join(self.root, "out")
+        for jobs, threshold in (("1", main.MMAP_THRESHOLD_BYTES), ("2", main.MMAP_THRESHOLD_BYTES), ("1", 0)):
+            # Every build starts without the links of the previous one, so none is parsed again
+            with mock.patch.object(main, "MMAP_THRESHOLD_BYTES", threshold), \
+                 mock.patch("linkcheck.source_links") as reparse, \
+                 redirect_stderr(io.StringIO()) as err:
+                self.build("/Site/", "--output", f"{output}{jobs}{threshold}", "--check-links",
+                           "--jobs", jobs)
+            reparse.assert_not_called()
+            # /blog/post is served by blog/post.html; the logo is not among the static files
+            self.assertEqual(err.getvalue(), "index.md:3: broken link /images/logo.png\n")
+
+        with open(os.path.join(self.content, "blog", "post.md"), "a") as md_file:
+            md_file.write("\n[Missing](../missing.html)\n")
+        with redirect_stderr(io.StringIO()) as err, self.assertRaises(SystemExit):
+            self.build("/", "--output", output, "--check-links", "--fail-on-broken-links")
+        self.assertIn("blog/post.md:104: broken link ../missing.html\n", err.getvalue())
+
+    def test_subset_builds(self):
+        output, mirror = os.path.join(self.root, "out"), os.path.join(self.root, "mirror")
+        options = ("/", "--output", output, "--target", f"/Site/={mirror}", "--listing", "blog",
+                   "--search-index")
+        changed_list = os.path.join(self.root, "changed.txt")
+        with open(changed_list, "w") as list_file:
+            list_file.write(os.path.join(self.content, "blog", "post.md") + "\n")
+
+        # Without a complete previous build, every page is built
+        self.build(*options, "--only", "blog/*")
+        self.assertTrue(os.path.exists(os.path.join(output, "index.html")))
+        full = self.read_tree(output), self.read_tree(mirror)
+        index_mtime = os.stat(os.path.join(output, "index.html")).st_mtime_ns
+
+        with open(os.path.join(self.content, "blog", "post.md"), "a") as md_file:
+            md_file.write("Edited paragraph.\n")
+        with open(os.path.join(self.content, "blog", "new.md"), "w") as md_file:
+            md_file.write("# New\n\nBody\n")
+        with open(os.path.join(self.static, "index.css"), "a") as css_file:
+            css_file.write("p { margin: 0; }\n")
+        with mock.patch.object(main, "markdown_to_flat_document",
+                               wraps=main.markdown_to_flat_document) as render:
+            self.build(*options, "--changed-from", changed_list, "--only", "blog/new*")
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(os.stat(os.path.join(output, "index.html")).st_mtime_ns, index_mtime)
+        self.assertEqual(load_changes(output)["changed"],
+                         ["blog/index.html", "blog/new.html", "blog/post.html", "index.css"])
+        subset = self.read_tree(output), self.read_tree(mirror)
+
+        # The updated outputs are those of a full build
+        self.build(*options)
+        self.assertEqual((self.read_tree(output), self.read_tree(mirror)), subset)
+        self.assertNotEqual(subset, full)
+
+        os.remove(os.path.join(self.content, "blog", "new.md"))
+        self.build(*options, "--only", "blog/new.md")
+        self.assertFalse(os.path.exists(os.path.join(mirror, "blog", "new.html")))
+        self.assertEqual(load_changes(output)["changed"], ["blog/index.html", "blog/new.html"])
+        with self.assertRaises(SystemExit):
+            self.build(*options, "--only", "*", "--shard", "1/2")
+
+        # A build with other options is not updated but rebuilt
+        with mock.patch.object(main, "markdown_to_flat_document",
+                               wraps=main.markdown_to_flat_document) as render:
+            self.build(*options, "--minify", "--only", "blog/post.md")
+        self.assertEqual(render.call_count, 2)
+
+    def test_trace_merges_worker_spans(self):
+        trace_path = os.path.join(self.root, "trace.json")
+        for jobs in ("1", "2"):
+            self.build("/", "--output", os.path.join(self.root, "out"), "--jobs", jobs,
+                       "--trace", trace_path)
+            with open(trace_path) as trace_file:
+                events = json.load(trace_file)["traceEvents"]
+            spans = [event for event in events if event["ph"] == "X"]
+            names = {event["name"] for event in spans}
+            self.assertLessEqual({"static", "discovery", "pages", "manifest", "page", "read", "split",
+                                  "parse", "serialize", "write"}, names)
+            pages = {event["args"]["page"]: event["pid"] for event in spans if event["name"] == "page"}
+            self.assertEqual(sorted(os.path.relpath(page, self.content) for page in pages),
+                             [os.path.join("blog", "post.md"), "index.md"])
+            build_pid = next(event["pid"] for event in spans if event["name"] == "pages")
+            self.assertEqual(build_pid in pages.values(), jobs == "1")
+            self.assertEqual(sorted(event["ts"] for event in spans), [event["ts"] for event in spans])
+
+    def test_memory_profile(self):
+        with redirect_stdout(io.StringIO()) as out:
+            main.main(["--content", self.content, "--static", self.static, "--template", self.template,
+                       "--output", os.path.join(self.root, "out"), "--jobs", "2",
+                       "--memory-profile", "--memory-profile-top", "1"])
+        report = out.getvalue()
+        self.assertIn("ignoring --jobs", report)
+        pages = report[report.index("Top 1 pages"):report.index("Top 1 allocation sites")]
+        self.assertEqual(len(pages.splitlines()), 2)
+        self.assertIn(os.path.join("blog", "post.md"), pages)  # The larger page peaks higher
+
+    def test_sample_profile(self):
+        profile_path = os.path.join(self.root, "profile.txt")
+        generate = main.generate_pages_recursive
+
+        def slow_generate(*args):
+            time.sleep(0.05)    # Long enough to be sampled however fast the pages are
+            generate(*args)
+
+        for jobs in ("1", "2"):
+            with mock.patch.object(main, "generate_pages_recursive", side_effect=slow_generate):
+                self.build("/", "--output", os.path.join(self.root, "out"), "--jobs", jobs,
+                           "--sample-profile", profile_path, "--sample-interval", "0.001")
+            with open(profile_path) as profile_file:
+                lines = profile_file.read().splitlines()
+            for line in lines:
+                stack, count = line.rsplit(" ", 1)
+                self.assertGreater(int(count), 0)
+            if jobs == "1":
+                self.assertTrue(any(";build (main.py);" in line and "slow_generate" in line
+                                    for line in lines))
+
+    def test_minified_build(self):
+        plain, minified = os.path.join(self.root, "plain"), os.path.join(self.root, "min")
+        self.build("/Site/", "--output", plain)
+        self.build("/Site/", "--output", minified, "--minify")
+        with open(os.path.join(minified, "index.html")) as html_file:
+            html = html_file.read()
+        self.assertTrue(html.startswith('<title>Home</title><link href="/Site/index.css">'))
+        self.assertIn('<img src="/Site/images/logo.png" alt=logo>', html)
+        self.assertLess(len(html), os.path.getsize(os.path.join(plain, "index.html")))
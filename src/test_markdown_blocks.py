@@ -1,5 +1,8 @@
 import unittest
-from markdown_blocks import markdown_to_blocks, block_to_block_type, BlockType, markdown_to_html_node
+from htmlnode import HTMLWriter
+from markdown_blocks import (markdown_to_blocks, block_to_block_type, BlockType,
+                             markdown_to_html_node, iter_blocks_from_buffer, emit_markdown,
+                             markdown_to_flat_document, iter_block_spans, span_block_type)
 
 
 class TestMarkdownBlocks(unittest.TestCase):
@@ -453,3 +456,67 @@ Para 3"""
         self.assertEqual(blocks[0], 'Para 1')
         self.assertEqual(blocks[1], 'Para 2')
         self.assertEqual(blocks[2], 'Para 3')
+
+    # Tests for emit_markdown function #
+    def test_emit_markdown_writer_matches_node_tree(self):
+        md = """# Title with **bold**
+
+Para with [a _link_](/x) and ![img](/i.png)  
+second line
+
+```
+<code> & stuff
+```
+
+> quote
+
+- item **one**
+- item two
+
+1. first
+2. second
+
+***"""
+        writer = HTMLWriter()
+        emit_markdown(writer, md)
+        self.assertEqual(writer.to_html(), markdown_to_html_node(md).to_html())
+
+    # Tests for iter_blocks_from_buffer function #
+    def test_iter_blocks_from_buffer_matches_markdown_to_blocks(self):
+        samples = [
+            "",
+            "\n\n\n",
+            "Block one.\n\n   \n\nBlock two.",
+            "# Title\n\nPara line 1\nPara line 2\n\n- a\n- b\n",
+            "```\ncode\n\n\nmore code\n```\n\nafter",
+            "  ```python\nx = 1\n\n  ```\ntext right after\n\nnext",
+            "unclosed\n```\nfence\n\nstill code",
+            "caf\u00e9 \u00fcber\n\u00a0\nsecond block \u2603",
+        ]
+        for md in samples:
+            self.assertEqual(list(iter_blocks_from_buffer(md.encode())), markdown_to_blocks(md))
+
+    # Tests for iter_block_spans function #
+    def test_iter_block_spans_slice_to_blocks(self):
+        md = "\n# Title\n\n  Para\nline  \n\n```\ncode\n\n```\n\n- a\n- b"
+        spans = list(iter_block_spans(md))
+        self.assertEqual([md[start:end] for start, end in spans], markdown_to_blocks(md))
+        self.assertEqual([span_block_type(md, start, end) for start, end in spans],
+                         [BlockType.HEADING, BlockType.PARAGRAPH, BlockType.CODE,
+                          BlockType.UNORDERED_LIST])
+
+    def test_iter_blocks_from_buffer_start(self):
+        md = b"---\ntitle: x\n---\n# Title\n\nBody"
+        self.assertEqual(list(iter_blocks_from_buffer(md, md.index(b"# "))), ["# Title", "Body"])
+
+    def test_iter_blocks_from_buffer_normalizes_crlf(self):
+        md = "Line one\r\nLine two\r\n\r\nNext block\r\n"
+        self.assertEqual(list(iter_blocks_from_buffer(md.encode())),
+                         ["Line one\nLine two", "Next block"])
+
+    def test_iter_blocks_from_buffer_normalizes_lone_cr(self):
+        # Same blocks as the in-memory path, which decodes like a universal-newline read
+        for md in ("Line one\rLine two\r\rNext block\r", "# T\r\r```\rcode\r\r```\r\n\nafter\r\n\r"):
+            self.assertEqual(list(iter_blocks_from_buffer(md.encode())),
+                             markdown_to_blocks(md.replace("\r\n", "\n").replace("\r", "\n")))
+
@@ -0,0 +1,71 @@
+import tracemalloc
+import unittest
+from memprofile import MemoryProfile, PageMemory
+
+
+def render(size: int, keep: list) -> None:
+    transient = [str(i) for i in range(size)]
+    keep.append(bytearray(size))
+    del transient
+
+
+class TestMemoryProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = MemoryProfile()
+        self.profile.start()
+
+    def tearDown(self):
+        self.profile.stop()
+
+    def test_peak_and_retained_per_page(self):
+        kept = []
+        with self.profile.page("small.md"):
+            render(1000, kept)
+        with self.profile.page("large.md"):
+            render(100_000, kept)
+        small, large = self.profile.pages
+        self.assertEqual((small.path, large.path), ("small.md", "large.md"))
+        self.assertGreater(large.peak, 100_000 * 8)        # The transient list of strings
+        self.assertGreaterEqual(large.retained, 100_000)    # The kept bytearray
+        self.assertLess(large.retained, large.peak)
+        self.assertEqual([page.path for page in self.profile.top_pages(1)], ["large.md"])
+
+    def test_sites_summed_at_checkpoints(self):
+        for _ in range(3):
+            with self.profile.page("page.md"):
+                alive = bytearray(50_000)
+                self.profile.checkpoint()
+                del alive
+        with self.profile.page("unmarked.md"):
+            bytearray(50_000)
+        (site, size, count), = self.profile.top_sites(1)
+        self.assertIn("test_memprofile.py", site)
+        self.assertGreaterEqual(size, 3 * 50_000)
+        self.assertLess(size, 4 * 50_000)
+        self.assertGreaterEqual(count, 3)
+
+    def test_report(self):
+        with self.profile.page("a.md"):
+            self.profile.checkpoint()
+        report = self.profile.report(5)
+        self.assertTrue(report.startswith("Top 5 pages by peak traced memory (of 1):"))
+        self.assertIn("a.md", report)
+        self.assertIn("allocation sites", report)
+
+    def test_leaves_existing_tracing_running(self):
+        self.profile.stop()
+        self.assertFalse(tracemalloc.is_tracing())
+        tracemalloc.start()
+        try:
+            profile = MemoryProfile()
+            profile.start()
+            profile.stop()
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(repr(PageMemory("a.md", 2, 1)), "PageMemory(a.md, peak=2, retained=1)")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from metadata import MAX_FRONT_MATTER_BYTES, parse_front_matter, scan_metadata, scan_title
+
+
+class TestFrontMatter(unittest.TestCase):
+
+    def test_fields_and_body_offset(self):
+        source = b'---\ntitle: "Hello: World"\ndate: 2024-05-01\n# comment\ntags: a, b\n---\n# H1\n'
+        fields, body_start = parse_front_matter(source)
+        self.assertEqual(fields, {"title": "Hello: World", "date": "2024-05-01", "tags": "a, b"})
+        self.assertEqual(source[body_start:], b"# H1\n")
+
+    def test_crlf(self):
+        source = b"---\r\nauthor: 'Me'\r\n---\r\nBody"
+        fields, body_start = parse_front_matter(source)
+        self.assertEqual((fields, source[body_start:]), ({"author": "Me"}, b"Body"))
+
+    def test_no_front_matter(self):
+        for source in (b"# Title\n", b"", b"---", b"----\nkey: value\n---\n", b"text\n---\nkey: v\n---\n",
+                       b"---\nkey: value\nnever closed\n", b"---\nkey: value\nnot a field\n---\n",
+                       b"---\n" + b"x: y\n" * (MAX_FRONT_MATTER_BYTES // 5) + b"---\n"):
+            self.assertEqual(parse_front_matter(source), ({}, 0), source[:20])
+
+
+    def test_text_between_rules_is_not_front_matter(self):
+        source = b"---\n\nThis intro paragraph sits between two rules.\n\n---\n\n# Title\n\nBody\n"
+        self.assertEqual(parse_front_matter(source), ({}, 0))
+        metadata = scan_metadata(source)
+        self.assertEqual((metadata.title, metadata.body_start), ("Title", 0))
+
+
+class TestScanTitle(unittest.TestCase):
+
+    def test_first_line_starting_with_h1_marker(self):
+        self.assertEqual(scan_title(b"# My Title\n\nSome content here."), "My Title")
+        self.assertEqual(scan_title(b"This is a # Not a title\n\n# Actual Title\nMore text."),
+                         "Actual Title")
+        self.assertEqual(scan_title(b"Intro line\n# Real Title \xc3\xa9 \r\n\nbody"), "Real Title é")
+        self.assertEqual(scan_title(b"## Sub\n  # Indented\n# Title"), "Title")
+        self.assertEqual(scan_title(b"Text\n# \n# Second"), "")
+        self.assertIsNone(scan_title(b"No title here.\n\n#NoSpace"))
+
+    def test_line_breaks(self):
+        for source in (b"Intro\r\r# Title\rText", b"Intro\r\n\r\n# Title\r\nText", b"Intro\n\n# Title\n"):
+            self.assertEqual(scan_title(source), "Title", source)
+
+    def test_stops_at_the_title(self):
+        # Bytes after the title are never decoded
+        self.assertEqual(scan_title(b"# Early\n\n\xff\xfe not utf-8"), "Early")
+
+
+class TestScanMetadata(unittest.TestCase):
+
+    def test_front_matter_title_wins(self):
+        metadata = scan_metadata(b"---\ntitle: From front matter\n---\n# From H1\n")
+        self.assertEqual(metadata.title, "From front matter")
+        self.assertEqual(metadata.front_matter, {"title": "From front matter"})
+
+    def test_title_after_front_matter(self):
+        metadata = scan_metadata(b"---\ndate: 2024\n---\n\n# From H1\n")
+        self.assertEqual((metadata.title, metadata.front_matter), ("From H1", {"date": "2024"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
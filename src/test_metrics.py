@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from metrics import BuildMetrics, peak_rss_bytes
+
+
+class TestBuildMetrics(unittest.TestCase):
+
+    def test_phase_accumulates(self):
+        metrics = BuildMetrics()
+        with metrics.phase("pages"):
+            pass
+        with metrics.phase("pages"):
+            pass
+        self.assertIn("pages", metrics.phase_seconds)
+        self.assertGreaterEqual(metrics.phase_seconds["pages"], 0.0)
+
+    def test_render_histogram_is_cumulative(self):
+        metrics = BuildMetrics(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.5, 3.0):
+            metrics.observe_render(seconds)
+        text = metrics.to_prometheus()
+        self.assertIn('ssg_build_page_render_seconds_bucket{le="0.1"} 1\n', text)
+        self.assertIn('ssg_build_page_render_seconds_bucket{le="1.0"} 3\n', text)
+        self.assertIn('ssg_build_page_render_seconds_bucket{le="+Inf"} 4\n', text)
+        self.assertIn('ssg_build_page_render_seconds_count 4\n', text)
+        self.assertIn('ssg_build_page_render_seconds_sum 4.05\n', text)
+
+    def test_cache_hit_ratio(self):
+        metrics = BuildMetrics()
+        self.assertEqual(metrics.cache_hit_ratio("template"), 0.0)
+        metrics.record_cache("template", False)
+        for _ in range(3):
+            metrics.record_cache("template", True)
+        self.assertEqual(metrics.cache_hit_ratio("template"), 0.75)
+        self.assertIn('ssg_build_cache_hit_ratio{cache="template"} 0.75\n', metrics.to_prometheus())
+
+    def test_exposition_format(self):
+        metrics = BuildMetrics()
+        metrics.pages_rendered = 5
+        metrics.bytes_written = 1234
+        with metrics.phase('odd "phase"'):
+            pass
+        text = metrics.to_prometheus()
+        self.assertIn("# TYPE ssg_build_pages_rendered gauge\nssg_build_pages_rendered 5\n", text)
+        self.assertIn("ssg_build_bytes_written 1234\n", text)
+        self.assertIn('phase="odd \\"phase\\""', text)
+        self.assertIn("# TYPE ssg_build_page_render_seconds histogram\n", text)
+        self.assertTrue(text.endswith("\n"))
+
+    def test_write_is_atomic(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ssg.prom")
+            BuildMetrics().write(path)
+            self.assertEqual(os.listdir(tmp), ["ssg.prom"])
+            with open(path) as metrics_file:
+                self.assertIn("ssg_build_pages_rendered 0", metrics_file.read())
+
+    def test_peak_rss(self):
+        rss = peak_rss_bytes()
+        if rss is not None:
+            self.assertGreater(rss, 0)
+            # Workers that report a higher peak set it
+            self.assertEqual(peak_rss_bytes(rss + 1), rss + 1)
+            metrics = BuildMetrics()
+            metrics.observe_worker_rss(1 << 50)
+            metrics.observe_worker_rss(1)
+            self.assertIn(f"ssg_build_peak_rss_bytes {1 << 50}\n", metrics.to_prometheus())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from minify import minify_html
+
+
+class TestMinifyHTML(unittest.TestCase):
+
+    def test_template(self):
+        template = """<!doctype html>
+<html>
+  <head>
+    <meta charset="utf-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1" />
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+        self.assertEqual(minify_html(template),
+                         '<!doctype html><html><head><meta charset=utf-8>'
+                         '<meta name=viewport content="width=device-width, initial-scale=1">'
+                         '<title>{{ Title }}</title><link href="/index.css" rel=stylesheet></head>'
+                         '<body><article>{{ Content }}</article></body></html>')
+
+    def test_inline_whitespace_is_collapsed_not_removed(self):
+        self.assertEqual(minify_html("<p>\n  a <b>bold</b>\n   <i>word</i>\n</p>"),
+                         "<p>a <b>bold</b> <i>word</i></p>")
+
+    def test_preformatted_content_is_verbatim(self):
+        html = "<div>\n<pre>  a\n    b </pre>\n<code> x  y </code>\n<script>if (a  <  b) {}</script></div>"
+        self.assertEqual(minify_html(html),
+                         "<div><pre>  a\n    b </pre><code> x  y </code><script>if (a  <  b) {}</script></div>")
+
+    def test_attributes(self):
+        self.assertEqual(minify_html('<input disabled value=\'say "hi"\' data-x="a b" class="x" />'),
+                         '<input disabled value=\'say "hi"\' data-x="a b" class=x>')
+        self.assertEqual(minify_html('<a href=foo/>x</a><br/><img src="a.png"/>'),
+                         '<a href=foo/>x</a><br><img src=a.png>')
+        # Placeholders are substituted per page and root-relative URLs are patched later
+        self.assertEqual(minify_html('<meta content="{{Title}}"><img src="/a.png">'),
+                         '<meta content="{{Title}}"><img src="/a.png">')
+
+    def test_comments_are_kept(self):
+        self.assertEqual(minify_html("<div>\n  <!-- note -->\n</div>"), "<div><!-- note --></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from pageindex import PageIndex, PageRecord, manifest_path
+
+
+def make_record(i: int) -> PageRecord:
+    return PageRecord(source=f"blog/post{i}/index.md", dest=f"blog/post{i}/index.html",
+                      title=f"Post {i}", source_hash=f"{i:064x}", mtime_ns=i, output_bytes=100 + i)
+
+
+class TestPageIndex(unittest.TestCase):
+
+    def test_in_memory_index(self):
+        index = PageIndex()
+        for i in (3, 1, 2):
+            index.add(make_record(i))
+        self.assertEqual(len(index), 3)
+        self.assertFalse(index.spilled)
+        self.assertEqual([record.source for record in index],
+                         ["blog/post1/index.md", "blog/post2/index.md", "blog/post3/index.md"])
+        self.assertEqual(index.get("blog/post2/index.md"), make_record(2))
+        self.assertIsNone(index.get("missing.md"))
+
+    def test_replace_record(self):
+        index = PageIndex()
+        index.add(make_record(1))
+        updated = make_record(1)
+        updated.title = "Renamed"
+        index.add(updated)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.get("blog/post1/index.md").title, "Renamed")
+
+    def test_remove_record(self):
+        index = PageIndex()
+        index.add(make_record(1))
+        index.remove("blog/post1/index.md")
+        index.remove("missing.md")
+        self.assertEqual((len(index), index.memory_bytes), (0, 0))
+
+    def test_spills_past_budget(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            spill_path = os.path.join(tmp, "pages.sqlite")
+            index = PageIndex(max_memory_bytes=make_record(0).estimated_size() * 3, spill_path=spill_path)
+            for i in range(3):
+                index.add(make_record(i))
+            self.assertFalse(index.spilled)
+            for i in range(3, 10):
+                index.add(make_record(i))
+            self.assertTrue(index.spilled)
+            self.assertTrue(os.path.exists(spill_path))
+            self.assertEqual(index.memory_bytes, 0)
+            self.assertEqual(len(index), 10)
+            self.assertEqual(index.get("blog/post7/index.md"), make_record(7))
+            index.remove("blog/post9/index.md")
+            self.assertEqual(len(index), 9)
+            index.add(make_record(9))
+            self.assertEqual(list(index), sorted((make_record(i) for i in range(10)),
+                                                 key=lambda record: record.source))
+            index.close()
+            self.assertFalse(os.path.exists(spill_path))
+
+    def test_front_matter_survives_spilling(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = PageIndex(max_memory_bytes=1, spill_path=os.path.join(tmp, "pages.sqlite"))
+            record = make_record(1)
+            record.front_matter = {"tags": "a, b", "draft": "yes"}
+            index.add(record)
+            self.assertTrue(index.spilled)
+            self.assertEqual(index.get(record.source), record)
+            self.assertEqual(list(index)[0].front_matter, {"tags": "a, b", "draft": "yes"})
+            index.close()
+
+    def test_budget_requires_spill_path(self):
+        with self.assertRaises(ValueError):
+            PageIndex(max_memory_bytes=1024)
+
+    def test_manifest_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = manifest_path(tmp)
+            index = PageIndex()
+            for i in range(5):
+                index.add(make_record(i))
+            index.write_manifest(path)
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["manifest.jsonl"])
+            loaded = PageIndex.load_manifest(path)
+            self.assertEqual(list(loaded), list(index))
+
+
+if __name__ == "__main__":
+    unittest.main()
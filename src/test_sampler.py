@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from sampler import SWITCH_INTERVAL, SamplingProfiler, worker_profiler
+
+
+def busy_leaf(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(100))
+
+
+def busy_root(stop: threading.Event) -> None:
+    busy_leaf(stop)
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_samples_other_threads(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=busy_root, args=(stop,))
+        thread.start()
+        try:
+            profiler = SamplingProfiler()
+            for _ in range(5):
+                profiler.sample()
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(profiler.samples, 5)
+        stacks = [stack for stack in profiler.counts if "busy_root (test_sampler.py)" in stack]
+        self.assertTrue(stacks)
+        self.assertTrue(all(stack.split(";")[-1] == "busy_leaf (test_sampler.py)" for stack in stacks))
+        self.assertFalse(any("SamplingProfiler.sample" in stack for stack in profiler.counts))
+
+    def test_background_thread(self):
+        previous = sys.getswitchinterval()
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        self.assertEqual(sys.getswitchinterval(), min(previous, SWITCH_INTERVAL))
+        deadline = time.monotonic() + 5
+        while profiler.samples < 3 and time.monotonic() < deadline:
+            sum(range(10000))
+        profiler.stop()
+        self.assertGreaterEqual(profiler.samples, 3)
+        self.assertEqual(sys.getswitchinterval(), previous)
+        self.assertTrue(any("test_background_thread" in stack for stack in profiler.counts))
+
+    def test_collapsed_output(self):
+        profiler = SamplingProfiler()
+        profiler.merge({"main (a.py);parse (b.py)": 3, "main (a.py)": 1})
+        profiler.merge({"main (a.py)": 1})
+        self.assertEqual(profiler.collapsed(), "main (a.py) 2\nmain (a.py);parse (b.py) 3\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.txt")
+            profiler.write(path)
+            with open(path) as profile_file:
+                self.assertEqual(profile_file.read(), profiler.collapsed())
+        self.assertEqual(profiler.drain(), {"main (a.py);parse (b.py)": 3, "main (a.py)": 2})
+        self.assertEqual(profiler.drain(), {})
+
+    def test_worker_profiler_is_reused(self):
+        profiler = worker_profiler(0.05)
+        try:
+            self.assertIs(worker_profiler(0.05), profiler)
+        finally:
+            profiler.stop()
+        with self.assertRaises(ValueError):
+            SamplingProfiler(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
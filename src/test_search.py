@@ -0,0 +1,145 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from collections import Counter
+from markdown_blocks import markdown_to_flat_document
+from pageindex import PageRecord
+from search import (CLIENT_SCRIPT, INDEX_NAME, SEARCH_DIR_NAME, SearchIndex, count_terms, document_terms,
+                    search_outputs, shard_name, term_shard)
+
+
+def record(source, source_hash, terms=None):
+    page = PageRecord(source, source.replace(".md", ".html"), source.upper(), source_hash, 0, 0)
+    page.terms = terms
+    return page
+
+
+class TestTerms(unittest.TestCase):
+
+    def test_count_terms(self):
+        counts = Counter()
+        count_terms("Über the_x, a über 42 ÜBER " + "y" * 41, counts)
+        self.assertEqual(counts, {"über": 3, "the_x": 1, "42": 1})
+
+    def test_document_terms_reads_text_leaves(self):
+        doc = markdown_to_flat_document("# Title\n\nSome **bold** [link](/href) text.\n\n```\ncode code\n```")
+        self.assertEqual(document_terms(doc), {"title": 1, "some": 1, "bold": 1, "link": 1,
+                                               "text": 1, "code": 2})
+
+    def test_term_shard(self):
+        # 32-bit FNV-1a of the UTF-8 bytes, as computed by the client script
+        self.assertEqual(term_shard("a", 2**32), 0xe40c292c)
+        self.assertEqual(term_shard("foobar", 2**32), 0xbf9cf968)
+        self.assertEqual(shard_name(term_shard("foobar", 64)), "terms-28.json")
+
+
+class TestClientScript(unittest.TestCase):
+
+    def test_template_is_filled(self):
+        self.assertIn("(fnv1a(term) % shards)", CLIENT_SCRIPT)
+        self.assertIn("term.length >= 2 && term.length <= 40", CLIENT_SCRIPT)
+        self.assertNotIn("%(", CLIENT_SCRIPT)
+
+    @unittest.skipIf(shutil.which("node") is None, "node is not installed")
+    def test_syntax(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "search.js")
+            with open(path, "w", encoding="utf-8") as script_file:
+                script_file.write(CLIENT_SCRIPT)
+            result = subprocess.run(["node", "--check", path], capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.output = os.path.join(self.tmp.name, "out")
+        os.makedirs(self.content)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self, name):
+        with open(os.path.join(self.output, SEARCH_DIR_NAME, name), encoding="utf-8") as index_file:
+            return json.load(index_file)
+
+    def postings(self, term, shards=4):
+        return self.load(shard_name(term_shard(term, shards))).get(term)
+
+    def test_write_and_incremental_update(self):
+        index = SearchIndex(self.output, self.content, shards=4)
+        index.add(record("a.md", "h1", {"alpha": 2, "common": 1}))
+        index.add(record("b.md", "h2", {"beta": 1, "common": 3}))
+        self.assertEqual(index.write([("/", self.output)]), (6, 0))
+        self.assertEqual(self.load(INDEX_NAME)["pages"], [["/a.html", "A.MD"], ["/b.html", "B.MD"]])
+        self.assertEqual(self.postings("common"), [0, 1, 1, 3])
+        self.assertEqual(search_outputs(self.output),
+                         {f"{SEARCH_DIR_NAME}/{name}" for name in
+                          [INDEX_NAME, "search.js"] + [shard_name(shard) for shard in range(4)]})
+
+        # Unchanged pages without terms keep theirs; only the shards of changed terms are rewritten
+        index = SearchIndex(self.output, self.content, shards=4)
+        index.add(record("a.md", "h1"))
+        index.add(record("b.md", "h3", {"beta": 1, "common": 3, "gamma": 1}))
+        written, unchanged = index.write([("/", self.output)])
+        self.assertEqual((index.reparsed, written + unchanged), (0, 6))
+        self.assertEqual(written, 1)
+        self.assertEqual(self.postings("alpha"), [0, 2])
+        self.assertEqual(self.postings("gamma"), [1, 1])
+
+    def test_removed_and_reparsed_pages(self):
+        index = SearchIndex(self.output, self.content, shards=4)
+        for name in ("a.md", "b.md", "c.md"):
+            index.add(record(name, name, {"word": 1}))
+        index.write([("/", self.output)])
+
+        # Ids stay stable while few pages are removed; a changed page without terms is parsed
+        with open(os.path.join(self.content, "c.md"), "w") as md_file:
+            md_file.write("---\ntitle: Meta\n---\n# Fresh word\n")
+        index = SearchIndex(self.output, self.content, shards=4)
+        index.add(record("c.md", "changed"))
+        index.add(record("b.md", "b.md"))
+        index.write([("/", self.output)])
+        self.assertEqual(index.reparsed, 1)
+        self.assertEqual(self.load(INDEX_NAME)["pages"], [None, ["/b.html", "B.MD"], ["/c.html", "C.MD"]])
+        self.assertEqual(self.postings("word"), [1, 1, 2, 1])
+        self.assertIsNone(self.postings("meta"))
+
+        # Ids are compacted once most of them are holes
+        index = SearchIndex(self.output, self.content, shards=4)
+        index.add(record("c.md", "changed"))
+        index.write([("/", self.output)])
+        self.assertEqual(self.load(INDEX_NAME)["pages"], [["/c.html", "C.MD"]])
+        self.assertEqual(self.postings("fresh"), [0, 1])
+
+    def test_page_urls_include_the_basepath(self):
+        mirror = os.path.join(self.tmp.name, "mirror")
+        index = SearchIndex(self.output, self.content, shards=4)
+        index.add(record("blog/a.md", "h1", {"alpha": 1}))
+        self.assertEqual(index.write([("/", self.output), ("/Site/", mirror)]), (6, 0))
+        with open(os.path.join(mirror, SEARCH_DIR_NAME, INDEX_NAME), encoding="utf-8") as index_file:
+            self.assertEqual(json.load(index_file)["pages"], [["/Site/blog/a.html", "BLOG/A.MD"]])
+        self.assertEqual(self.load(INDEX_NAME)["pages"], [["/blog/a.html", "BLOG/A.MD"]])
+
+        # Each target compares with the files last written for its basepath
+        index = SearchIndex(self.output, self.content, shards=4)
+        index.add(record("blog/a.md", "h1"))
+        self.assertEqual(index.write([("/Site/", mirror), ("/", self.output)]), (0, 6))
+
+    def test_shard_count_change_rebuilds(self):
+        index = SearchIndex(self.output, self.content, shards=4)
+        index.add(record("a.md", "h1", {"alpha": 1}))
+        index.write([("/", self.output)])
+        index = SearchIndex(self.output, self.content, shards=2)
+        index.add(record("a.md", "h1", {"alpha": 1}))
+        self.assertEqual(index.write([("/", self.output)]), (4, 0))
+        self.assertEqual(len(search_outputs(self.output)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,317 @@
+import gzip
+import hashlib
+import http.client
+import io
+import os
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+import main
+from livereload import RELOAD_PATH, load_changes, publish_changes
+from server import FileCache, PreviewServer, accepts_gzip, etag_matches, parse_range
+
+
+class TestHeaderParsing(unittest.TestCase):
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=990-2000", 1000), (990, 999))
+        self.assertEqual(parse_range("bytes=-5000", 1000), (0, 999))
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 1000))
+        self.assertIsNone(parse_range("items=0-1", 1000))
+        self.assertIsNone(parse_range("bytes=a-b", 1000))
+        for header in ("bytes=1000-", "bytes=5-4", "bytes=-0"):
+            with self.assertRaises(ValueError):
+                parse_range(header, 1000)
+
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip("gzip, deflate, br"))
+        self.assertTrue(accepts_gzip("br;q=1.0, gzip;q=0.8"))
+        self.assertTrue(accepts_gzip("*"))
+        self.assertFalse(accepts_gzip("gzip;q=0"))
+        self.assertFalse(accepts_gzip("br"))
+        self.assertFalse(accepts_gzip(None))
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"x", W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches('*', '"abc"'))
+        self.assertFalse(etag_matches('"abcd"', '"abc"'))
+
+
+class TestFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as output_file:
+            output_file.write(data)
+        return path
+
+    def test_reuses_open_files_until_replaced(self):
+        cache = FileCache(2)
+        path = self.write("a", b"first")
+        opened = cache.acquire(path)
+        cache.release(opened)
+        again = cache.acquire(path)
+        self.assertIs(again, opened)
+        cache.release(again)
+
+        tmp_path = self.write("a.tmp", b"second!")
+        os.replace(tmp_path, path)
+        replaced = cache.acquire(path)
+        self.assertIsNot(replaced, opened)
+        self.assertEqual(replaced.read(0, 100), b"second!")
+        cache.release(replaced)
+        cache.close()
+
+    def test_evicted_file_stays_readable_until_released(self):
+        cache = FileCache(1)
+        first = cache.acquire(self.write("a", b"aaa"))
+        second = cache.acquire(self.write("b", b"bbb"))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(first.read(1, 2), b"aa")
+        cache.release(first)
+        with self.assertRaises(OSError):
+            os.fstat(first.fd)
+        cache.release(second)
+        cache.close()
+
+    def test_rejects_directories(self):
+        with self.assertRaises(OSError):
+            FileCache().acquire(self.tmp.name)
+
+
+class TestPreviewServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        content = os.path.join(root, "content")
+        static = os.path.join(root, "static")
+        template = os.path.join(root, "template.html")
+        self.output = os.path.join(root, "docs")
+        os.makedirs(os.path.join(content, "blog"))
+        with open(os.path.join(content, "index.md"), "w") as md_file:
+            md_file.write("# Home\n\n" + "Welcome to the [blog](/blog/).\n\n" * 40)
+        with open(os.path.join(content, "blog", "index.md"), "w") as md_file:
+            md_file.write("# Blog\n\nShort.\n")
+        os.makedirs(static)
+        with open(os.path.join(static, "index.css"), "w") as css_file:
+            css_file.write("body { margin: 0; }\n")
+        with open(template, "w") as template_file:
+            template_file.write('<title>{{ Title }}</title><link href="/index.css">{{ Content }}')
+        with redirect_stdout(io.StringIO()):
+            main.main(["/Site/", "--content", content, "--static", static, "--template", template,
+                       "--output", self.output, "--fingerprint-assets", "--gzip"])
+
+        self.server = PreviewServer(("127.0.0.1", 0), self.output, "/Site/", quiet=True)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmp.cleanup()
+
+    def connect(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+        self.addCleanup(connection.close)
+        return connection
+
+    def request(self, path, method="GET", headers=None, connection=None):
+        connection = connection or self.connect()
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+
+    def read_output(self, path):
+        with open(os.path.join(self.output, path), "rb") as output_file:
+            return output_file.read()
+
+    def test_etag_comes_from_the_manifest(self):
+        page = self.read_output("index.html")
+        response, body = self.request("/Site/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, page)
+        self.assertEqual(response.getheader("ETag"), f'"{hashlib.sha256(page).hexdigest()[:20]}"')
+        self.assertEqual(response.getheader("Content-Type"), "text/html; charset=utf-8")
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+
+        response, body = self.request("/Site/", headers={"If-None-Match": response.getheader("ETag")})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+
+    def test_modified_file_falls_back_to_a_weak_etag(self):
+        with open(os.path.join(self.output, "index.html"), "ab") as page_file:
+            page_file.write(b"<!-- edited -->")
+        response, body = self.request("/Site/index.html", headers={"Accept-Encoding": "gzip"})
+        self.assertTrue(response.getheader("ETag").startswith('W/"'))
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertTrue(body.endswith(b"<!-- edited -->"))
+
+    def test_serves_gzip_sidecar(self):
+        page = self.read_output("index.html")
+        response, body = self.request("/Site/index.html", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertTrue(response.getheader("ETag").endswith('-gz"'))
+        self.assertEqual(gzip.decompress(body), page)
+
+        response, body = self.request("/Site/index.html", headers={"Accept-Encoding": "gzip;q=0"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(body, page)
+
+    def test_range_requests(self):
+        page = self.read_output("index.html")
+        response, body = self.request("/Site/index.html",
+                                      headers={"Range": "bytes=10-19", "Accept-Encoding": "gzip"})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, page[10:20])
+        self.assertEqual(response.getheader("Content-Range"), f"bytes 10-19/{len(page)}")
+        self.assertIsNone(response.getheader("Content-Encoding"))
+
+        response, _ = self.request("/Site/index.html", headers={"Range": f"bytes={len(page)}-"})
+        self.assertEqual(response.status, 416)
+
+        response, body = self.request("/Site/index.html",
+                                      headers={"Range": "bytes=0-0", "If-Range": '"stale"'})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, page)
+
+    def test_fingerprinted_assets_are_immutable(self):
+        css = next(name for name in os.listdir(self.output) if name.endswith(".css"))
+        self.assertNotEqual(css, "index.css")
+        response, body = self.request(f"/Site/{css}")
+        self.assertEqual(body, b"body { margin: 0; }\n")
+        self.assertIn("immutable", response.getheader("Cache-Control"))
+        self.assertEqual(response.getheader("Content-Type"), "text/css; charset=utf-8")
+
+    def test_redirects_and_not_found(self):
+        response, _ = self.request("/Site/blog")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/Site/blog/")
+        response, _ = self.request("/Site")
+        self.assertEqual(response.getheader("Location"), "/Site/")
+        for path in ("/Site/missing.html", "/Site/.ssg/manifest.jsonl", "/Site/../docs/index.html",
+                     "/Site/%2e%2e/content/index.md", "/index.html"):
+            response, _ = self.request(path)
+            self.assertEqual(response.status, 404, path)
+
+    def test_head_and_keep_alive(self):
+        connection = self.connect()
+        response, body = self.request("/Site/", method="HEAD", connection=connection)
+        self.assertEqual(body, b"")
+        self.assertEqual(int(response.getheader("Content-Length")), len(self.read_output("index.html")))
+        for _ in range(3):
+            response, body = self.request("/Site/blog/", connection=connection)
+            self.assertEqual(body, self.read_output("blog/index.html"))
+
+    def test_concurrent_clients(self):
+        expected = {"/Site/": self.read_output("index.html"),
+                    "/Site/blog/": self.read_output("blog/index.html")}
+        failures = []
+
+        def client():
+            connection = self.connect()
+            try:
+                for i in range(20):
+                    path = list(expected)[i % 2]
+                    response, body = self.request(path, connection=connection)
+                    if response.status != 200 or body != expected[path]:
+                        failures.append((path, response.status))
+            except OSError as exc:
+                failures.append(exc)
+
+        # Each client holds its keep-alive connection open; none must wait for another
+        clients = [threading.Thread(target=client) for _ in range(16)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        self.assertEqual(failures, [])
+
+
+class TestLiveReload(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = self.tmp.name
+        os.makedirs(os.path.join(self.output, "blog"))
+        for path in ("index.html", "blog/index.html"):
+            with open(os.path.join(self.output, path), "w") as page_file:
+                page_file.write("<html><body><p>page</p></body></html>")
+        publish_changes(self.output, None, {})
+        self.server = PreviewServer(("127.0.0.1", 0), self.output, quiet=True, live_reload=True)
+        self.server.feed.interval = 0.01
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmp.cleanup()
+
+    def get(self, path):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+        self.addCleanup(connection.close)
+        connection.request("GET", path)
+        return connection.getresponse()
+
+    def read_event(self, response):
+        """Returns: the lines of the next event on a server-sent events stream."""
+        lines = []
+        while True:
+            line = response.fp.readline()
+            if not line:
+                self.fail(f"Stream closed after {lines}")
+            if line == b"\n" and lines:
+                return lines
+            if line != b"\n":
+                lines.append(line.decode().rstrip("\n"))
+
+    def test_client_is_injected_at_serve_time(self):
+        response = self.get("/")
+        body = response.read()
+        self.assertIn(f'EventSource("{RELOAD_PATH}?page=index.html&since=1")'.encode(), body)
+        self.assertTrue(body.endswith(b"</script></body></html>"))
+        self.assertEqual(int(response.getheader("Content-Length")), len(body))
+        with open(os.path.join(self.output, "index.html"), "rb") as page_file:
+            self.assertNotIn(b"EventSource", page_file.read())
+
+    def test_only_changed_pages_reload(self):
+        index = self.get(f"{RELOAD_PATH}?page=index.html&since=1")
+        blog = self.get(f"{RELOAD_PATH}?page=blog/index.html&since=1")
+        self.assertEqual(index.getheader("Content-Type"), "text/event-stream")
+        self.assertEqual(self.read_event(index), ["retry: 1000"])
+        self.assertEqual(self.read_event(blog), ["retry: 1000"])
+
+        publish_changes(self.output, ["index.html"], {})
+        self.assertEqual(self.read_event(index), ["event: reload", "data: 2"])
+        publish_changes(self.output, ["blog/index.html"], {})
+        # The blog stream skipped build 2, which did not touch its page
+        self.assertEqual(self.read_event(blog), ["event: reload", "data: 3"])
+        self.assertEqual(load_changes(self.output)["sequence"], 3)
+
+    def test_stale_client_reloads_immediately(self):
+        publish_changes(self.output, ["index.html"], {})
+        self.server.feed.poll()
+        stream = self.get(f"{RELOAD_PATH}?page=index.html&since=1")
+        self.assertEqual(self.read_event(stream), ["retry: 1000"])
+        self.assertEqual(self.read_event(stream), ["event: reload", "data: 2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pageindex import PageIndex, manifest_path
+from shard import (ShardMergeError, merge_shards, parse_shard, select_shard,
+                   shard_of, write_shard_info)
+
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def read_tree(root: str) -> dict:
+    """Returns: {relative path: bytes} for every file under root, build state excluded."""
+    files = {}
+    for dirpath, dirs, names in os.walk(root):
+        dirs[:] = [name for name in dirs if name != ".ssg"]
+        for name in names:
+            path = os.path.join(dirpath, name)
+            with open(path, "rb") as file:
+                files[os.path.relpath(path, root)] = file.read()
+    return files
+
+
+class TestShardAssignment(unittest.TestCase):
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        self.assertEqual(parse_shard("1/1"), (1, 1))
+        for spec in ("0/4", "5/4", "1/0", "2", "a/b", "1/2/3"):
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_shard_of_is_stable(self):
+        # Fixed values: the partition must not depend on hash randomization or platform
+        self.assertEqual([shard_of(f"blog/post{i}/index.md", 4) for i in range(6)],
+                         [2, 4, 1, 2, 4, 3])
+        self.assertEqual(shard_of("index.md", 1), 1)
+        self.assertTrue(all(1 <= shard_of(f"p{i}.md", 3) <= 3 for i in range(100)))
+
+    def test_shards_partition_pages(self):
+        pages = [(os.path.join("content", f"p{i}.md"), os.path.join("docs", f"p{i}.html"))
+                 for i in range(50)]
+        slices = [select_shard(pages, "content", (k, 3)) for k in (1, 2, 3)]
+        self.assertEqual(sorted(page for part in slices for page in part), sorted(pages))
+        self.assertTrue(all(part for part in slices))
+
+
+class TestMergeShards(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.template = os.path.join(self.root, "template.html")
+        for i in range(12):
+            page_dir = os.path.join(self.content, "blog", f"post{i}")
+            os.makedirs(page_dir)
+            with open(os.path.join(page_dir, "index.md"), "w") as md_file:
+                md_file.write(f"# Post {i}\n\nBody of [post {i}](/blog/post{i}).\n")
+        with open(os.path.join(self.content, "index.md"), "w") as md_file:
+            md_file.write("# Home\n\nWelcome.\n")
+        os.makedirs(self.static)
+        with open(os.path.join(self.static, "index.css"), "w") as css_file:
+            css_file.write("body { margin: 0; }\n")
+        with open(self.template, "w") as template_file:
+            template_file.write("<title>{{ Title }}</title><link href=\"/index.css\">{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, output, *extra):
+        subprocess.run([sys.executable, MAIN, "/site/", "--content", self.content,
+                        "--static", self.static, "--template", self.template,
+                        "--output", output, *extra],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def test_sharded_build_matches_full_build(self):
+        full = os.path.join(self.root, "full")
+        self.build(full)
+        shard_dirs = [os.path.join(self.root, f"shard{k}") for k in (1, 2, 3)]
+        for k, shard_dir in enumerate(shard_dirs, start=1):
+            self.build(shard_dir, "--shard", f"{k}/3")
+        counts = [len(PageIndex.load_manifest(manifest_path(shard_dir))) for shard_dir in shard_dirs]
+        self.assertEqual(sum(counts), 13)
+        self.assertTrue(all(count < 13 for count in counts))
+
+        merged = os.path.join(self.root, "merged")
+        self.build(merged, "--merge-shards", *reversed(shard_dirs))
+        self.assertEqual(read_tree(merged), read_tree(full))
+        self.assertEqual(list(PageIndex.load_manifest(manifest_path(merged))),
+                         list(PageIndex.load_manifest(manifest_path(full))))
+
+    def test_merge_writes_search_index_listings_and_sitemap(self):
+        options = ("--search-index", "--listing", "blog", "--listing-size", "5",
+                   "--sitemap", "https://example.com", "--fingerprint-assets")
+        full = os.path.join(self.root, "full")
+        self.build(full, *options)
+        shard_dirs = [os.path.join(self.root, f"shard{k}") for k in (1, 2)]
+        for k, shard_dir in enumerate(shard_dirs, start=1):
+            self.build(shard_dir, "--shard", f"{k}/2", *options)
+            self.assertFalse(os.path.exists(os.path.join(shard_dir, "search")))
+            self.assertFalse(os.path.exists(os.path.join(shard_dir, "sitemap.xml")))
+
+        merged = os.path.join(self.root, "merged")
+        self.build(merged, "--merge-shards", *shard_dirs, *options)
+        self.assertIn(os.path.join("blog", "page", "2", "index.html"), read_tree(merged))
+        self.assertEqual(read_tree(merged), read_tree(full))
+
+    def test_merge_detects_missing_shard(self):
+        shard_dirs = [os.path.join(self.root, f"shard{k}") for k in (1, 2)]
+        for k, shard_dir in enumerate(shard_dirs, start=1):
+            self.build(shard_dir, "--shard", f"{k}/3")
+        with self.assertRaisesRegex(ShardMergeError, "exactly once"):
+            merge_shards(shard_dirs, os.path.join(self.root, "merged"))
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.build(os.path.join(self.root, "merged"), "--merge-shards", *shard_dirs)
+
+    def test_merge_detects_page_rendered_twice(self):
+        first, second = os.path.join(self.root, "a"), os.path.join(self.root, "b")
+        self.build(first, "--shard", "1/2")
+        self.build(second)
+        write_shard_info(second, (2, 2), 13)
+        with self.assertRaisesRegex(ShardMergeError, "more than one shard"):
+            merge_shards([first, second], os.path.join(self.root, "merged"))
+
+    def test_merge_detects_unrendered_page(self):
+        shard_dir = os.path.join(self.root, "shard1")
+        self.build(shard_dir, "--shard", "1/1")
+        with self.assertRaisesRegex(ShardMergeError, "not rendered by any shard: extra.md"):
+            merge_shards([shard_dir], os.path.join(self.root, "merged"),
+                         ["index.md", "extra.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from pageindex import PageRecord
+from sitegen import (SITEMAP_NAME, generated_outputs, listing_pages, modified_date, page_date,
+                     page_url, sitemap_files, write_generated)
+
+
+def post(name, date):
+    return PageRecord(f"blog/{name}.md", f"blog/{name}/index.html", name.title(), "", 0, 0,
+                      front_matter={"date": date})
+
+
+class TestListing(unittest.TestCase):
+
+    def test_urls_and_dates(self):
+        self.assertEqual([page_url(dest) for dest in ("index.html", "blog/a/index.html", "b.html")],
+                         ["/", "/blog/a/", "/b.html"])
+        record = PageRecord("a.md", "a.html", "A", "", 86400 * 10**9, 0)
+        self.assertEqual((modified_date(record), page_date(record)), ("1970-01-02", "1970-01-02"))
+        self.assertEqual(page_date(post("a", "2024-05-01")), "2024-05-01")
+
+    def test_pages_newest_first(self):
+        records = [post(f"p{i}", f"2024-01-0{i}") for i in range(1, 6)]
+        records.append(PageRecord("about.md", "about.html", "About", "", 0, 0))
+        pages = listing_pages("blog", records, size=2)
+        self.assertEqual([(path, title) for path, title, _ in pages],
+                         [("blog/page/1/index.html", "Blog, page 1"),
+                          ("blog/page/2/index.html", "Blog, page 2"), ("blog/index.html", "Blog")])
+        self.assertEqual(pages[1][2],
+                         '<div><h1>Blog, page 2</h1><ul>'
+                         '<li><a href="/blog/p4/">P4</a> <time datetime="2024-01-04">2024-01-04</time></li>'
+                         '<li><a href="/blog/p3/">P3</a> <time datetime="2024-01-03">2024-01-03</time></li>'
+                         '</ul><nav><a href="/blog/" rel="prev">Newer posts</a>'
+                         '<a href="/blog/page/1/" rel="next">Older posts</a></nav></div>')
+
+    def test_new_post_keeps_older_pages(self):
+        def changed(count):
+            records = [post(f"p{i}", f"2024-01-0{i}") for i in range(1, count + 2)]
+            before = {path: html for path, _, html in listing_pages("blog", records[:-1], size=2)}
+            after = {path: html for path, _, html in listing_pages("blog", records, size=2)}
+            return [path for path in after if before.get(path) != after[path]]
+
+        self.assertEqual(changed(5), ["blog/index.html"])
+        # A full newest page moves to page 3; page 2 then links to it instead of the index
+        self.assertEqual(changed(6), ["blog/page/2/index.html", "blog/page/3/index.html",
+                                      "blog/index.html"])
+        self.assertEqual(listing_pages("blog", [], size=2)[0][0], "blog/index.html")
+
+    def test_listing_over_content_page(self):
+        with self.assertRaises(ValueError):
+            listing_pages("blog", [PageRecord("blog/index.md", "blog/index.html", "B", "", 0, 0)])
+
+
+class TestSitemap(unittest.TestCase):
+
+    def test_urlset(self):
+        files = sitemap_files([("/b c/", ""), ("/", "2024-05-01")], "https://example.com/site/")
+        self.assertEqual(files[SITEMAP_NAME].decode(),
+                         '<?xml version="1.0" encoding="UTF-8"?>\n'
+                         '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+                         '<url><loc>https://example.com/site/</loc><lastmod>2024-05-01</lastmod></url>\n'
+                         '<url><loc>https://example.com/site/b%20c/</loc></url>\n'
+                         '</urlset>\n')
+
+    def test_sitemap_index(self):
+        with mock.patch("sitegen.SITEMAP_MAX_URLS", 2):
+            files = sitemap_files([(f"/{i}", "") for i in range(5)], "https://example.com")
+        self.assertEqual(sorted(files), ["sitemap-1.xml", "sitemap-2.xml", "sitemap-3.xml", SITEMAP_NAME])
+        self.assertIn(b"<sitemapindex", files[SITEMAP_NAME])
+        self.assertIn(b"<sitemap><loc>https://example.com/sitemap-3.xml</loc></sitemap>", files[SITEMAP_NAME])
+
+
+class TestWriteGenerated(unittest.TestCase):
+
+    def test_writes_only_changed_files(self):
+        with tempfile.TemporaryDirectory() as output:
+            files = {"sitemap.xml": b"map", "blog/index.html": b"new", "blog/page/1/index.html": b"old"}
+            self.assertEqual(write_generated(output, files), (sorted(files), sorted(files)))
+            mtime = os.stat(os.path.join(output, "blog/page/1/index.html")).st_mtime_ns
+
+            files.update({"blog/index.html": b"newer"})
+            self.assertEqual(write_generated(output, files), (["blog/index.html"], ["blog/index.html"]))
+            self.assertEqual(os.stat(os.path.join(output, "blog/page/1/index.html")).st_mtime_ns, mtime)
+
+            # Missing files are rewritten without being reported as changed
+            os.remove(os.path.join(output, "sitemap.xml"))
+            self.assertEqual(write_generated(output, files), (["sitemap.xml"], []))
+
+            del files["sitemap.xml"]
+            self.assertEqual(write_generated(output, files), ([], ["sitemap.xml"]))
+            self.assertFalse(os.path.exists(os.path.join(output, "sitemap.xml")))
+            self.assertEqual(generated_outputs(output), {"blog/index.html", "blog/page/1/index.html"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+from subset import (invalidate_deps, load_deps, plan_subset, read_path_list, relative_to,
+                    sync_static_changes, write_deps)
+
+
+class TestPlanSubset(unittest.TestCase):
+
+    def test_only_glob(self):
+        previous = {"index.md", "blog/a/index.md", "blog/gone/index.md"}
+        existing = {"index.md", "blog/a/index.md", "blog/new/index.md"}
+        plan = plan_subset(previous, existing, "content", only="blog/*")
+        self.assertEqual((plan.render, plan.removed),
+                         ({"blog/a/index.md", "blog/new/index.md"}, {"blog/gone/index.md"}))
+        self.assertEqual(plan.selected, {"blog/a/index.md", "blog/new/index.md", "blog/gone/index.md"})
+
+    def test_changed_paths(self):
+        changed = ["content/blog/a/index.md", os.path.abspath("content/gone.md"), "content/never.md",
+                   "content/images/x.png", "static/index.css", "README.md"]
+        plan = plan_subset({"blog/a/index.md", "gone.md"}, {"blog/a/index.md"}, "content", changed=changed)
+        self.assertEqual((plan.render, plan.removed), ({"blog/a/index.md"}, {"gone.md"}))
+
+    def test_relative_to(self):
+        self.assertEqual(relative_to("content/a/b.md", "content"), "a/b.md")
+        self.assertIsNone(relative_to("contents/a.md", "content"))
+        self.assertIsNone(relative_to("content/../a.md", "content"))
+
+    def test_read_path_list(self):
+        with mock.patch("sys.stdin", io.StringIO("a.md\n\n  b.md \n")):
+            self.assertEqual(read_path_list("-"), ["a.md", "b.md"])
+
+
+class TestState(unittest.TestCase):
+
+    def test_deps_round_trip(self):
+        with tempfile.TemporaryDirectory() as output:
+            self.assertIsNone(load_deps(output))
+            write_deps(output, {"options": {"minify": True}})
+            self.assertEqual(load_deps(output), {"options": {"minify": True}})
+            invalidate_deps(output)
+            invalidate_deps(output)
+            self.assertIsNone(load_deps(output))
+
+    def test_sync_static_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            static, output = os.path.join(tmp, "static"), os.path.join(tmp, "out")
+            os.makedirs(os.path.join(static, "images"))
+            os.makedirs(output)
+            with open(os.path.join(static, "images", "a.png"), "wb") as image_file:
+                image_file.write(b"PNG")
+            with open(os.path.join(output, "gone.css"), "w") as css_file:
+                css_file.write("x")
+            self.assertEqual(sync_static_changes(static, output, ["images/a.png", "gone.css"]), 3)
+            self.assertEqual(sorted(os.listdir(output)), ["images"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from tracing import CATEGORY_PAGE, Tracer, current_tracer, install_tracer, span
+
+
+class TestTracer(unittest.TestCase):
+
+    def test_spans_are_complete_events(self):
+        tracer = Tracer()
+        with install_tracer(tracer):
+            with span("outer"):
+                with span("inner", CATEGORY_PAGE, page="a.md"):
+                    pass
+        inner, outer = tracer.events
+        self.assertEqual((outer["name"], outer["cat"], outer["ph"]), ("outer", "build", "X"))
+        self.assertEqual(inner["args"], {"page": "a.md"})
+        self.assertNotIn("args", outer)
+        self.assertEqual((inner["pid"], inner["tid"]), (os.getpid(), threading.get_native_id()))
+        self.assertLessEqual(outer["ts"], inner["ts"])
+        self.assertLessEqual(inner["ts"] + inner["dur"], outer["ts"] + outer["dur"])
+
+    def test_disabled_without_a_tracer(self):
+        self.assertIsNone(current_tracer())
+        tracer = Tracer()
+        with install_tracer(tracer):
+            with install_tracer(None):
+                with span("ignored"):
+                    pass
+            self.assertIs(current_tracer(), tracer)
+        self.assertEqual(tracer.events, [])
+        self.assertIsNone(current_tracer())
+
+    def test_span_records_on_error(self):
+        tracer = Tracer()
+        with install_tracer(tracer), self.assertRaises(ValueError):
+            with span("failing"):
+                raise ValueError
+        self.assertEqual([event["name"] for event in tracer.events], ["failing"])
+
+    def test_write_merges_and_names_processes(self):
+        tracer = Tracer()
+        worker = {"name": "page", "cat": "page", "ph": "X", "ts": 1, "dur": 5, "pid": 4242, "tid": 7}
+        with install_tracer(tracer), span("pages"):
+            pass
+        tracer.extend([worker])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            tracer.write(path)
+            with open(path) as trace_file:
+                trace = json.load(trace_file)
+        events = trace["traceEvents"]
+        self.assertEqual({event["args"]["name"] for event in events if event["ph"] == "M"},
+                         {"build", "worker 4242"})
+        self.assertEqual([event["name"] for event in events if event["ph"] == "X"], ["page", "pages"])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+    def test_forked_child_stops_recording(self):
+        tracer = Tracer()
+        read_fd, write_fd = os.pipe()
+        with install_tracer(tracer):
+            pid = os.fork()
+            if pid == 0:
+                os.write(write_fd, b"1" if current_tracer() is None else b"0")
+                os._exit(0)
+            os.waitpid(pid, 0)
+        self.assertEqual(os.read(read_fd, 1), b"1")
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import pickle
+import time
+import unittest
+from watchdog import PageLimits, PageLimitExceeded, POLICY_STUB, error_stub
+
+
+class TestPageLimits(unittest.TestCase):
+
+    def test_no_limits_by_default(self):
+        limits = PageLimits()
+        limits.check_source("a.md", 10**12)
+        limits.check_output("a.md", 10**12, 1.0)
+        limits.check_elapsed("a.md", 10**6)
+        with limits.deadline("a.md"):
+            pass
+
+    def test_source_limit(self):
+        limits = PageLimits(max_source_bytes=100)
+        limits.check_source("a.md", 100)
+        with self.assertRaises(PageLimitExceeded) as context:
+            limits.check_source("a.md", 101)
+        self.assertEqual(context.exception.limit, "source size")
+        self.assertIn("a.md", str(context.exception))
+
+    def test_output_limit(self):
+        with self.assertRaises(PageLimitExceeded) as context:
+            PageLimits(max_output_bytes=10).check_output("a.md", 11, 0.5)
+        self.assertEqual(context.exception.elapsed, 0.5)
+
+    def test_elapsed_limit(self):
+        with self.assertRaises(PageLimitExceeded):
+            PageLimits(max_render_seconds=1.0).check_elapsed("a.md", 1.5)
+
+    def test_deadline_interrupts_long_render(self):
+        limits = PageLimits(max_render_seconds=0.05)
+        start = time.perf_counter()
+        with self.assertRaises(PageLimitExceeded) as context:
+            with limits.deadline("slow.md"):
+                while time.perf_counter() - start < 5:
+                    pass
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual(context.exception.path, "slow.md")
+        self.assertEqual(context.exception.limit, "render time")
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            PageLimits(policy="ignore")
+
+    def test_exception_pickles(self):
+        exc = PageLimitExceeded("a.md", "render time", 2.0, "2.00s > 1s")
+        copy = pickle.loads(pickle.dumps(exc))
+        self.assertEqual(str(copy), str(exc))
+        self.assertEqual(copy.path, "a.md")
+
+    def test_error_stub(self):
+        stub = error_stub(PageLimitExceeded("a.md", "output <size>", 0.1, "x"))
+        self.assertIn("<title>Page unavailable</title>", stub)
+        self.assertIn("output &lt;size&gt; limit", stub)
+        self.assertEqual(PageLimits(policy=POLICY_STUB).policy, "stub")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import gc
+import os
+import sys
+import time
+import unittest
+from metrics import peak_rss_bytes
+from workers import (WorkerPool, STATUS_OK, STATUS_ERROR, STATUS_TIMEOUT, STATUS_CRASHED,
+                     default_start_method)
+
+
+def job(kind: str, value: int) -> int:
+    if kind == "sleep":
+        time.sleep(value)
+    elif kind == "raise":
+        raise ValueError(f"bad {value}")
+    elif kind == "exit":
+        os._exit(value)
+    return value * 2
+
+
+def worker_state(module: str, value: int) -> tuple:
+    return os.getpid(), gc.get_freeze_count() > 0, module in sys.modules
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def run_pool(self, tasks, processes=2, task_timeout=None):
+        with WorkerPool(job, processes, task_timeout) as pool:
+            results = {task: (status, value) for task, status, value, _ in pool.run(tasks)}
+            return results, pool.restarts
+
+    def test_runs_all_tasks(self):
+        tasks = [("double", i) for i in range(10)]
+        results, restarts = self.run_pool(tasks)
+        self.assertEqual(results, {task: (STATUS_OK, task[1] * 2) for task in tasks})
+        self.assertEqual(restarts, 0)
+
+    def test_workers_report_peak_rss(self):
+        with WorkerPool(job, 2) as pool:
+            list(pool.run([("double", i) for i in range(4)]))
+            if peak_rss_bytes() is not None:
+                self.assertGreater(pool.peak_rss, 0)
+
+    def test_error_is_returned(self):
+        results, _ = self.run_pool([("raise", 1), ("double", 2)])
+        status, value = results[("raise", 1)]
+        self.assertEqual(status, STATUS_ERROR)
+        self.assertIsInstance(value, ValueError)
+        self.assertEqual(results[("double", 2)], (STATUS_OK, 4))
+
+    def test_overdue_worker_is_killed_and_replaced(self):
+        tasks = [("sleep", 30), ("double", 1), ("double", 2), ("double", 3)]
+        start = time.monotonic()
+        results, restarts = self.run_pool(tasks, processes=1, task_timeout=0.3)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(results[("sleep", 30)], (STATUS_TIMEOUT, None))
+        self.assertEqual(results[("double", 3)], (STATUS_OK, 6))
+        self.assertEqual(restarts, 1)
+
+    def test_crashed_worker_is_replaced(self):
+        results, restarts = self.run_pool([("exit", 3), ("double", 5)], processes=1)
+        self.assertEqual(results[("exit", 3)], (STATUS_CRASHED, 3))
+        self.assertEqual(results[("double", 5)], (STATUS_OK, 10))
+        self.assertEqual(restarts, 1)
+
+    def test_reused_across_runs_and_jobs(self):
+        pool = WorkerPool(job, 2, preload=["colorsys"], start_method="fork")
+        pool.start()
+        try:
+            first = {value[0] for _, _, value, _ in pool.run([("colorsys", i) for i in range(4)],
+                                                             worker_state)}
+            self.assertEqual([value for _, _, value, _ in pool.run([("double", 4)], job)], [8])
+            results = [value for _, _, value, _ in pool.run([("colorsys", 0)], worker_state)]
+            self.assertLessEqual({results[0][0]}, first)  # Same workers, no restart
+            self.assertEqual(results[0][1:], (True, True))  # GC-frozen, preloaded module
+            self.assertEqual(pool.restarts, 0)
+        finally:
+            pool.close()
+
+    def test_abandoned_run_replaces_busy_workers(self):
+        with WorkerPool(job, 2) as pool:
+            results = pool.run([("double", 1), ("sleep", 30)])
+            self.assertEqual(next(results)[1:3], (STATUS_OK, 2))
+            start = time.monotonic()
+            results.close()
+            self.assertEqual(pool.restarts, 1)
+            self.assertEqual([value for _, _, value, _ in pool.run([("double", 3)])], [6])
+            self.assertLess(time.monotonic() - start, 10)
+
+    def test_default_start_method(self):
+        self.assertIn(default_start_method(), (None, "fork", "forkserver"))
+
+    def test_requires_context_manager(self):
+        with self.assertRaises(RuntimeError):
+            list(WorkerPool(job, 1).run([("double", 1)]))
+        with self.assertRaises(ValueError):
+            WorkerPool(job, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
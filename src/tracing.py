@@ -0,0 +1,104 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+# Category of the spans of build phases and of page stages
+CATEGORY_BUILD = "build"
+CATEGORY_PAGE = "page"
+
+# Returned by span() while no tracer is installed, so disabled tracing costs one call
+_NO_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    """Records spans as Chrome trace events ("X" complete events), viewable in Perfetto
+        or chrome://tracing. Timestamps come from the system-wide monotonic clock, so the
+        events of worker processes merge into one timeline with those of the build.
+        Args:
+            Optional[events] - Events recorded so far
+    """
+
+    def __init__(self, events: Optional[List[Dict[str, Any]]] = None) -> None:
+        self.events = events if events is not None else []
+        self.pid = os.getpid()
+
+    def __repr__(self) -> str:
+        return f"Tracer(pid={self.pid}, events={len(self.events)})"
+
+    @contextmanager
+    def span(self, name: str, category: str = CATEGORY_BUILD, **args: Any) -> Iterator[None]:
+        """Records the wall time of the block as an event of this process and thread."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            event = {"name": name, "cat": category, "ph": "X", "ts": start // 1000,
+                     "dur": (end - start) // 1000, "pid": os.getpid(),
+                     "tid": threading.get_native_id()}
+            if args:
+                event["args"] = args
+            self.events.append(event)
+
+    def extend(self, events: Iterable[Dict[str, Any]]) -> None:
+        """Adds events recorded elsewhere, e.g. by a worker process."""
+        self.events.extend(events)
+
+    def to_json(self) -> Dict[str, Any]:
+        """Returns: the trace in the Chrome JSON object format, events in time order
+           and every process named (the build, or a worker)."""
+        pids = sorted({event["pid"] for event in self.events} | {self.pid})
+        names = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                  "args": {"name": "build" if pid == self.pid else f"worker {pid}"}}
+                 for pid in pids]
+        return {"traceEvents": names + sorted(self.events, key=lambda event: event["ts"]),
+                "displayTimeUnit": "ms"}
+
+    def write(self, path: str) -> None:
+        """Atomically writes the trace to path."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as trace_file:
+            json.dump(self.to_json(), trace_file, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+
+# Tracer spans are recorded into, if any
+_tracer: Optional[Tracer] = None
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+@contextmanager
+def install_tracer(tracer: Optional[Tracer]) -> Iterator[Optional[Tracer]]:
+    """Records the spans of the block into tracer (none if it is None)."""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    try:
+        yield tracer
+    finally:
+        _tracer = previous
+
+
+def span(name: str, category: str = CATEGORY_BUILD, **args: Any) -> contextlib.AbstractContextManager:
+    """Returns: a context manager recording the block into the installed tracer, if any."""
+    tracer = _tracer
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.span(name, category, **args)
+
+
+def _reset_after_fork() -> None:
+    # A forked worker must not keep recording into its copy of the parent's tracer
+    global _tracer
+    _tracer = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
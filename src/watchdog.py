@@ -0,0 +1,109 @@
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from htmlnode import html_escape
+
+
+# What to do with a page that exceeds a limit
+POLICY_SKIP = "skip"    # write nothing for the page
+POLICY_STUB = "stub"    # write an error stub instead of the page
+POLICY_FAIL = "fail"    # fail the build
+POLICIES = (POLICY_SKIP, POLICY_STUB, POLICY_FAIL)
+
+
+class PageLimitExceeded(Exception):
+    """Raised when a page goes over one of its PageLimits.
+        Args:
+            path - Markdown source path of the page
+            limit - Name of the exceeded limit (e.g. "render time")
+            elapsed - Seconds spent on the page when the limit was hit
+            detail - Human readable measurement and limit
+    """
+
+    def __init__(self, path: str, limit: str, elapsed: float, detail: str) -> None:
+        super().__init__(path, limit, elapsed, detail)
+        self.path = path
+        self.limit = limit
+        self.elapsed = elapsed
+        self.detail = detail
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.limit} limit exceeded ({self.detail}) after {self.elapsed:.2f}s"
+
+
+class PageLimits:
+    """Per-page budgets enforced while generating pages; None disables a limit.
+        Args:
+            Optional[max_source_bytes] - Largest markdown source accepted
+            Optional[max_render_seconds] - Longest wall time to generate one page
+            Optional[max_output_bytes] - Largest generated page accepted
+            Optional[policy] - One of POLICIES, applied to pages over a limit
+    """
+
+    def __init__(self, max_source_bytes: Optional[int] = None,
+                 max_render_seconds: Optional[float] = None,
+                 max_output_bytes: Optional[int] = None,
+                 policy: str = POLICY_FAIL) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown limit policy: {policy}")
+        self.max_source_bytes = max_source_bytes
+        self.max_render_seconds = max_render_seconds
+        self.max_output_bytes = max_output_bytes
+        self.policy = policy
+
+    def __repr__(self) -> str:
+        return (f"PageLimits(max_source_bytes={self.max_source_bytes}, "
+                f"max_render_seconds={self.max_render_seconds}, "
+                f"max_output_bytes={self.max_output_bytes}, policy={self.policy})")
+
+    def check_source(self, path: str, size: int) -> None:
+        if self.max_source_bytes is not None and size > self.max_source_bytes:
+            raise PageLimitExceeded(path, "source size", 0.0,
+                                    f"{size} bytes > {self.max_source_bytes} bytes")
+
+    def check_output(self, path: str, size: int, elapsed: float) -> None:
+        if self.max_output_bytes is not None and size > self.max_output_bytes:
+            raise PageLimitExceeded(path, "output size", elapsed,
+                                    f"{size} bytes > {self.max_output_bytes} bytes")
+
+    def check_elapsed(self, path: str, elapsed: float) -> None:
+        if self.max_render_seconds is not None and elapsed > self.max_render_seconds:
+            raise PageLimitExceeded(path, "render time", elapsed,
+                                    f"{elapsed:.2f}s > {self.max_render_seconds}s")
+
+    @contextmanager
+    def deadline(self, path: str) -> Iterator[None]:
+        """Interrupt the block with PageLimitExceeded once max_render_seconds pass.
+           Uses SIGALRM, so it only fires on the main thread of POSIX processes; elsewhere
+           check_elapsed after the fact is the only enforcement (and a worker pool kills
+           workers that stop responding)."""
+        seconds = self.max_render_seconds
+        if (seconds is None or not hasattr(signal, "setitimer") or
+                threading.current_thread() is not threading.main_thread()):
+            yield
+            return
+
+        start = time.perf_counter()
+
+        def on_alarm(signum: int, frame: object) -> None:
+            elapsed = time.perf_counter() - start
+            raise PageLimitExceeded(path, "render time", elapsed, f"{elapsed:.2f}s > {seconds}s")
+
+        previous = signal.signal(signal.SIGALRM, on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def error_stub(exc: PageLimitExceeded) -> str:
+    """Returns: a minimal HTML page standing in for a page that exceeded a limit."""
+    return ("<!doctype html>\n<html>\n  <head>\n    <meta charset=\"utf-8\" />\n"
+            "    <title>Page unavailable</title>\n  </head>\n\n  <body>\n"
+            "    <h1>Page unavailable</h1>\n"
+            f"    <p>This page could not be generated: it exceeded the {html_escape(exc.limit)} limit.</p>\n"
+            "  </body>\n</html>\n")
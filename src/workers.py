@@ -0,0 +1,216 @@
+import gc
+import importlib
+import multiprocessing
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple
+from metrics import peak_rss_bytes
+
+
+# Outcome of one task, as yielded by WorkerPool.run
+STATUS_OK = "ok"              # value is the job's return value
+STATUS_ERROR = "error"        # value is the exception the job raised
+STATUS_TIMEOUT = "timeout"    # the worker ran past task_timeout and was killed; value is None
+STATUS_CRASHED = "crashed"    # the worker died; value is its exit code
+
+# Seconds between checks for overdue or dead workers
+POLL_INTERVAL = 0.05
+
+
+def default_start_method() -> Optional[str]:
+    """Returns: "fork" in a single-threaded process (workers start in about a millisecond
+       and inherit everything already imported), "forkserver" when other threads are
+       running (forking them can deadlock), or None for the platform default."""
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return "fork"
+    return "forkserver" if "forkserver" in methods else None
+
+
+class _SetJob:
+    """Message replacing the job a worker runs, sent once per worker when a pool
+       is reused for a different job."""
+
+    def __init__(self, job: Callable[..., Any]) -> None:
+        self.job = job
+
+
+def _worker_loop(conn: Connection, job: Callable[..., Any]) -> None:
+    """Run tasks received on conn until None or EOF, sending back (status, value, elapsed,
+       peak RSS of the worker in bytes or 0 if unknown)."""
+    # Everything inherited from the parent or fork server (the preloaded modules) moves
+    # to the permanent generation: collections never write to those pages, which
+    # therefore stay shared copy-on-write with the parent and the other workers
+    gc.freeze()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        if isinstance(task, _SetJob):
+            job = task.job
+            continue
+        start = time.perf_counter()
+        try:
+            status, value = STATUS_OK, job(*task)
+        except Exception as exc:
+            status, value = STATUS_ERROR, exc
+        elapsed = time.perf_counter() - start
+        rss = peak_rss_bytes() or 0
+        try:
+            conn.send((status, value, elapsed, rss))
+        except Exception as exc:  # Unpicklable result or exception
+            conn.send((STATUS_ERROR, RuntimeError(f"{type(exc).__name__}: {exc}"), elapsed, rss))
+
+
+class _Worker:
+    """One worker process with a private pipe, so killing it never corrupts shared state."""
+
+    def __init__(self, mp_context: Any, job: Callable[..., Any]) -> None:
+        self.conn, child_conn = mp_context.Pipe()
+        self.process = mp_context.Process(target=_worker_loop, args=(child_conn, job), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job = job
+        self.task: Optional[Tuple] = None
+        self.started = 0.0
+
+    def assign(self, task: Tuple, job: Callable[..., Any]) -> None:
+        if job is not self.job:
+            self.conn.send(_SetJob(job))
+            self.job = job
+        self.task = task
+        self.started = time.monotonic()
+        self.conn.send(task)
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """Process pool that runs job(*task) for every task and can kill and replace
+        individual workers that exceed a per-task timeout. A started pool may be kept
+        and reused: run() can switch it to another job without restarting the workers.
+        peak_rss holds the largest peak RSS (bytes) its workers reported with a result.
+        Args:
+            job - Picklable module-level callable run in the workers
+            processes - Number of worker processes
+            Optional[task_timeout] - Seconds after which a busy worker is killed
+            Optional[start_method] - multiprocessing start method (platform default if None)
+            Optional[preload] - Modules imported before the workers are forked, in this
+                                process or, with "forkserver", in the fork server
+    """
+
+    def __init__(self, job: Callable[..., Any], processes: int,
+                 task_timeout: Optional[float] = None,
+                 start_method: Optional[str] = None,
+                 preload: Sequence[str] = ()) -> None:
+        if processes < 1:
+            raise ValueError("WorkerPool needs at least one process")
+        self.job = job
+        self.processes = processes
+        self.task_timeout = task_timeout
+        self.mp_context = multiprocessing.get_context(start_method)
+        self.preload = list(preload)
+        self.workers: List[_Worker] = []
+        self.restarts = 0
+        self.peak_rss = 0
+
+    def __repr__(self) -> str:
+        return (f"WorkerPool(processes={self.processes}, task_timeout={self.task_timeout}, "
+                f"start_method={self.mp_context.get_start_method()})")
+
+    def __enter__(self) -> "WorkerPool":
+        self.start()
+        return self
+
+    def start(self) -> None:
+        """Starts the workers, or replaces those of a started pool that have died."""
+        if self.preload and not self.workers:
+            if self.mp_context.get_start_method() == "forkserver":
+                # Only takes effect if this process has not started its fork server yet
+                self.mp_context.set_forkserver_preload(self.preload)
+            else:
+                for name in self.preload:
+                    importlib.import_module(name)
+        if not self.workers:
+            self.workers = [_Worker(self.mp_context, self.job) for _ in range(self.processes)]
+        for worker in list(self.workers):
+            if worker.task is None and not worker.process.is_alive():
+                self._replace(worker)
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for worker in self.workers:
+            if worker.task is None and worker.process.is_alive():
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+        for worker in self.workers:
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.kill()
+        self.workers = []
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.kill()
+        self.workers[self.workers.index(worker)] = _Worker(self.mp_context, self.job)
+        self.restarts += 1
+
+    def run(self, tasks: Iterable[Tuple],
+            job: Optional[Callable[..., Any]] = None) -> Iterator[Tuple[Tuple, str, Any, float]]:
+        """Run all tasks, yielding (task, status, value, elapsed) as each one finishes.
+           A job given here replaces the pool's job for this and later runs."""
+        if not self.workers:
+            raise RuntimeError("WorkerPool must be started (or used as a context manager)")
+        if job is not None:
+            self.job = job
+        pending: Deque[Tuple] = deque(tasks)
+        try:
+            yield from self._run(pending)
+        finally:
+            # Abandoned (e.g. by an exception in the consumer): the results of busy workers
+            # would be read by the next run, so those workers are replaced instead
+            for worker in list(self.workers):
+                if worker.task is not None:
+                    self._replace(worker)
+
+    def _run(self, pending: Deque[Tuple]) -> Iterator[Tuple[Tuple, str, Any, float]]:
+        while pending or any(worker.task is not None for worker in self.workers):
+            for worker in self.workers:
+                if worker.task is None and pending:
+                    worker.assign(pending.popleft(), self.job)
+
+            busy = {worker.conn: worker for worker in self.workers if worker.task is not None}
+            for conn in wait(list(busy), timeout=POLL_INTERVAL):
+                worker = busy[conn]
+                task = worker.task
+                try:
+                    status, value, elapsed, rss = conn.recv()
+                except (EOFError, OSError):
+                    continue  # Died mid-task; handled below as a crash
+                worker.task = None
+                self.peak_rss = max(self.peak_rss, rss)
+                yield task, status, value, elapsed
+
+            now = time.monotonic()
+            for worker in list(self.workers):
+                if (task := worker.task) is None:
+                    continue
+                elapsed = now - worker.started
+                if self.task_timeout is not None and elapsed > self.task_timeout:
+                    self._replace(worker)
+                    yield task, STATUS_TIMEOUT, None, elapsed
+                elif not worker.process.is_alive():
+                    exitcode = worker.process.exitcode
+                    self._replace(worker)
+                    yield task, STATUS_CRASHED, exitcode, elapsed